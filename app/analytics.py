@@ -0,0 +1,207 @@
+"""Aggregates behind the analytics dashboard.
+
+The dashboard used to run a ``COUNT(*)``, a ``GROUP BY source``, a min/max
+scan and a 24-hour count over ``article`` on every page load, plus one more
+count per source. Those all scan the article table. Now:
+
+- ``ArticleRollup`` holds the number of articles stored per source and hour.
+  The pipeline adds every inserted batch to it in the same transaction
+  (``record_articles``, an upsert), so it stays exact without rescans.
+  Daily figures are sums over the hourly rows; at a few rows per source and
+  hour the table stays small whatever the size of ``article``.
+- ``summary()`` reads every per-source figure (total, first/last hour,
+  last 24 hours via conditional aggregation) from the rollups in one
+  grouped query, and the job counts in one more. The result is cached for
+  ``ANALYTICS_CACHE_TTL`` seconds (app config, default 60). The cache is
+  dropped early when a scrape job finishes, which may happen in the runner
+  process: every call checks the finished-job count and the latest
+  ``finished_at``, one small query on ``scrape_job``.
+- ``ensure_rollups()`` (run from ``init_db``) fills the table from existing
+  articles the first time, and ``scripts/rebuild_analytics.py`` refills it
+  after rows were deleted or changed outside the pipeline.
+
+"Last 24 hours" counts whole hours, so it may include up to an hour more.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from .db import db
+from .models import Article, ArticleRollup, ScrapeJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60.0
+REBUILD_BATCH = 5000
+
+_CACHE = {"value": None, "at": 0.0, "key": None}
+_CACHE_LOCK = threading.Lock()
+
+
+def _hour(value):
+    return (value or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+
+
+def _upsert(session, values):
+    dialect = session.get_bind().dialect
+    if dialect.name in ("sqlite", "postgresql"):
+        ins = (sqlite.insert if dialect.name == "sqlite" else postgresql.insert)(ArticleRollup)
+        stmt = ins.on_conflict_do_update(
+            index_elements=["source", "hour"], set_={"articles": ArticleRollup.articles + ins.excluded.articles}
+        )
+        session.execute(stmt, values)
+    elif dialect.name in ("mysql", "mariadb"):
+        ins = mysql.insert(ArticleRollup).values(values)
+        session.execute(ins.on_duplicate_key_update(articles=ArticleRollup.articles + ins.inserted.articles))
+    else:
+        for v in values:
+            result = session.execute(
+                update(ArticleRollup)
+                .where(ArticleRollup.source == v["source"], ArticleRollup.hour == v["hour"])
+                .values(articles=ArticleRollup.articles + v["articles"])
+            )
+            if not result.rowcount:
+                session.execute(insert(ArticleRollup), [v])
+
+
+def record_articles(rows, session=None):
+    """Add inserted Article rows (dicts with ``source`` / ``created_at``) to the rollups.
+
+    The caller commits, normally together with the insert itself.
+    """
+    counts = Counter((r.get("source") or "", _hour(r.get("created_at"))) for r in rows)
+    if counts:
+        _upsert(session or db.session, [
+            {"source": source, "hour": hour, "articles": n} for (source, hour), n in counts.items()
+        ])
+
+
+def rebuild_rollups(engine=None):
+    """Recompute every rollup row from ``article``; returns the number of articles counted."""
+    engine = engine or db.engine
+    counts = Counter()
+    last_id = 0
+    with engine.connect() as conn:
+        while True:
+            rows = conn.execute(
+                select(Article.id, Article.source, Article.created_at)
+                .where(Article.id > last_id).order_by(Article.id).limit(REBUILD_BATCH)
+            ).all()
+            if not rows:
+                break
+            counts.update((source or "", _hour(created_at)) for _, source, created_at in rows)
+            last_id = rows[-1][0]
+    with engine.begin() as conn:
+        conn.execute(delete(ArticleRollup))
+        if counts:
+            conn.execute(insert(ArticleRollup), [
+                {"source": source, "hour": hour, "articles": n} for (source, hour), n in counts.items()
+            ])
+    invalidate()
+    return sum(counts.values())
+
+
+def ensure_rollups(engine=None):
+    """Fill the rollup table from existing articles if it is empty."""
+    engine = engine or db.engine
+    try:
+        with engine.connect() as conn:
+            if conn.execute(select(ArticleRollup.hour).limit(1)).first() is not None:
+                return
+            if conn.execute(select(Article.id).limit(1)).first() is None:
+                return
+        started = time.monotonic()
+        n = rebuild_rollups(engine)
+        logger.info("Built analytics rollups for %d articles in %.1fs", n, time.monotonic() - started)
+    except Exception as exc:
+        logger.warning("Could not build analytics rollups: %s", exc)
+
+
+def invalidate():
+    with _CACHE_LOCK:
+        _CACHE.update(value=None, at=0.0, key=None)
+
+
+def _job_counts():
+    total, running, finished, last_finished = db.session.execute(
+        select(
+            func.count(ScrapeJob.id),
+            func.sum(case((ScrapeJob.status == "running", 1), else_=0)),
+            func.sum(case((ScrapeJob.status == "finished", 1), else_=0)),
+            func.max(ScrapeJob.finished_at),
+        )
+    ).one()
+    counts = {"running": running or 0, "finished": finished or 0, "total": total or 0}
+    return counts, (counts["finished"], last_finished)
+
+
+def _compute(now):
+    since = _hour(now - timedelta(hours=24))
+    rows = db.session.execute(
+        select(
+            ArticleRollup.source,
+            func.sum(ArticleRollup.articles),
+            func.sum(case((ArticleRollup.hour >= since, ArticleRollup.articles), else_=0)),
+            func.min(ArticleRollup.hour),
+            func.max(ArticleRollup.hour),
+        ).group_by(ArticleRollup.source).order_by(ArticleRollup.source)
+    ).all()
+    per_source = {}
+    first = last = None
+    for source, total, last_24h, min_hour, max_hour in rows:
+        total, last_24h = int(total or 0), int(last_24h or 0)
+        hours = (max_hour - min_hour).total_seconds() / 3600.0 if min_hour and max_hour else 0.0
+        per_source[source or None] = {
+            "total": total,
+            "avg_per_hour": total / max(1.0, hours),
+            "last_24h": last_24h,
+            "last_24h_per_hour": last_24h / 24.0,
+        }
+        first = min(first, min_hour) if first else min_hour
+        last = max(last, max_hour) if last else max_hour
+    total = sum(s["total"] for s in per_source.values())
+    last_24h = sum(s["last_24h"] for s in per_source.values())
+    hours = (last - first).total_seconds() / 3600.0 if first and last else 0.0
+    return {
+        "total_articles": total,
+        "per_source": per_source,
+        "avg_per_hour": total / max(1.0, hours),
+        "last_24h": last_24h,
+        "last_24h_per_hour": last_24h / 24.0,
+        "computed_at": now,
+    }
+
+
+def summary():
+    """``(articles, job_counts)``: cached article aggregates and fresh job counts."""
+    job_counts, key = _job_counts()
+    ttl = current_app.config.get("ANALYTICS_CACHE_TTL", DEFAULT_TTL)
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        cached = _CACHE["value"]
+        if cached is not None and _CACHE["key"] == key and now - _CACHE["at"] < ttl:
+            return cached, job_counts
+    value = _compute(datetime.utcnow())
+    with _CACHE_LOCK:
+        _CACHE.update(value=value, at=now, key=key)
+    return value, job_counts
+
+
+def daily(days=30):
+    """``{source: [(date, articles), ...]}`` for the last ``days`` days, oldest first."""
+    start = _hour(datetime.utcnow()).replace(hour=0) - timedelta(days=days - 1)
+    per_day = {}
+    rows = db.session.execute(
+        select(ArticleRollup.source, ArticleRollup.hour, ArticleRollup.articles).where(ArticleRollup.hour >= start)
+    )
+    for source, hour, n in rows:
+        day = per_day.setdefault(source or None, Counter())
+        day[hour.date()] += n
+    dates = [(start + timedelta(days=i)).date() for i in range(days)]
+    return {source: [(d, counts.get(d, 0)) for d in dates] for source, counts in per_day.items()}
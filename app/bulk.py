@@ -0,0 +1,133 @@
+"""Bulk insert helpers for Article rows.
+
+These rely on the unique index on ``Article.url`` to skip duplicates instead
+of checking each URL with a SELECT first. That saves one query per row and
+also covers the race where several runner processes insert the same URL at
+the same time.
+"""
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from .db import db
+from .models import Article
+
+# keep single statements well below driver/server parameter limits
+CHUNK_SIZE = 500
+# MySQL errors after which the whole transaction can be run again
+RETRYABLE_MYSQL_ERRORS = (1205, 1213)
+
+
+def _prepare(rows):
+    """Drop repeated URLs and give every row the same set of keys."""
+    unique = {}
+    for r in rows:
+        url = r.get("url")
+        if url and url not in unique:
+            unique[url] = dict(r)
+    prepared = list(unique.values())
+    keys = set()
+    for r in prepared:
+        keys.update(r)
+    keys.add("created_at")
+    now = datetime.utcnow()
+    for r in prepared:
+        # Core inserts don't apply the model default once a key is present,
+        # so fill created_at here for rows that didn't provide one (or gave
+        # None: article lists are ordered by it, see app.pagination)
+        if r.get("created_at") is None:
+            r["created_at"] = now
+        for k in keys:
+            r.setdefault(k, None)
+    return prepared
+
+
+def insert_new_articles(rows, session=None):
+    """Insert Article rows, skipping URLs that already exist.
+
+    ``rows`` is a list of dicts keyed by Article column names. Returns the
+    rows that were actually inserted, each with its new ``id``, so callers
+    can keep job counts accurate. The caller is responsible for committing.
+
+    - SQLite / PostgreSQL: ``INSERT ... ON CONFLICT (url) DO NOTHING RETURNING``
+    - MySQL: ``INSERT IGNORE`` followed by a read-back of the inserted ids
+      (see ``_insert_ignore``)
+    - anything else: a single ``SELECT ... WHERE url IN (...)`` per chunk
+    """
+    session = session or db.session
+    rows = _prepare(rows)
+    if not rows:
+        return []
+
+    dialect = session.get_bind().dialect
+    inserted = []
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        if dialect.name in ("sqlite", "postgresql") and dialect.insert_returning:
+            inserted.extend(_insert_on_conflict(session, dialect.name, chunk))
+        elif dialect.name in ("mysql", "mariadb"):
+            inserted.extend(_insert_ignore(session, chunk))
+        else:
+            inserted.extend(_insert_missing(session, chunk))
+    return inserted
+
+
+def _insert_on_conflict(session, dialect_name, rows):
+    dialect_insert = sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+    stmt = (
+        dialect_insert(Article)
+        .on_conflict_do_nothing(index_elements=["url"])
+        .returning(Article.id, Article.url)
+    )
+    ids = {url: id_ for id_, url in session.execute(stmt, rows)}
+    return [dict(r, id=ids[r["url"]]) for r in rows if r["url"] in ids]
+
+
+def _insert_ignore(session, rows):
+    """MySQL: ``INSERT IGNORE``, then read back the ids of the rows it added.
+
+    A multi-row INSERT with a known row count is a "simple insert" to InnoDB,
+    which reserves one consecutive block of ``len(rows)`` ids for it (ids of
+    skipped rows are left unused). ``LAST_INSERT_ID()`` is the first row
+    actually inserted, so our rows are exactly those of this chunk with an
+    id in ``[first_id, first_id + len(rows) - 1]``; rows another writer
+    stored for the same URLs meanwhile have ids outside that block. No lock
+    is taken beyond the insert itself. Assumes ``auto_increment_increment``
+    is 1.
+    """
+    stmt = mysql.insert(Article).values(rows).prefix_with("IGNORE")
+    result = session.execute(stmt)
+    if not result.rowcount:
+        return []
+    first_id = result.lastrowid
+    last_id = first_id + len(rows) - 1
+    urls = [r["url"] for r in rows]
+    ids = dict(
+        session.execute(
+            select(Article.url, Article.id).where(Article.url.in_(urls), Article.id.between(first_id, last_id))
+        ).all()
+    )
+    return [dict(r, id=ids[r["url"]]) for r in rows if r["url"] in ids]
+
+
+def is_retryable(exc):
+    """True for MySQL deadlocks (1213) and lock wait timeouts (1205).
+
+    Both roll back the whole transaction; running it again usually works.
+    """
+    code = getattr(getattr(exc, "orig", None), "args", (None,))
+    return bool(code) and code[0] in RETRYABLE_MYSQL_ERRORS
+
+
+def _insert_missing(session, rows):
+    urls = [r["url"] for r in rows]
+    existing = set(session.execute(select(Article.url).where(Article.url.in_(urls))).scalars())
+    new_rows = [r for r in rows if r["url"] not in existing]
+    if not new_rows:
+        return []
+    session.execute(insert(Article), new_rows)
+    ids = dict(
+        session.execute(select(Article.url, Article.id).where(Article.url.in_([r["url"] for r in new_rows]))).all()
+    )
+    return [dict(r, id=ids.get(r["url"])) for r in new_rows]
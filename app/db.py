@@ -11,3 +11,14 @@ def init_db(app):
         return
     with app.app_context():
         db.create_all()
+        # create_all() leaves existing tables alone; add newer model columns
+        from .schema import ensure_schema
+        ensure_schema()
+        # FTS5 table / FULLTEXT index behind the search box (see app.search);
+        # only looked up here, building it is scripts/rebuild_search_index.py's job
+        from .search import search_backend
+        if search_backend() == "like":
+            app.logger.info("No full-text index; search uses LIKE (see scripts/rebuild_search_index.py)")
+        # per-source hourly counts behind /analytics (see app.analytics)
+        from .analytics import ensure_rollups
+        ensure_rollups()
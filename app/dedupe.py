@@ -0,0 +1,175 @@
+"""Near-duplicate detection for Article rows (syndicated / republished copies).
+
+URL dedupe (the unique index on ``Article.url``) misses the same story under
+several URLs: category path variants, AMP pages, wire copies on other
+outlets. Every article therefore also gets a content fingerprint:
+
+- ``simhash(text)`` is a 64-bit SimHash over 3-word shingles of the
+  normalized body text (lowercased, punctuation and extra whitespace
+  removed). Copies that differ only in a byline, a trailing "Read more" or
+  a few edits land within a few bits of each other. Bodies shorter than
+  ``MIN_TOKENS`` words get no fingerprint; they are too short to compare.
+- The fingerprint is stored in ``Article.simhash``, and its four 16-bit
+  quarters in the indexed ``simhash_band0..3`` columns. Two fingerprints
+  within ``MAX_DISTANCE`` (3) bits of each other agree on at least one
+  quarter. So a lookup is one indexed query for rows sharing any quarter,
+  followed by a Hamming-distance check on the few candidates.
+- A near duplicate is linked to the first copy stored: ``duplicate_of``
+  holds that article's id. With ``mode="skip"`` it is not inserted at all.
+
+``assign_duplicates`` does this for a batch of rows before they are
+inserted (``SQLAlchemyPipeline``). ``scripts/backfill_fingerprints.py``
+does it for rows that are already stored.
+"""
+import hashlib
+import re
+
+from sqlalchemy import or_, select
+
+from .models import Article
+
+BITS = 64
+BANDS = 4
+BAND_BITS = BITS // BANDS
+MAX_DISTANCE = 3
+MIN_TOKENS = 30
+SHINGLE = 3
+MODES = ("link", "skip")
+
+_BAND_COLUMNS = [getattr(Article, f"simhash_band{i}") for i in range(BANDS)]
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_MASK = (1 << BITS) - 1
+
+
+def tokens(text):
+    return _WORD_RE.findall((text or "").lower())
+
+
+def simhash(text):
+    """Signed 64-bit SimHash of ``text`` (fits a BIGINT), or None for short texts."""
+    words = tokens(text)
+    if len(words) < MIN_TOKENS:
+        return None
+    # one 64-char bit string per shingle; a bit is set when it is set in
+    # more than half of the shingles (counting columns via zip runs in C)
+    hashes = []
+    for i in range(len(words) - SHINGLE + 1):
+        shingle = " ".join(words[i:i + SHINGLE]).encode("utf-8")
+        hashes.append(format(int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "big"), "064b"))
+    half = len(hashes) / 2
+    value = int("".join("1" if column.count("1") > half else "0" for column in zip(*hashes)), 2)
+    return value - (1 << BITS) if value >> (BITS - 1) else value
+
+
+def bands(value):
+    """The four 16-bit quarters of a fingerprint."""
+    u = value & _MASK
+    return [(u >> (i * BAND_BITS)) & ((1 << BAND_BITS) - 1) for i in range(BANDS)]
+
+
+def distance(a, b):
+    return bin((a ^ b) & _MASK).count("1")
+
+
+def fingerprint_row(row):
+    """Set ``simhash`` and the band columns of an Article row dict (from its content)."""
+    value = simhash(row.get("content"))
+    row["simhash"] = value
+    for i, band in enumerate(bands(value) if value is not None else [None] * BANDS):
+        row[f"simhash_band{i}"] = band
+    return value
+
+
+class NearDuplicateIndex:
+    """In-memory band index over fingerprints, ``value -> canonical article id``."""
+
+    def __init__(self):
+        self.buckets = [{} for _ in range(BANDS)]
+
+    def add(self, value, article_id):
+        for i, band in enumerate(bands(value)):
+            self.buckets[i].setdefault(band, []).append((value, article_id))
+
+    def find(self, value):
+        """Canonical id of the closest fingerprint within ``MAX_DISTANCE``, or None."""
+        best = None
+        for i, band in enumerate(bands(value)):
+            for other, article_id in self.buckets[i].get(band, ()):
+                d = distance(value, other)
+                if d <= MAX_DISTANCE and (best is None or (d, article_id) < best):
+                    best = (d, article_id)
+        return best[1] if best else None
+
+
+def load_candidates(session, values, before_id=None):
+    """Index of stored fingerprints sharing a band with any of ``values``.
+
+    Rows are indexed under their canonical id (``duplicate_of`` or their own).
+    ``before_id`` limits the lookup to older rows (used by the backfill).
+    """
+    index = NearDuplicateIndex()
+    values = [v for v in values if v is not None]
+    if not values:
+        return index
+    per_band = [sorted({bands(v)[i] for v in values}) for i in range(BANDS)]
+    stmt = select(Article.id, Article.simhash, Article.duplicate_of).where(
+        or_(*[col.in_(vals) for col, vals in zip(_BAND_COLUMNS, per_band)])
+    )
+    if before_id is not None:
+        stmt = stmt.where(Article.id < before_id)
+    for article_id, value, duplicate_of in session.execute(stmt):
+        if value is not None:
+            index.add(value, duplicate_of or article_id)
+    return index
+
+
+def assign_duplicates(session, rows, mode="link"):
+    """Fingerprint ``rows`` and find near duplicates among stored articles and the batch.
+
+    Returns ``(rows, pending)``:
+    - ``rows``: what to insert now. Rows that duplicate a stored article
+      have ``duplicate_of`` set; with ``mode="skip"`` they are left out.
+    - ``pending``: ``(row, position)`` pairs for rows duplicating an
+      earlier row of the same batch. Once ``rows`` are inserted,
+      ``rows[position]`` has an id; pass it to ``link_pending``.
+    """
+    values = [fingerprint_row(r) for r in rows]
+    stored = load_candidates(session, values)
+    batch = NearDuplicateIndex()
+    out, pending = [], []
+    for row, value in zip(rows, values):
+        row.setdefault("duplicate_of", None)
+        if value is None:
+            out.append(row)
+            continue
+        canonical = stored.find(value)
+        if canonical is not None:
+            if mode == "skip":
+                continue
+            row["duplicate_of"] = canonical
+            out.append(row)
+            continue
+        position = batch.find(value)
+        if position is not None:
+            if mode != "skip":
+                pending.append((row, position))
+            continue
+        batch.add(value, len(out))
+        out.append(row)
+    return out, pending
+
+
+def link_pending(pending, inserted_rows, ids_by_url):
+    """Rows from ``pending`` with ``duplicate_of`` pointing at their batch original.
+
+    ``ids_by_url`` maps the URLs of the rows that were inserted to their new
+    ids. Originals that were not inserted (their URL already existed) leave
+    their duplicates unlinked rather than pointing at nothing.
+    """
+    linked = []
+    for row, position in pending:
+        original = inserted_rows[position]
+        article_id = ids_by_url.get(original.get("url"))
+        row["duplicate_of"] = article_id
+        linked.append(row)
+    return linked
@@ -0,0 +1,123 @@
+"""Streaming bulk export of articles as NDJSON or CSV (optionally gzipped).
+
+Used by ``/api/export`` and ``scripts/export_articles.py``. Rows are read in
+id order, ``batch`` at a time (``WHERE id > last_id ORDER BY id LIMIT
+batch``), and each batch is serialized and handed on before the next one is
+read. Memory therefore stays at one batch whatever the table size. A
+connection is only held while a batch is read, not while a slow client
+downloads the output.
+
+Ordering by id also makes exports resumable: every row carries its ``id``,
+and ``after_id`` continues after the last one received.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from sqlalchemy import select
+
+from .models import Article
+
+FORMATS = ("ndjson", "csv")
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+DEFAULT_BATCH = 1000
+
+
+def export_fields(fields=None):
+    """``fields`` checked against ``Article.FIELDS``, with ``id`` always first."""
+    fields = list(fields or Article.FIELDS)
+    unknown = [f for f in fields if f not in Article.FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)} (known: {', '.join(Article.FIELDS)})")
+    return ["id"] + [f for f in fields if f != "id"]
+
+
+def iter_rows(engine, fields, sources=None, since=None, until=None, after_id=None, batch=DEFAULT_BATCH):
+    """Yield lists of row tuples (in ``fields`` order) in id order, one per batch."""
+    columns = [getattr(Article, f) for f in fields]
+    base = select(*columns).order_by(Article.id).limit(batch)
+    if sources:
+        base = base.where(Article.source.in_(sources))
+    # publication date; undated articles are left out once either is set
+    if since is not None:
+        base = base.where(Article.date >= since)
+    if until is not None:
+        base = base.where(Article.date < until)
+    last_id = after_id or 0
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(base.where(Article.id > last_id)).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+        if len(rows) < batch:
+            return
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class ExportEncoder:
+    """Turns batches of rows into output bytes, one self-contained piece per batch.
+
+    With ``compress`` each piece is gzip-compressed and sync-flushed, so the
+    bytes of every batch handed out are complete: whatever has been written
+    so far decompresses up to that batch. ``finish()`` returns the end of the
+    stream (the gzip trailer; the CSV header when no batch came at all).
+    """
+
+    def __init__(self, fmt, fields, compress=False, header=True):
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        self.fmt = fmt
+        self.fields = fields
+        self._header = header and fmt == "csv"
+        self._z = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def _text(self, rows):
+        if self.fmt == "ndjson":
+            return "".join(
+                json.dumps(dict(zip(self.fields, map(_value, row))), ensure_ascii=False) + "\n" for row in rows
+            )
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if self._header:
+            writer.writerow(self.fields)
+            self._header = False
+        writer.writerows([_value(v) for v in row] for row in rows)
+        return buf.getvalue()
+
+    def encode(self, rows):
+        data = self._text(rows).encode("utf-8")
+        if self._z is not None:
+            data = self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+        return data
+
+    def finish(self):
+        # header only: nothing matched
+        data = self._text([]).encode("utf-8") if self._header else b""
+        if self._z is not None:
+            data = self._z.compress(data) + self._z.flush()
+            self._z = None
+        return data
+
+
+def _stream(encoder, batches):
+    for rows in batches:
+        yield encoder.encode(rows)
+    yield encoder.finish()
+
+
+def iter_export(engine, fmt="ndjson", fields=None, compress=False, header=True, **filters):
+    """Yield the export as ``bytes`` chunks, one per batch; ``filters`` go to ``iter_rows``.
+
+    ``header=False`` leaves out the CSV header line, for appending to an
+    earlier export.
+    """
+    fields = export_fields(fields)
+    encoder = ExportEncoder(fmt, fields, compress, header)
+    return _stream(encoder, iter_rows(engine, fields, **filters))
@@ -12,19 +12,37 @@ class Article(db.Model):
     content = db.Column(db.Text)
     source = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # content fingerprint for near-duplicate detection (see app.dedupe): the
+    # 64-bit SimHash of the body and its four 16-bit quarters, indexed
+    simhash = db.Column(db.BigInteger)
+    simhash_band0 = db.Column(db.Integer, index=True)
+    simhash_band1 = db.Column(db.Integer, index=True)
+    simhash_band2 = db.Column(db.Integer, index=True)
+    simhash_band3 = db.Column(db.Integer, index=True)
+    # id of the first stored copy when this article is a near duplicate
+    duplicate_of = db.Column(db.Integer, db.ForeignKey("article.id"), index=True)
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "url": self.url,
-            "title": self.title,
-            "author": self.author,
-            "date": self.date.isoformat() if self.date else None,
-            "description": self.description,
-            "content": self.content,
-            "source": self.source,
-            "created_at": self.created_at.isoformat(),
-        }
+    __table_args__ = (
+        # the display order of article lists; cursor pagination seeks on it
+        # (see app.pagination)
+        db.Index("ix_article_date_created_id", "date", "created_at", "id"),
+    )
+
+    # what to_dict() / the API can return, in output order
+    FIELDS = ("id", "url", "title", "author", "date", "description", "content", "source",
+              "created_at", "duplicate_of")
+
+    def to_dict(self, fields=None):
+        """``fields`` (default: all of ``FIELDS``) as JSON-friendly values.
+
+        Only the attributes asked for are touched, so columns left out of a
+        ``load_only()`` query are never loaded.
+        """
+        data = {}
+        for name in fields or self.FIELDS:
+            value = getattr(self, name)
+            data[name] = value.isoformat() if isinstance(value, datetime) else value
+        return data
 
 
 class ScrapeJob(db.Model):
@@ -45,3 +63,14 @@ class ScrapeJob(db.Model):
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "finished_at": self.finished_at.isoformat() if self.finished_at else None,
         }
+
+
+class ArticleRollup(db.Model):
+    """Articles stored per source and hour (by created_at), kept by the pipeline.
+
+    The analytics dashboard reads these instead of scanning Article (see
+    app.analytics). ``source`` is "" for articles without one.
+    """
+    source = db.Column(db.String(200), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True)
+    articles = db.Column(db.Integer, nullable=False, default=0)
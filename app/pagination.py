@@ -0,0 +1,230 @@
+"""Cursor (keyset) pagination for article lists.
+
+``Query.paginate()`` runs a ``COUNT(*)`` of the filtered query plus an
+``OFFSET`` scan on every page view, so page 500 reads and throws away 5000
+rows first. Article lists are instead paged by position in the display order
+``date DESC, created_at DESC, id DESC``:
+
+- A cursor names the last (or first) row of the page it came from. The next
+  page is "rows after that one" and is read straight from the composite
+  index ``ix_article_date_created_id`` (``date, created_at, id``). That costs
+  the same on page 1 and page 500, on SQLite and MySQL alike.
+- Both databases sort NULL dates lowest, so ``date DESC`` puts undated
+  articles last. A range on ``date`` never matches NULL, though, so undated
+  rows are read as a second range (``date IS NULL`` then ``created_at, id``)
+  once the dated ones run out.
+- ``created_at`` is nullable too (rows copied by the migration script may
+  lack it). NULLs sort lowest there as well; the seek on it adds an
+  ``IS NULL`` branch, and a cursor may hold a null ``created_at``.
+- Search results ordered by relevance have no such key. Their cursors hold
+  an offset instead, and only the first ``MAX_SEARCH_RESULTS`` results can
+  be paged to, so the ``OFFSET`` never grows past that.
+
+Cursors are opaque strings (URL-safe base64 of a small JSON document).
+Callers pass them back as given; a tampered or stale cursor raises
+``InvalidCursor``. No page count is computed. ``estimated_total()`` gives a
+cheap approximate article count for display instead (InnoDB's row estimate
+on MySQL, the highest id on SQLite).
+"""
+import base64
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import and_, or_, text
+
+from .db import db
+from .models import Article
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PER_PAGE = 10
+# search results beyond this are not paged to (the offset cursor's cap)
+MAX_SEARCH_RESULTS = 500
+# how long estimated_total() reuses its answer
+TOTAL_TTL = 60.0
+
+_TOTAL = {"value": None, "at": 0.0, "url": None}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class Page:
+    items: List[Article] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _fromisoformat(value):
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def decode_cursor(cursor):
+    """The dict inside ``cursor``; raises ``InvalidCursor`` for anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except Exception:
+        raise InvalidCursor("malformed cursor")
+    if not isinstance(data, dict) or data.get("d") not in ("n", "p"):
+        raise InvalidCursor("malformed cursor")
+    if "o" in data:
+        if not isinstance(data["o"], int) or data["o"] < 0:
+            raise InvalidCursor("malformed cursor")
+        return data
+    try:
+        date, created, article_id = data["k"]
+        data["k"] = (_fromisoformat(date), _fromisoformat(created), int(article_id))
+    except Exception:
+        raise InvalidCursor("malformed cursor")
+    return data
+
+
+def _key_cursor(article, direction):
+    return encode_cursor({
+        "d": direction,
+        "k": [_isoformat(article.date), _isoformat(article.created_at), article.id],
+    })
+
+
+def _after(column, value, rest, desc):
+    """``column`` strictly past ``value`` in the scan direction, or equal and ``rest``."""
+    if desc:
+        return and_(column <= value, or_(column < value, and_(column == value, rest)))
+    return and_(column >= value, or_(column > value, and_(column == value, rest)))
+
+
+def _after_nullable(column, value, rest, desc):
+    """``_after`` for a nullable column; NULL sorts below every value."""
+    if value is None:
+        if desc:
+            # nothing sorts below NULL
+            return and_(column.is_(None), rest)
+        return or_(column.isnot(None), and_(column.is_(None), rest))
+    if desc:
+        return or_(column.is_(None), _after(column, value, rest, desc))
+    return _after(column, value, rest, desc)
+
+
+def _dated(query, key, desc, limit):
+    """Rows with a date, past ``key`` (or from the start) in the scan direction."""
+    q = query.filter(Article.date.isnot(None))
+    if key is not None:
+        date, created, article_id = key
+        id_past = Article.id < article_id if desc else Article.id > article_id
+        q = q.filter(_after(Article.date, date, _after_nullable(Article.created_at, created, id_past, desc), desc))
+    order = (Article.date, Article.created_at, Article.id)
+    return q.order_by(*[c.desc() if desc else c.asc() for c in order]).limit(limit).all()
+
+
+def _undated(query, key, desc, limit):
+    """Rows without a date, past ``key`` (or from the start) in the scan direction."""
+    q = query.filter(Article.date.is_(None))
+    if key is not None:
+        _, created, article_id = key
+        id_past = Article.id < article_id if desc else Article.id > article_id
+        q = q.filter(_after_nullable(Article.created_at, created, id_past, desc))
+    order = (Article.created_at, Article.id)
+    return q.order_by(*[c.desc() if desc else c.asc() for c in order]).limit(limit).all()
+
+
+def keyset_page(query, cursor=None, per_page=DEFAULT_PER_PAGE):
+    """One page of ``query`` (over Article) in date order, from a cursor or the top."""
+    data = decode_cursor(cursor) if cursor else {"d": "n", "k": None}
+    key = data.get("k")
+    if "o" in data:
+        raise InvalidCursor("cursor belongs to a search result")
+    want = per_page + 1
+    if data["d"] == "n":
+        # dated rows newest first, then undated ones
+        rows = [] if key is not None and key[0] is None else _dated(query, key, True, want)
+        if len(rows) < want:
+            undated_key = key if key is not None and key[0] is None else None
+            rows += _undated(query, undated_key, True, want - len(rows))
+        items = rows[:per_page]
+        more_before = key is not None
+        more_after = len(rows) > per_page
+    else:
+        # walk back up: undated rows (if the cursor is among them), then dated
+        rows = _undated(query, key, False, want) if key[0] is None else []
+        if len(rows) < want:
+            rows += _dated(query, key if key[0] is not None else None, False, want - len(rows))
+        items = list(reversed(rows[:per_page]))
+        more_before = len(rows) > per_page
+        more_after = True
+    return Page(
+        items=items,
+        next_cursor=_key_cursor(items[-1], "n") if items and more_after else None,
+        prev_cursor=_key_cursor(items[0], "p") if items and more_before else None,
+    )
+
+
+def offset_page(query, cursor=None, per_page=DEFAULT_PER_PAGE):
+    """One page of an already ordered ``query`` (search results), by offset cursor.
+
+    Only the first ``MAX_SEARCH_RESULTS`` rows are reachable.
+    """
+    data = decode_cursor(cursor) if cursor else {"d": "n", "o": 0}
+    if "o" not in data:
+        raise InvalidCursor("cursor does not belong to a search result")
+    offset = data["o"]
+    if offset >= MAX_SEARCH_RESULTS:
+        raise InvalidCursor("cursor is past the last search result shown")
+    per_page = min(per_page, MAX_SEARCH_RESULTS - offset)
+    rows = query.offset(offset).limit(per_page + 1).all()
+    items = rows[:per_page]
+    more = len(rows) > per_page and offset + per_page < MAX_SEARCH_RESULTS
+    return Page(
+        items=items,
+        next_cursor=encode_cursor({"d": "n", "o": offset + per_page}) if more else None,
+        prev_cursor=encode_cursor({"d": "p", "o": max(0, offset - per_page)}) if offset > 0 else None,
+    )
+
+
+def estimated_total():
+    """Approximate number of articles (cached for ``TOTAL_TTL`` seconds), or None.
+
+    MySQL reads InnoDB's row estimate from ``information_schema``; SQLite
+    takes the highest id, one lookup at the end of the primary key (high
+    by the number of deleted rows). Neither looks at any filter.
+    """
+    engine = db.engine
+    now = time.monotonic()
+    if _TOTAL["url"] == str(engine.url) and now - _TOTAL["at"] < TOTAL_TTL:
+        return _TOTAL["value"]
+    value = None
+    try:
+        if engine.dialect.name in ("mysql", "mariadb"):
+            value = db.session.execute(text(
+                "SELECT table_rows FROM information_schema.tables"
+                " WHERE table_schema = DATABASE() AND table_name = 'article'"
+            )).scalar()
+        else:
+            value = db.session.query(db.func.max(Article.id)).scalar()
+    except Exception as exc:
+        logger.warning("Could not estimate the article count: %s", exc)
+    _TOTAL.update(value=value, at=now, url=str(engine.url))
+    return value
@@ -0,0 +1,64 @@
+"""Bring an existing database up to the current models.
+
+``db.create_all()`` creates missing tables but never changes existing ones,
+so columns added to a model later (such as ``Article.simhash``) are missing
+from databases created before them. ``ensure_schema`` adds those columns
+(nullable, without defaults) and their indexes. It runs from ``init_db``
+after ``create_all()``; ``scripts/migrate_sqlite_to_mysql.py`` and the
+backfill script call it themselves. It never drops or alters anything.
+
+On SQLite it also runs a sampled ``ANALYZE`` while the article table has no
+planner statistics yet. Without them SQLite treats ``duplicate_of IS NULL``
+as selective and sorts the whole table through that index instead of
+reading the date index in order (see ``app.pagination``). MySQL keeps its
+own statistics.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_schema(engine=None):
+    """Add missing nullable columns and indexes of every model table; returns what was added."""
+    engine = engine or db.engine
+    added = []
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        existing_tables = set(insp.get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {c["name"] for c in insp.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns or not column.nullable or column.primary_key:
+                    continue
+                ddl = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl}"))
+                added.append(f"{table.name}.{column.name}")
+            indexes = {i["name"] for i in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    added.append(index.name)
+    if added:
+        logger.info("Added to the schema: %s", ", ".join(added))
+    if engine.dialect.name == "sqlite":
+        _analyze_sqlite(engine)
+    return added
+
+
+def _analyze_sqlite(engine):
+    try:
+        with engine.begin() as conn:
+            has_stats = inspect(conn).has_table("sqlite_stat1") and conn.execute(
+                text("SELECT 1 FROM sqlite_stat1 WHERE tbl = 'article' LIMIT 1")).first()
+            if not has_stats:
+                # sample ~1000 rows per index; an estimate is all the planner needs
+                conn.execute(text("PRAGMA analysis_limit = 1000"))
+                conn.execute(text("ANALYZE article"))
+    except Exception as exc:
+        logger.warning("ANALYZE failed: %s", exc)
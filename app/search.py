@@ -0,0 +1,205 @@
+"""Full-text search over Article titles and bodies.
+
+The search box used to run ``title ILIKE '%q%' OR content ILIKE '%q%'``,
+which scans every article body on each query. This module uses the
+database's own full-text index instead:
+
+- SQLite: an FTS5 table ``article_fts`` over ``article`` (external content,
+  so the text is not stored twice). Triggers on ``article`` keep it in sync
+  with every insert, including the pipeline's bulk inserts, and with updates
+  and deletes. Results are ranked by BM25, with title matches weighted
+  higher than body matches, and snippets come from FTS5's ``snippet()``.
+- MySQL: a ``FULLTEXT`` index on ``(title, content)``, which InnoDB keeps up
+  to date itself. Results are ranked by ``MATCH ... AGAINST`` relevance in
+  boolean mode, and snippets are cut in Python around the first hit.
+- Anything else, or an SQLite build without FTS5: the old ``LIKE`` search.
+
+The query is split into words and every word must match. The last word also
+matches as a prefix, so results show up while the user is still typing.
+``init_db`` only detects which backend the database has. Creating the
+index and filling it from existing rows is ``ensure_search_index``, run by
+``scripts/rebuild_search_index.py`` rather than at start-up: on a large
+table it takes minutes, and the web app, the runner and every ``--workers``
+process call ``create_app()``. The same script rebuilds the index after
+bulk changes made with the triggers off.
+"""
+import logging
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import inspect, text
+
+from .db import db
+from .models import Article
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "article_fts"
+MYSQL_INDEX = "ft_article_title_content"
+# BM25 weights of the title and content columns
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+SNIPPET_TOKENS = 24
+SNIPPET_CHARS = 200
+
+# snippet() markers; replaced by <mark> after the text has been escaped
+_START, _END = "\x02", "\x03"
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    " title, content, content='article', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON article BEGIN"
+    f" INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON article BEGIN"
+    f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END",
+    # only text changes touch the index (not e.g. the fingerprint backfill)
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, content ON article BEGIN"
+    f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);"
+    f" INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+]
+
+# engine url -> "fts5" / "mysql" / "like"
+_BACKENDS = {}
+
+
+def query_terms(q):
+    return _WORD_RE.findall(q or "")
+
+
+def search_backend(engine=None):
+    """Which full-text backend the database has: ``fts5``, ``mysql`` or ``like``."""
+    engine = engine or db.engine
+    key = str(engine.url)
+    if key not in _BACKENDS:
+        backend = "like"
+        try:
+            insp = inspect(engine)
+            if engine.dialect.name == "sqlite" and insp.has_table(FTS_TABLE):
+                backend = "fts5"
+            elif engine.dialect.name in ("mysql", "mariadb") and any(
+                    i["name"] == MYSQL_INDEX for i in insp.get_indexes("article")):
+                backend = "mysql"
+        except Exception as exc:
+            logger.warning("Could not inspect the search index: %s", exc)
+        _BACKENDS[key] = backend
+    return _BACKENDS[key]
+
+
+def ensure_search_index(engine=None):
+    """Create the full-text index if the database supports one; returns the backend."""
+    engine = engine or db.engine
+    _BACKENDS.pop(str(engine.url), None)
+    try:
+        if engine.dialect.name == "sqlite":
+            with engine.begin() as conn:
+                created = not inspect(conn).has_table(FTS_TABLE)
+                for ddl in _SQLITE_DDL:
+                    conn.execute(text(ddl))
+                if created:
+                    # index the rows stored before the table existed
+                    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        elif engine.dialect.name in ("mysql", "mariadb"):
+            if not any(i["name"] == MYSQL_INDEX for i in inspect(engine).get_indexes("article")):
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE article ADD FULLTEXT INDEX {MYSQL_INDEX} (title, content)"))
+    except Exception as exc:
+        # e.g. SQLite built without FTS5: searching falls back to LIKE
+        logger.warning("Full-text index not available (%s); search uses LIKE", exc)
+    return search_backend(engine)
+
+
+def rebuild_search_index(engine=None):
+    """Re-index every article from scratch; returns the backend."""
+    engine = engine or db.engine
+    backend = ensure_search_index(engine)
+    with engine.begin() as conn:
+        if backend == "fts5":
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+        elif backend == "mysql":
+            conn.execute(text(f"ALTER TABLE article DROP INDEX {MYSQL_INDEX}"))
+            conn.execute(text(f"ALTER TABLE article ADD FULLTEXT INDEX {MYSQL_INDEX} (title, content)"))
+    return backend
+
+
+def _fts5_query(terms):
+    # quoted terms can't be mistaken for FTS5 syntax; the last one is a prefix
+    parts = ['"%s"' % t.replace('"', "") for t in terms]
+    parts[-1] += "*"
+    return " ".join(parts)
+
+
+def _mysql_query(terms):
+    # every term required, the last one as a prefix
+    return " ".join("+" + t for t in terms) + "*"
+
+
+def apply_search(query, q):
+    """``query`` (over Article) narrowed to matches of ``q`` and ordered by relevance.
+
+    Returns ``(query, ranked)``. ``ranked`` is False when the LIKE fallback
+    was used; the caller then keeps its own ordering.
+    """
+    terms = query_terms(q)
+    if not terms:
+        return query, False
+    backend = search_backend()
+    if backend == "fts5":
+        matches = (
+            text(f"SELECT rowid AS article_id, bm25({FTS_TABLE}, :tw, :cw) AS rank"
+                 f" FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_q")
+            .bindparams(tw=TITLE_WEIGHT, cw=CONTENT_WEIGHT, fts_q=_fts5_query(terms))
+            .columns(article_id=db.Integer, rank=db.Float)
+            .subquery("fts_matches")
+        )
+        # bm25() is lower for better matches
+        return query.join(matches, Article.id == matches.c.article_id).order_by(matches.c.rank, Article.id.desc()), True
+    if backend == "mysql":
+        match = "MATCH (article.title, article.content) AGAINST (:fts_q IN BOOLEAN MODE)"
+        fts_q = _mysql_query(terms)
+        return (query.filter(text(match).bindparams(fts_q=fts_q))
+                .order_by(text(match + " DESC").bindparams(fts_q=fts_q), Article.id.desc())), True
+    like = f"%{q}%"
+    return query.filter(Article.title.ilike(like) | Article.content.ilike(like)), False
+
+
+def _highlight(raw):
+    return Markup(str(escape(raw)).replace(_START, "<mark>").replace(_END, "</mark>"))
+
+
+def _python_snippet(content, terms):
+    """Text around the first matching term, with every term marked."""
+    content = " ".join((content or "").split())
+    if not content:
+        return None
+    pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")", re.IGNORECASE)
+    m = pattern.search(content)
+    start = max(0, (m.start() if m else 0) - SNIPPET_CHARS // 3)
+    piece = content[start:start + SNIPPET_CHARS]
+    piece = pattern.sub(lambda x: _START + x.group(0) + _END, piece)
+    return ("…" if start else "") + piece + ("…" if start + SNIPPET_CHARS < len(content) else "")
+
+
+def snippets(articles, q):
+    """``{article id: Markup}`` of highlighted body excerpts for the search results shown."""
+    terms = query_terms(q)
+    ids = [a.id for a in articles]
+    if not terms or not ids:
+        return {}
+    raw = {}
+    if search_backend() == "fts5":
+        try:
+            stmt = text(
+                f"SELECT rowid, snippet({FTS_TABLE}, 1, :s, :e, '…', :n) FROM {FTS_TABLE}"
+                f" WHERE {FTS_TABLE} MATCH :fts_q AND rowid IN ({', '.join(str(int(i)) for i in ids)})"
+            ).bindparams(s=_START, e=_END, n=SNIPPET_TOKENS, fts_q=_fts5_query(terms))
+            raw = dict(db.session.execute(stmt).all())
+        except Exception as exc:
+            logger.warning("FTS5 snippets failed: %s", exc)
+    for a in articles:
+        if not raw.get(a.id) or _START not in raw[a.id]:
+            # title-only matches (and the other backends): cut one in Python
+            raw[a.id] = _python_snippet(a.content, terms)
+    return {i: _highlight(s) for i, s in raw.items() if s}
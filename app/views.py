@@ -1,10 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify
 from .models import Article, ScrapeJob
 from .db import db
+from .analytics import daily as analytics_daily, summary as analytics_summary
+from .export import CONTENT_TYPES, iter_export
+from .pagination import InvalidCursor, estimated_total, keyset_page, offset_page
+from .search import apply_search, snippets
 from datetime import datetime
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 import sys
-from sqlalchemy import func
+from sqlalchemy.orm import load_only
 
 main_bp = Blueprint("main", __name__)
 
@@ -15,24 +19,25 @@ SCRAPERS = {"philstar", "rappler", "manilabulletin", "pna"}
 @main_bp.route("/")
 def index():
     q = request.args.get("q")
-    page = int(request.args.get("page", 1))
+    cursor = request.args.get("cursor")
+    dupes = request.args.get("dupes")
     per = 10
     query = Article.query
+    # near duplicates (see app.dedupe) are hidden unless ?dupes=1
+    if not dupes:
+        query = query.filter(Article.duplicate_of.is_(None))
+    ranked = False
     if q:
-        query = query.filter(Article.title.ilike(f"%{q}%") | Article.content.ilike(f"%{q}%"))
-    # Some SQL dialects (MySQL) don't support NULLS LAST. Emit a dialect-aware
-    # ordering: for MySQL, order by IS NULL (so non-null first) then date desc.
-    dialect = None
+        # full-text index when the database has one (see app.search)
+        query, ranked = apply_search(query, q)
+    # cursor pagination (see app.pagination): search results by relevance,
+    # everything else by date without COUNT(*) or OFFSET scans
+    paginate = offset_page if ranked else keyset_page
     try:
-        dialect = db.engine.dialect.name
-    except Exception:
-        pass
-
-    if dialect == 'mysql':
-        # (Article.date IS NULL) ASC -> non-null (0) before null (1)
-        items = query.order_by(Article.date.is_(None).asc(), Article.date.desc(), Article.created_at.desc()).paginate(page=page, per_page=per, error_out=False)
-    else:
-        items = query.order_by(Article.date.desc().nullslast(), Article.created_at.desc()).paginate(page=page, per_page=per, error_out=False)
+        items = paginate(query, cursor, per)
+    except InvalidCursor:
+        # stale or edited link: start from the first page
+        items = paginate(query, None, per)
     # flash any finished, unnotified scrape jobs
     from .models import ScrapeJob
     jobs = ScrapeJob.query.filter_by(status="finished", notified=False).all()
@@ -49,7 +54,10 @@ def index():
     # also collect currently running jobs to show progress on the UI
     running_jobs = ScrapeJob.query.filter_by(status="running").all()
 
-    return render_template("index.html", articles=items.items, pagination=items, q=q, running_jobs=running_jobs)
+    excerpts = snippets(items.items, q) if q else {}
+    total = None if q else estimated_total()
+    return render_template("index.html", articles=items.items, pagination=items, q=q, dupes=dupes,
+                           running_jobs=running_jobs, snippets=excerpts, total=total)
 
 @main_bp.route("/scrape", methods=[GET, POST] if False else ["GET", "POST"]) 
 @main_bp.route("/scrape", methods=["GET", "POST"]) 
@@ -83,57 +91,137 @@ def scrape():
             flash("Unknown site", "danger")
             return redirect(url_for("main.index"))
 
-        # If run_all is requested, start one background process per scraper
-        # so they run in parallel. Create a ScrapeJob per scraper for tracking.
-        started = 0
-        if run_all:
-            for name in SCRAPERS:
-                job = ScrapeJob(spider=name, status="running")
-                db.session.add(job)
-                db.session.commit()
-
-                cmd = [
-                    sys.executable,
-                    "-m",
-                    "scrapy_spiders.runner",
-                    name,
-                    "--pages",
-                    str(pages if pages is not None else 0),
-                    "--limit",
-                    str(limit),
-                    "--job-id",
-                    str(job.id),
-                ]
-                subprocess.Popen(cmd, shell=False)
-                started += 1
-            flash(f"Started {started} Scrapy jobs in background", "info")
-        else:
-            # single-site run: create one job and start one process
-            job = ScrapeJob(spider=site, status="running")
+        # If run_all is requested, create a ScrapeJob per scraper for tracking
+        # and run them all in one background runner process (one Scrapy
+        # reactor and one browser for every spider).
+        names = sorted(SCRAPERS) if site == "all" else [site]
+        job_ids = {}
+        for name in names:
+            job = ScrapeJob(spider=name, status="running")
             db.session.add(job)
             db.session.commit()
+            job_ids[name] = job.id
 
-            cmd = [
-                sys.executable,
-                "-m",
-                "scrapy_spiders.runner",
-                site,
-                "--pages",
-                str(pages if pages is not None else 0),
-                "--limit",
-                str(limit),
-                "--job-id",
-                str(job.id),
-            ]
-            subprocess.Popen(cmd, shell=False)
+        cmd = [
+            sys.executable,
+            "-m",
+            "scrapy_spiders.runner",
+            ",".join(names),
+            "--pages",
+            str(pages if pages is not None else 0),
+            "--limit",
+            str(limit),
+            "--job-ids",
+            ",".join(f"{name}={job_id}" for name, job_id in job_ids.items()),
+        ]
+        subprocess.Popen(cmd, shell=False)
+        if len(names) > 1:
+            flash(f"Started {len(names)} Scrapy jobs in background", "info")
+        else:
             flash("Scrapy job started in background", "info")
         return redirect(url_for("main.index"))
     return render_template("scrape.html", sites=list(SCRAPERS))
 
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 500
+
+
+def _api_datetime(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or datetime")
+
+
+def _api_sources():
+    return [s.strip() for s in request.args.get("source", "").split(",") if s.strip()]
+
+
+def _api_articles_query():
+    """(query, fields, limit) from the /api/articles arguments; raises ValueError."""
+    fields = Article.FIELDS
+    if request.args.get("fields"):
+        fields = tuple(f.strip() for f in request.args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in Article.FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"unknown fields: {', '.join(unknown)} (known: {', '.join(Article.FIELDS)})")
+    try:
+        limit = int(request.args.get("limit", API_DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    limit = min(max(limit, 1), API_MAX_LIMIT)
+    # only the requested columns, plus the pagination key
+    columns = set(fields) | {"id", "date", "created_at"}
+    query = Article.query.options(load_only(*[getattr(Article, c) for c in columns]))
+    sources = _api_sources()
+    if sources:
+        query = query.filter(Article.source.in_(sources))
+    # publication date range; undated articles are left out once either is set
+    since, until = _api_datetime("since"), _api_datetime("until")
+    if since is not None:
+        query = query.filter(Article.date >= since)
+    if until is not None:
+        query = query.filter(Article.date < until)
+    return query, fields, limit
+
+
 @main_bp.route("/api/articles")
 def api_articles():
-    articles = Article.query.order_by(Article.created_at.desc()).limit(100).all()
-    return jsonify([a.to_dict() for a in articles])
+    # newest first; filters: ?source=a,b&since=&until= (publication date),
+    # ?fields=id,title,url picks the columns, ?limit= (default 100, max 500).
+    # The next/previous pages are in the Link header (rel="next" / rel="prev",
+    # with an opaque ?cursor=)
+    try:
+        query, fields, limit = _api_articles_query()
+        page = keyset_page(query, request.args.get("cursor"), limit)
+    except InvalidCursor:
+        return jsonify({"error": "invalid cursor"}), 400
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    response = jsonify([a.to_dict(fields) for a in page.items])
+    links = []
+    for rel, cursor in (("next", page.next_cursor), ("prev", page.prev_cursor)):
+        if cursor:
+            args = request.args.to_dict()
+            args["cursor"] = cursor
+            links.append(f'<{url_for("main.api_articles", _external=True, **args)}>; rel="{rel}"')
+    if links:
+        response.headers["Link"] = ", ".join(links)
+    if request.args.get("total"):
+        total = estimated_total()
+        if total is not None:
+            response.headers["X-Total-Estimate"] = str(total)
+    # clients re-polling an unchanged page get an empty 304
+    response.headers["Cache-Control"] = "no-cache"
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@main_bp.route("/api/export")
+def api_export():
+    # the whole corpus (or ?source= / ?since= / ?until=) streamed in id order:
+    # ?format=ndjson|csv, ?fields=, ?gzip=1, ?after_id= to resume (see app.export)
+    fmt = request.args.get("format", "ndjson")
+    compress = bool(request.args.get("gzip"))
+    try:
+        fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()] or None
+        try:
+            after_id = int(request.args.get("after_id", 0))
+        except ValueError:
+            raise ValueError("after_id must be an integer")
+        chunks = iter_export(
+            db.engine, fmt, fields, compress,
+            sources=_api_sources(), since=_api_datetime("since"), until=_api_datetime("until"), after_id=after_id,
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    filename = f"articles.{fmt}" + (".gz" if compress else "")
+    response = Response(chunks, mimetype="application/gzip" if compress else CONTENT_TYPES[fmt])
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
 
 
 @main_bp.route("/api/jobs")
@@ -145,71 +233,41 @@ def api_jobs():
 
 @main_bp.route("/analytics")
 def analytics():
-    # Basic analytics dashboard using Article and ScrapeJob models
-    total_articles = Article.query.count()
-    # articles per source
-    per_source = db.session.query(Article.source, func.count(Article.id)).group_by(Article.source).all()
-
-    job_counts = {
-        'running': ScrapeJob.query.filter_by(status='running').count(),
-        'finished': ScrapeJob.query.filter_by(status='finished').count(),
-        'total': ScrapeJob.query.count(),
-    }
+    # article figures come from the hourly rollups, cached (see app.analytics)
+    stats, job_counts = analytics_summary()
+    per_source = [(source, s["total"]) for source, s in stats["per_source"].items()]
 
     recent_jobs = ScrapeJob.query.order_by(ScrapeJob.started_at.desc()).limit(10).all()
-    recent_articles = Article.query.order_by(Article.created_at.desc()).limit(10).all()
+    # newest by id: created_at has no index, and ids follow insertion order
+    recent_articles = (Article.query.options(load_only(Article.id, Article.title, Article.url, Article.source,
+                                                       Article.created_at))
+                       .order_by(Article.id.desc()).limit(10).all())
 
     # prepare JSON-friendly lists for charts
     source_labels = [s or 'unknown' for s, c in per_source]
     source_counts = [c for s, c in per_source]
 
-    # scraping speed: compute overall average articles/hour and recent 24h rate
-    try:
-        min_created, max_created = db.session.query(func.min(Article.created_at), func.max(Article.created_at)).one()
-        if min_created and max_created and max_created > min_created:
-            hours = (max_created - min_created).total_seconds() / 3600.0
-        else:
-            hours = 1.0
-        avg_per_hour = total_articles / max(1.0, hours)
-        from datetime import timedelta
-        since = datetime.utcnow() - timedelta(days=1)
-        last_24h = Article.query.filter(Article.created_at >= since).count()
-        last_24h_per_hour = last_24h / 24.0
-    except Exception:
-        avg_per_hour = 0.0
-        last_24h = 0
-        last_24h_per_hour = 0.0
-
     scraping_stats = {
-        'avg_per_hour': avg_per_hour,
-        'last_24h': last_24h,
-        'last_24h_per_hour': last_24h_per_hour,
+        'avg_per_hour': stats["avg_per_hour"],
+        'last_24h': stats["last_24h"],
+        'last_24h_per_hour': stats["last_24h_per_hour"],
     }
+    per_spider_stats = {source or 'unknown': s for source, s in stats["per_source"].items()}
 
-    # per-spider statistics: total, avg/hr (based on min/max created_at per source), last 24h counts
-    try:
-        src_rows = db.session.query(Article.source, func.count(Article.id), func.min(Article.created_at), func.max(Article.created_at)).group_by(Article.source).all()
-        per_spider_stats = {}
-        from datetime import timedelta
-        since = datetime.utcnow() - timedelta(days=1)
-        for source, cnt, min_c, max_c in src_rows:
-            name = source or 'unknown'
-            if min_c and max_c and max_c > min_c:
-                hrs = (max_c - min_c).total_seconds() / 3600.0
-            else:
-                hrs = 1.0
-            avg = cnt / max(1.0, hrs)
-            last_24h_cnt = db.session.query(func.count(Article.id)).filter(Article.source == source, Article.created_at >= since).scalar() or 0
-            per_spider_stats[name] = {
-                'total': cnt,
-                'avg_per_hour': avg,
-                'last_24h': last_24h_cnt,
-                'last_24h_per_hour': last_24h_cnt / 24.0,
-            }
-    except Exception:
-        per_spider_stats = {}
-
-    return render_template('analytics.html', total_articles=total_articles, per_source=per_source,
+    return render_template('analytics.html', total_articles=stats["total_articles"], per_source=per_source,
                            job_counts=job_counts, recent_jobs=recent_jobs, recent_articles=recent_articles,
                            source_labels=source_labels, source_counts=source_counts,
                            scraping_stats=scraping_stats, per_spider_stats=per_spider_stats)
+
+
+@main_bp.route("/api/analytics/daily")
+def api_analytics_daily():
+    # articles per source and day from the rollups, oldest first (?days=, max 366)
+    try:
+        days = min(max(int(request.args.get("days", 30)), 1), 366)
+    except ValueError:
+        return jsonify({"error": "days must be an integer"}), 400
+    return jsonify({
+        source or "unknown": [{"date": d.isoformat(), "articles": n} for d, n in series]
+        for source, series in analytics_daily(days).items()
+    })
@@ -10,16 +10,14 @@ $log = Join-Path $logDir "scrape-$ts.log"
 # If you use a venv, uncomment and update the Activate path
 # & "$project\venv\Scripts\Activate.ps1"
 
-# Run each scraper in parallel as a separate process (non-blocking).
-# This will start one process per scraper and return immediately.
+# Run all scrapers in parallel inside one runner process (non-blocking):
+# one Scrapy reactor and one browser shared by every spider.
 Set-Location $project
-$spiders = @('philstar','rappler','manilabulletin','pna')
-foreach ($s in $spiders) {
-    $spiderLog = Join-Path $logDir "scrape-$s-$ts.log"
-    $spiderErr = Join-Path $logDir "scrape-$s-$ts.err.log"
-    "Starting $s at $(Get-Date)" | Out-File -FilePath $spiderLog -Append
-    Start-Process -FilePath $python -ArgumentList "-m","scrapy_spiders.runner",$s,"--pages","0","--limit","0" -RedirectStandardOutput $spiderLog -RedirectStandardError $spiderErr -WindowStyle Hidden
-}
+$spiders = 'philstar,rappler,manilabulletin,pna'
+$spiderLog = Join-Path $logDir "scrape-all-$ts.log"
+$spiderErr = Join-Path $logDir "scrape-all-$ts.err.log"
+"Starting $spiders at $(Get-Date)" | Out-File -FilePath $spiderLog -Append
+Start-Process -FilePath $python -ArgumentList "-m","scrapy_spiders.runner",$spiders,"--pages","0","--limit","0" -RedirectStandardOutput $spiderLog -RedirectStandardError $spiderErr -WindowStyle Hidden
 
 # Optional: write a short marker to the log
 "`nStarted scrapers at $(Get-Date)`n" | Out-File -FilePath $log -Append
\ No newline at end of file
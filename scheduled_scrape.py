@@ -1,5 +1,6 @@
 """scheduled_scrape.py
-Create ScrapeJob rows and launch one Scrapy runner per scraper (parallel).
+Create one ScrapeJob row per scraper and launch a single Scrapy runner that
+crawls them all in parallel (one process, one reactor, one browser).
 Intended to be run by Task Scheduler or manually.
 """
 import os
@@ -23,31 +24,34 @@ def main(pages=0, limit=0):
 
     app = create_app()
 
-    # create one ScrapeJob per scraper and launch runner with that job id
-    for name in SCRAPERS:
-        with app.app_context():
+    # create one ScrapeJob per scraper; the runner updates each of them
+    job_ids = {}
+    with app.app_context():
+        for name in SCRAPERS:
             job = ScrapeJob(spider=name, status="running")
             db.session.add(job)
             db.session.commit()
-            job_id = job.id
+            job_ids[name] = job.id
 
-        ts = datetime.datetime.utcnow().strftime("%Y%m%d-%H%M%S")
-        out_path = os.path.join(logdir, f"scheduled-{name}-{ts}.log")
-        err_path = os.path.join(logdir, f"scheduled-{name}-{ts}.err.log")
+    ts = datetime.datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    out_path = os.path.join(logdir, f"scheduled-{ts}.log")
+    err_path = os.path.join(logdir, f"scheduled-{ts}.err.log")
 
-        # open log files (append) and launch process
-        f_out = open(out_path, "a", encoding="utf-8")
-        f_err = open(err_path, "a", encoding="utf-8")
-        f_out.write(f"Starting {name} job {job_id} at {datetime.datetime.utcnow().isoformat()}\n")
-        f_out.flush()
+    # open log files (append) and launch process
+    f_out = open(out_path, "a", encoding="utf-8")
+    f_err = open(err_path, "a", encoding="utf-8")
+    jobs = ",".join(f"{name}={job_id}" for name, job_id in job_ids.items())
+    f_out.write(f"Starting {jobs} at {datetime.datetime.utcnow().isoformat()}\n")
+    f_out.flush()
 
-        cmd = [sys.executable, "-m", "scrapy_spiders.runner", name, "--pages", str(pages), "--limit", str(limit), "--job-id", str(job_id)]
-        popen_kwargs = {"stdout": f_out, "stderr": f_err}
-        # on Windows keep the process window hidden
-        if os.name == "nt":
-            popen_kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+    cmd = [sys.executable, "-m", "scrapy_spiders.runner", ",".join(SCRAPERS), "--pages", str(pages),
+           "--limit", str(limit), "--job-ids", jobs]
+    popen_kwargs = {"stdout": f_out, "stderr": f_err}
+    # on Windows keep the process window hidden
+    if os.name == "nt":
+        popen_kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
 
-        subprocess.Popen(cmd, **popen_kwargs)
+    subprocess.Popen(cmd, **popen_kwargs)
 
     print("Launched all scrapers")
 
@@ -0,0 +1,202 @@
+"""Keeping Playwright renders cheap.
+
+- ``should_abort_request`` is installed as scrapy-playwright's
+  ``PLAYWRIGHT_ABORT_REQUEST``. It aborts sub-resources we never parse
+  (images, media, fonts, ...) and anything served from ad/tracker domains.
+  The page document itself is never aborted. Configure with
+  ``configure_blocking`` (the runner passes the ``BROWSER_BLOCK_RESOURCE_TYPES``
+  / ``BROWSER_BLOCK_DOMAINS`` settings).
+- ``BrowserPoolMiddleware`` (downloader middleware) spreads Playwright
+  requests over a small fixed pool of lightweight browser contexts
+  (``BROWSER_CONTEXT_POOL_SIZE``) instead of one context that accumulates
+  every page, and records render time per request and the time each page
+  spent in the wait helpers of ``scrapy_spiders.waits``.
+
+Counters live at module level because the abort predicate runs inside the
+download handler without access to the crawler. ``record_browser_stats``
+copies them into the crawl stats under ``browser/*``. Aborted requests are
+never downloaded, so "bytes saved" is an estimate based on typical sizes per
+resource type.
+"""
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_RESOURCE_TYPES = ("image", "media", "font", "texttrack", "manifest", "beacon")
+DEFAULT_BLOCK_DOMAINS = (
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "googletagservices.com",
+    "googletagmanager.com", "google-analytics.com", "adservice.google.com", "amazon-adsystem.com",
+    "adnxs.com", "criteo.com", "criteo.net", "pubmatic.com", "rubiconproject.com", "openx.net",
+    "taboola.com", "outbrain.com", "scorecardresearch.com", "chartbeat.com", "chartbeat.net",
+    "quantserve.com", "hotjar.com", "nr-data.net", "connect.facebook.net", "ads-twitter.com",
+    "teads.tv", "smartadserver.com", "onesignal.com", "moatads.com", "adsafeprotected.com",
+)
+
+# rough transfer sizes (bytes) of what a blocked request would have cost
+TYPICAL_BYTES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 30_000,
+    "script": 25_000,
+    "stylesheet": 15_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_TYPICAL_BYTES = 5_000
+
+# Playwright contexts per spider and pages per context; together they cap
+# concurrent pages per spider (each crawler has its own browser)
+DEFAULT_CONTEXT_POOL_SIZE = 2
+DEFAULT_MAX_PAGES_PER_CONTEXT = 4
+
+# Lightweight context options: no service workers (they bypass request
+# interception), small viewport, no downloads
+CONTEXT_KWARGS = {
+    "service_workers": "block",
+    "viewport": {"width": 1280, "height": 900},
+    "accept_downloads": False,
+}
+
+_CONFIG = {
+    "resource_types": frozenset(DEFAULT_BLOCK_RESOURCE_TYPES),
+    "domains": frozenset(DEFAULT_BLOCK_DOMAINS),
+}
+_COUNTS = Counter()
+_LOCK = threading.Lock()
+
+
+def configure_blocking(resource_types=None, domains=None):
+    """Replace the blocked resource types / domain suffixes (None keeps the default)."""
+    if resource_types is not None:
+        _CONFIG["resource_types"] = frozenset(t.strip().lower() for t in resource_types if t.strip())
+    if domains is not None:
+        _CONFIG["domains"] = frozenset(d.strip().lower().lstrip(".") for d in domains if d.strip())
+
+
+def _host(url):
+    # cheap host extraction; this runs for every sub-request of every page
+    rest = url.split("://", 1)[-1]
+    host = rest.split("/", 1)[0].split("?", 1)[0].rsplit("@", 1)[-1]
+    return host.split(":", 1)[0].lower()
+
+
+def _blocked_domain(host, domains):
+    while host:
+        if host in domains:
+            return True
+        dot = host.find(".")
+        if dot < 0:
+            return False
+        host = host[dot + 1:]
+    return False
+
+
+def should_abort_request(request):
+    """PLAYWRIGHT_ABORT_REQUEST predicate; ``request`` is a playwright Request."""
+    resource_type = request.resource_type
+    if resource_type == "document" and request.is_navigation_request():
+        return False
+    reason = None
+    if resource_type in _CONFIG["resource_types"]:
+        reason = resource_type
+    elif _blocked_domain(_host(request.url), _CONFIG["domains"]):
+        reason = "domain"
+    with _LOCK:
+        _COUNTS["requests"] += 1
+        if reason:
+            _COUNTS["aborted"] += 1
+            _COUNTS[f"aborted/{reason}"] += 1
+            _COUNTS["est_bytes_saved"] += TYPICAL_BYTES.get(resource_type, DEFAULT_TYPICAL_BYTES)
+    return reason is not None
+
+
+def record_render(latency):
+    with _LOCK:
+        ms = int(latency * 1000)
+        _COUNTS["renders"] += 1
+        _COUNTS["render_ms_total"] += ms
+        if ms > _COUNTS["render_ms_max"]:
+            _COUNTS["render_ms_max"] = ms
+
+
+def record_wait(kind, ms, timed_out=False, scrolls=0):
+    """Count one wait helper call (``kind`` is "selector" or "scroll")."""
+    with _LOCK:
+        _COUNTS["waits"] += 1
+        _COUNTS[f"waits/{kind}"] += 1
+        _COUNTS["wait_ms_total"] += ms
+        if ms > _COUNTS["wait_ms_max"]:
+            _COUNTS["wait_ms_max"] = ms
+        if timed_out:
+            _COUNTS["wait_timeouts"] += 1
+        if scrolls:
+            _COUNTS["scrolls"] += scrolls
+
+
+def page_wait_ms(meta):
+    """Total time the page methods of a rendered request spent in the wait helpers (or None)."""
+    total = None
+    for pm in meta.get("playwright_page_methods") or ():
+        res = getattr(pm, "result", None)
+        if isinstance(res, dict) and "waited_ms" in res:
+            total = (total or 0) + res["waited_ms"]
+    return total
+
+
+def browser_stats():
+    with _LOCK:
+        stats = dict(_COUNTS)
+    if stats.get("renders"):
+        stats["render_ms_avg"] = round(stats["render_ms_total"] / stats["renders"], 1)
+    if stats.get("waits"):
+        stats["wait_ms_avg"] = round(stats["wait_ms_total"] / stats["waits"], 1)
+    return stats
+
+
+def record_browser_stats(stats):
+    """Copy the browser counters into a Scrapy stats collector."""
+    if stats is None:
+        return
+    for key, value in browser_stats().items():
+        stats.set_value(f"browser/{key}", value)
+
+
+class BrowserPoolMiddleware:
+    """Assign Playwright requests to a bounded pool of lightweight contexts.
+
+    Requests that already name a ``playwright_context`` are left alone.
+    """
+
+    def __init__(self, stats, pool_size=DEFAULT_CONTEXT_POOL_SIZE):
+        self.stats = stats
+        self.pool_size = max(1, int(pool_size))
+        self._next = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy import signals
+        mw = cls(crawler.stats, crawler.settings.getint("BROWSER_CONTEXT_POOL_SIZE", DEFAULT_CONTEXT_POOL_SIZE))
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def process_request(self, request, spider=None):
+        if request.meta.get("playwright") and "playwright_context" not in request.meta:
+            request.meta["playwright_context"] = f"pool-{self._next % self.pool_size}"
+            request.meta.setdefault("playwright_context_kwargs", dict(CONTEXT_KWARGS))
+            self._next += 1
+        return None
+
+    def process_response(self, request, response, spider=None):
+        if request.meta.get("playwright") and "download_latency" in request.meta:
+            record_render(request.meta["download_latency"])
+            waited = page_wait_ms(request.meta)
+            if waited is not None:
+                request.meta["browser_wait_ms"] = waited
+                logger.debug("Rendered %s in %.0f ms (%d ms waiting for content)",
+                             request.url, request.meta["download_latency"] * 1000, waited)
+        return response
+
+    def spider_closed(self, spider):
+        record_browser_stats(self.stats)
@@ -1,61 +1,173 @@
 from app import create_app
-from app.models import Article
-from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
-from functools import lru_cache
-
-
-def _normalize_url(u: str) -> str:
-    if not u:
-        return u
-    try:
-        p = urlparse(u)
-    except Exception:
-        return u
-    scheme = (p.scheme or "http").lower()
-    netloc = (p.netloc or "").lower()
-    qs = parse_qsl(p.query, keep_blank_values=True)
-    filtered = [(k, v) for (k, v) in qs if not (k.startswith("utm_") or k in ("fbclid", "gclid"))]
-    query = urlencode(filtered)
-    path = p.path or ""
-    if path.endswith("/") and path != "/":
-        path = path.rstrip("/")
-    return urlunparse((scheme, netloc, path, "", query, ""))
-
-
-# Module-level cache of existing URLs (normalized), populated by preload_existing_urls()
-EXISTING_URLS = None
-
-
-def get_existing_urls() -> set:
-    """Load all Article.url values from the DB and return a set of normalized URLs."""
-    app = create_app()
+from app.models import Article, ScrapeJob
+import os
+import threading
+
+from scrapy_spiders.seen import SeenUrlIndex, DEFAULT_CAPACITY, DEFAULT_ERROR_RATE
+from scrapy_spiders.urls import normalize_url
+
+
+# One Flask app per process for DB lookups; creating an app per call builds a
+# new engine (and may run create_all) every time.
+_APP = None
+_APP_LOCK = threading.Lock()
+
+
+def _get_app():
+    global _APP
+    if _APP is None:
+        with _APP_LOCK:
+            if _APP is None:
+                _APP = create_app()
+    return _APP
+
+
+# Module-level seen-URL index shared by every spider (and the pipeline) in
+# this process, created by preload_existing_urls()
+SEEN_INDEX = None
+_SEEN_CONFIG = {
+    "path": os.environ.get("SEEN_INDEX_PATH") or None,
+    "capacity": DEFAULT_CAPACITY,
+    "error_rate": DEFAULT_ERROR_RATE,
+    "read_only": False,
+}
+
+# URLs per IN (...) query when confirming probable hits
+CONFIRM_CHUNK_SIZE = 500
+
+
+def configure_seen_index(path=None, capacity=None, error_rate=None, read_only=None):
+    """Override seen-index settings; call before preload_existing_urls()."""
+    if path:
+        _SEEN_CONFIG["path"] = path
+    if capacity:
+        _SEEN_CONFIG["capacity"] = int(capacity)
+    if error_rate:
+        _SEEN_CONFIG["error_rate"] = float(error_rate)
+    if read_only is not None:
+        _SEEN_CONFIG["read_only"] = bool(read_only)
+
+
+def get_existing_urls(since_id=0, batch_size=10000):
+    """Yield ``(id, normalized url)`` for Article rows with ``id > since_id``.
+
+    Rows are read in primary-key order in batches of ``batch_size``, so a
+    caller that remembers the last id only ever scans new rows.
+    """
+    app = _get_app()
     with app.app_context():
-        rows = Article.query.with_entities(Article.url).all()
-        return set(r[0] for r in rows if r[0])
+        last_id = since_id or 0
+        while True:
+            rows = (
+                Article.query.with_entities(Article.id, Article.url)
+                .filter(Article.id > last_id)
+                .order_by(Article.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                return
+            for id_, url in rows:
+                yield id_, normalize_url(url) if url else url
+            last_id = rows[-1][0]
 
 
 def preload_existing_urls():
-    """Populate the module-level EXISTING_URLS set and return it."""
-    global EXISTING_URLS
-    if EXISTING_URLS is None:
-        EXISTING_URLS = set(_normalize_url(u) for u in get_existing_urls())
-    return EXISTING_URLS
+    """Return the process-wide seen-URL index, creating it on first use.
+
+    The Bloom filter itself is loaded lazily on the first lookup, so calling
+    this from several spiders' ``__init__`` costs nothing extra.
+    """
+    global SEEN_INDEX
+    if SEEN_INDEX is None:
+        SEEN_INDEX = SeenUrlIndex(
+            path=_SEEN_CONFIG["path"],
+            capacity=_SEEN_CONFIG["capacity"],
+            error_rate=_SEEN_CONFIG["error_rate"],
+            url_source=get_existing_urls,
+            read_only=_SEEN_CONFIG["read_only"],
+        )
+    return SEEN_INDEX
+
+
+def _stored_urls(normalized):
+    """Return the subset of ``normalized`` URLs present in the Article table."""
+    found = set()
+    app = _get_app()
+    with app.app_context():
+        for start in range(0, len(normalized), CONFIRM_CHUNK_SIZE):
+            chunk = normalized[start:start + CONFIRM_CHUNK_SIZE]
+            rows = Article.query.with_entities(Article.url).filter(Article.url.in_(chunk)).all()
+            found.update(r[0] for r in rows)
+    return found
+
+
+def filter_new_urls(urls):
+    """Return the URLs from ``urls`` that are not stored yet, in order.
+
+    URLs missing from the seen index are new without touching the DB; the
+    probable hits are confirmed with a single ``IN (...)`` query. Repeated
+    URLs are returned once.
+    """
+    index = preload_existing_urls()
+    candidates = []
+    probable = []
+    seen_here = set()
+    for url in urls:
+        if not url:
+            continue
+        n = normalize_url(url)
+        if n in seen_here:
+            continue
+        seen_here.add(n)
+        candidates.append((url, n))
+        if index.might_contain(n):
+            probable.append(n)
+
+    stored = _stored_urls(probable) if probable else set()
+    for n in probable:
+        index.record_confirmation(n in stored)
+    return [url for url, n in candidates if n not in stored]
 
 
-@lru_cache(maxsize=8192)
 def url_exists(url: str) -> bool:
-    """Return True if the given URL exists in DB or in the preloaded set.
+    """Return True if the given URL is already stored.
 
-    The function normalizes the URL first. If `preload_existing_urls` has been
-    called, the check is O(1) against the in-memory set. Otherwise, it falls
-    back to a DB query and caches the result.
+    The URL is normalized and looked up in the seen index; only a probable
+    hit is confirmed with a DB query. Prefer ``filter_new_urls`` for the
+    links of a whole listing page.
     """
     if not url:
         return False
-    n = _normalize_url(url)
-    if EXISTING_URLS is not None:
-        return n in EXISTING_URLS
-    # fallback to DB query
-    app = create_app()
+    return not filter_new_urls([url])
+
+
+def last_crawl_time(spider_name):
+    """Return when the last finished ScrapeJob for ``spider_name`` started, or None.
+
+    The start time (not the finish time) is used so that articles published
+    while that crawl was running are picked up again.
+    """
+    app = _get_app()
     with app.app_context():
-        return Article.query.filter_by(url=n).first() is not None
+        row = (
+            ScrapeJob.query.with_entities(ScrapeJob.started_at)
+            .filter(ScrapeJob.spider == spider_name, ScrapeJob.status == "finished")
+            .order_by(ScrapeJob.started_at.desc())
+            .first()
+        )
+    return row[0] if row else None
+
+
+def mark_urls_seen(urls):
+    """Add just-stored URLs to the seen index (called by the pipeline)."""
+    index = preload_existing_urls()
+    index.add_many(normalize_url(u) for u in urls)
+
+
+def record_seen_index_stats(stats):
+    """Copy the seen index counters into a Scrapy stats collector."""
+    if SEEN_INDEX is None or stats is None:
+        return
+    for key, value in SEEN_INDEX.stats().items():
+        stats.set_value(f"seen_index/{key}", value)
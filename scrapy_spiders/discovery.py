@@ -0,0 +1,237 @@
+"""Sitemap and RSS/Atom discovery of article URLs.
+
+Instead of rendering listing pages, a spider can read the site's
+``sitemap.xml`` / news sitemap (``SITEMAP_URLS``) or RSS/Atom feeds
+(``FEED_URLS``). Documents are parsed with a streaming XML parser, so a
+50,000-URL sitemap never sits in memory as a tree. Entries older than the
+last finished crawl (``lastmod``, news ``publication_date``, ``pubDate``,
+``updated``) are dropped, the rest go through ``filter_new_urls`` and only
+new URLs reach ``parse_article``. Sitemap indexes are followed.
+
+The parsers only take bytes, so saved feeds can be checked offline:
+
+    python -m scrapy_spiders.discovery saved_sitemap.xml --since 2025-08-01
+"""
+import argparse
+import gzip
+import io
+import sys
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+import scrapy
+
+from scrapy_spiders.db import filter_new_urls, last_crawl_time
+from scrapy_spiders.pagination import as_bool
+
+PAGE = "page"
+SITEMAP = "sitemap"
+
+# kind is PAGE (an article candidate) or SITEMAP (a child of a sitemap index)
+DiscoveredUrl = namedtuple("DiscoveredUrl", "loc lastmod kind")
+
+# elements that describe one URL, by local name
+_ENTRY_TAGS = {"url", "sitemap", "item", "entry"}
+# child elements carrying the entry's date, in order of preference
+_DATE_TAGS = ("lastmod", "publication_date", "pubDate", "date", "updated", "published")
+
+# sitemap indexes pointing at further indexes are followed this deep
+MAX_SITEMAP_DEPTH = 2
+# re-check entries dated slightly before the last crawl started
+DISCOVERY_OVERLAP = timedelta(hours=1)
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def parse_date(value):
+    """Parse W3C/ISO 8601 or RFC 822 dates into naive UTC datetimes (None if unparseable)."""
+    if not value:
+        return None
+    value = value.strip()
+    dt = None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            dt = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _entry(elem, kind):
+    loc = None
+    lastmod = None
+    dates = {}
+    for child in elem.iter():
+        if child is elem:
+            continue
+        name = _local(child.tag)
+        text = (child.text or "").strip()
+        if name == "loc" and not loc:
+            loc = text
+        elif name == "link" and not loc:
+            # RSS <link>url</link>; Atom <link rel="alternate" href="url"/>
+            if text:
+                loc = text
+            elif child.get("href") and child.get("rel", "alternate") == "alternate":
+                loc = child.get("href").strip()
+        elif name == "guid" and text.startswith("http") and child.get("isPermaLink", "true") != "false":
+            dates.setdefault("_guid", text)
+        elif name in _DATE_TAGS and text:
+            dates.setdefault(name, text)
+    loc = loc or dates.get("_guid")
+    for name in _DATE_TAGS:
+        if name in dates:
+            lastmod = parse_date(dates[name])
+            if lastmod:
+                break
+    if not loc:
+        return None
+    return DiscoveredUrl(loc, lastmod, kind)
+
+
+def _stream(data):
+    if data[:2] == b"\x1f\x8b":
+        # sitemap.xml.gz served without Content-Encoding
+        return gzip.GzipFile(fileobj=io.BytesIO(data))
+    return io.BytesIO(data)
+
+
+def iter_entries(data, since=None):
+    """Yield ``DiscoveredUrl`` entries from a sitemap, sitemap index, RSS or Atom document.
+
+    ``data`` is the raw (optionally gzipped) document. With ``since`` (naive
+    UTC datetime), entries dated before it are skipped; undated entries are
+    always yielded. Malformed documents yield whatever was parsed before the
+    error.
+    """
+    parents = []
+    try:
+        for event, elem in ET.iterparse(_stream(data), events=("start", "end")):
+            if event == "start":
+                parents.append(elem)
+                continue
+            parents.pop()
+            name = _local(elem.tag)
+            if name not in _ENTRY_TAGS:
+                continue
+            entry = _entry(elem, SITEMAP if name == "sitemap" else PAGE)
+            # drop the processed subtree so memory stays flat
+            elem.clear()
+            if parents:
+                parents[-1].remove(elem)
+            if entry is None:
+                continue
+            if since is not None and entry.lastmod is not None and entry.lastmod < since:
+                continue
+            yield entry
+    except (ET.ParseError, OSError, EOFError):
+        return
+
+
+def _split(value):
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return list(value or [])
+
+
+class DiscoveryMixin:
+    """Mixin that lets a spider start from its sitemaps/feeds instead of listings.
+
+    Spiders set ``SITEMAP_URLS`` / ``FEED_URLS``, call ``init_discovery`` from
+    ``__init__`` and, in ``start_requests``, yield ``discovery_requests()``
+    when ``use_discovery()`` is true. Article requests are built by
+    ``make_article_request`` so Playwright spiders can reuse their meta.
+    """
+
+    SITEMAP_URLS = ()
+    FEED_URLS = ()
+    discovery = False
+
+    def init_discovery(self, discovery=False, since=None, sitemap_urls=None, feed_urls=None):
+        self.discovery = as_bool(discovery)
+        # explicit cutoff (ISO date); otherwise the last finished job is used
+        self.discovery_since = parse_date(since) if since else None
+        # comma-separated overrides, e.g. file:// URLs of saved fixtures
+        if sitemap_urls:
+            self.SITEMAP_URLS = _split(sitemap_urls)
+        if feed_urls:
+            self.FEED_URLS = _split(feed_urls)
+
+    def use_discovery(self):
+        if not self.discovery:
+            return False
+        if not (self.SITEMAP_URLS or self.FEED_URLS):
+            self.logger.warning("%s has no SITEMAP_URLS/FEED_URLS; crawling listings instead", self.name)
+            return False
+        return True
+
+    def make_article_request(self, url):
+        return scrapy.Request(url, callback=self.parse_article)
+
+    def accept_discovered_url(self, url):
+        """Return False for feed entries that are not articles (override per site)."""
+        return True
+
+    def discovery_requests(self):
+        if self.discovery_since is None:
+            try:
+                last = last_crawl_time(self.name)
+            except Exception as exc:
+                self.logger.warning("Could not read last crawl time: %s", exc)
+                last = None
+            if last is not None:
+                self.discovery_since = last - DISCOVERY_OVERLAP
+        self.logger.info("Discovery for %s since %s", self.name, self.discovery_since or "the beginning")
+        for url in list(self.SITEMAP_URLS) + list(self.FEED_URLS):
+            yield scrapy.Request(url, callback=self.parse_discovery, dont_filter=True,
+                                 meta={"discovery_depth": 0})
+
+    def parse_discovery(self, response):
+        stats = self.crawler.stats if getattr(self, "crawler", None) is not None else None
+        depth = response.meta.get("discovery_depth", 0)
+        pages = []
+        for entry in iter_entries(response.body, since=self.discovery_since):
+            if entry.kind == SITEMAP:
+                if depth < MAX_SITEMAP_DEPTH:
+                    yield scrapy.Request(entry.loc, callback=self.parse_discovery,
+                                         meta={"discovery_depth": depth + 1})
+                continue
+            if self.accept_discovered_url(entry.loc):
+                pages.append(entry.loc)
+
+        new_links = filter_new_urls(pages)
+        if stats is not None:
+            stats.inc_value("discovery/documents")
+            stats.inc_value("discovery/entries", len(pages))
+            stats.inc_value("discovery/new_urls", len(new_links))
+        for link in new_links:
+            yield self.make_article_request(link)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List the URLs found in saved sitemap/RSS/Atom files.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--since", help="skip entries dated before this ISO date/time (UTC)")
+    args = parser.parse_args(argv)
+    since = parse_date(args.since) if args.since else None
+    total = 0
+    for path in args.files:
+        with open(path, "rb") as fh:
+            data = fh.read()
+        for entry in iter_entries(data, since=since):
+            lastmod = entry.lastmod.isoformat() if entry.lastmod else "-"
+            print(f"{entry.kind}\t{lastmod}\t{entry.loc}")
+            total += 1
+    print(f"{total} entries", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""HTML extraction helpers on top of Scrapy's selectors (parsel/lxml).
+
+The spiders used to build a ``BeautifulSoup(response.text, 'html.parser')``
+tree for every listing and article page. Scrapy already parses each response
+with lxml (``response.selector``), which is an order of magnitude faster, so
+the spiders query that tree instead. The helpers here keep BeautifulSoup's
+semantics where the item dicts depend on them:
+
+- ``get_text`` matches ``Tag.get_text(separator, strip=True)``: text nodes
+  are stripped, empty ones dropped, and text inside ``<script>``, ``<style>``
+  and ``<template>`` is ignored, as BeautifulSoup does.
+- ``first`` returns the first match of the first query that matches, like
+  ``soup.find(a) or soup.find(b)``.
+
+Each spider module exposes ``LISTING_LINKS_XPATH`` (one XPath returning the
+article hrefs of a listing page) and ``extract_article(sel, url)``, which
+takes any selector (a response or ``parsel.Selector(text=html)``) so it can
+be benchmarked or run outside the crawl.
+"""
+from parsel import Selector
+
+_TEXT_XPATH = ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]"
+
+
+def selector(html):
+    """Build a selector from saved HTML (str or bytes)."""
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", "replace")
+    return Selector(text=html)
+
+
+def first(sel, *queries):
+    """Return the first element matching any of ``queries`` (tried in order), or None.
+
+    Queries starting with ``/`` or ``.`` are XPath, anything else is CSS.
+    """
+    for q in queries:
+        found = sel.xpath(q) if q.startswith(("/", ".")) else sel.css(q)
+        if found:
+            return found[0]
+    return None
+
+
+def get_text(sel, separator="", strip=True):
+    """Text of ``sel`` the way BeautifulSoup's ``get_text`` returns it."""
+    if sel is None:
+        return ""
+    parts = sel.xpath(_TEXT_XPATH).getall()
+    if strip:
+        parts = [p.strip() for p in parts]
+        parts = [p for p in parts if p]
+    return separator.join(parts)
+
+
+def attr(sel, name, default=None):
+    """Attribute value of ``sel`` (like ``tag.get(name)``)."""
+    if sel is None:
+        return default
+    return sel.attrib.get(name, default)
+
+
+def links(sel, xpath):
+    """Return the hrefs matched by a single ``.../@href`` XPath, in document order."""
+    return sel.xpath(xpath).getall()
@@ -0,0 +1,366 @@
+"""Disk-backed request frontier, so a killed crawl can be resumed.
+
+Scrapy keeps its scheduler queue in memory. When the runner is killed
+(task restart, OOM), a long ``--pages 0`` crawl would start again from page 1.
+``FrontierMiddleware`` (a spider middleware the runner enables for crawls
+with a ScrapeJob) records the crawl in a SQLite file per job,
+``instance/scrapy/frontier/job-<id>.sqlite``:
+
+- Every request a spider yields is stored (fingerprint + serialized request)
+  as pending.
+- The entry is marked done once the callback for its response has run to
+  the end, or, if it yielded items, once the pipeline has written all of
+  them (the ``items_stored`` signal of ``SQLAlchemyPipeline``;
+  ``item_scraped`` fires as soon as an item is queued for writing). Its
+  serialized request is dropped then, so completed entries shrink to a
+  fingerprint. If the pipeline could not write one of its items
+  (``items_failed``), the entry stays pending and is fetched again on
+  resume.
+- Writes are buffered in memory and committed in a single transaction
+  every ``FRONTIER_CHECKPOINT_INTERVAL`` seconds (default 5) and when the
+  spider closes. A kill loses at most that much progress, and a request
+  is never marked done without its children being saved in the same
+  transaction.
+- A crawl that finishes normally deletes its file. Freed pages are given
+  back to the file system (incremental vacuum) every few checkpoints.
+
+``runner --resume JOB_ID`` sets ``FRONTIER_RESUME``. The pending entries of
+that job's file are scheduled first. The spider's start requests are still
+read (so spiders set up their listings), but only those not already in the
+file are scheduled, and neither are later requests whose fingerprint is.
+Requests whose download failed stay pending and are retried on resume.
+Counters are under ``frontier/*``.
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import time
+
+from scrapy import Request, signals
+from scrapy.spidermiddlewares.base import BaseSpiderMiddleware
+from scrapy.utils.request import request_from_dict
+from twisted.internet import task
+
+from scrapy_spiders.signals import items_failed, items_stored
+from scrapy_spiders.state import state_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_INTERVAL = 5.0
+# run an incremental vacuum every this many checkpoints
+VACUUM_EVERY = 60
+
+PENDING, DONE = 0, 1
+
+
+def frontier_path(job_id):
+    return state_path("frontier", f"job-{int(job_id)}.sqlite")
+
+
+class Frontier:
+    """The SQLite file behind one job's frontier, with buffered writes."""
+
+    def __init__(self, path):
+        self.path = path
+        new = not os.path.exists(path)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        if new:
+            # must be set before the first table is created
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " fp TEXT NOT NULL UNIQUE,"
+            " state INTEGER NOT NULL DEFAULT 0,"
+            " data BLOB)"
+        )
+        self._added = []
+        self._done = []
+        self.checkpoints = 0
+
+    def known(self):
+        """Fingerprints of every entry, pending or done."""
+        return {row[0] for row in self.conn.execute("SELECT fp FROM entries")}
+
+    def pending(self):
+        """Serialized pending requests, oldest first."""
+        for fp, data in self.conn.execute("SELECT fp, data FROM entries WHERE state = ? ORDER BY seq", (PENDING,)):
+            if data is not None:
+                yield fp, data
+
+    def add(self, fp, data):
+        self._added.append((fp, data))
+
+    def done(self, fp):
+        self._done.append(fp)
+
+    def checkpoint(self):
+        """Commit the buffered writes in one transaction; returns how many were written."""
+        added, done = self._added, self._done
+        if not added and not done:
+            return 0
+        self._added, self._done = [], []
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany("INSERT OR IGNORE INTO entries (fp, state, data) VALUES (?, 0, ?)", added)
+            self.conn.executemany("UPDATE entries SET state = 1, data = NULL WHERE fp = ?", ((fp,) for fp in done))
+        self.checkpoints += 1
+        if self.checkpoints % VACUUM_EVERY == 0:
+            self.conn.execute("PRAGMA incremental_vacuum")
+        return len(added) + len(done)
+
+    def close(self, delete=False):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        if delete:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(self.path + suffix)
+                except OSError:
+                    pass
+
+
+class FrontierMiddleware(BaseSpiderMiddleware):
+    """Records requests and completed responses in the job's ``Frontier``.
+
+    Inactive unless the spider has a ``job_id`` and ``FRONTIER_ENABLED`` is
+    true. Sits closer to the spider than ``RenderPolicyMiddleware``, so the
+    browser retries it emits are not recorded as new entries.
+    """
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        settings = crawler.settings
+        self.enabled = settings.getbool("FRONTIER_ENABLED", False)
+        self.resume = settings.getbool("FRONTIER_RESUME", False)
+        self.interval = settings.getfloat("FRONTIER_CHECKPOINT_INTERVAL", DEFAULT_CHECKPOINT_INTERVAL)
+        self.stats = crawler.stats
+        self.frontier = None
+        self.known = set()
+        self._loop = None
+        self._unserializable = 0
+        # without the database pipeline nothing sends items_stored; a
+        # scraped item is as far as it gets then
+        self.wait_for_store = any("SQLAlchemyPipeline" in str(path) for path in settings.getdict("ITEM_PIPELINES"))
+        # id(item) -> fingerprint of the response that yielded it, and
+        # fingerprint -> items of that response not stored (or dropped) yet
+        self._awaiting = {}
+        self._outstanding = {}
+        # fingerprints whose callback has finished but whose items have not all been stored
+        self._exhausted = set()
+        # fingerprints with an item the pipeline failed to write: never marked done
+        self._failed = set()
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(self.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(self.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(self.items_stored, signal=items_stored)
+        crawler.signals.connect(self.items_failed, signal=items_failed)
+
+    def spider_opened(self, spider):
+        job_id = getattr(spider, "job_id", None)
+        if not self.enabled or not job_id:
+            return
+        path = frontier_path(job_id)
+        if not self.resume and os.path.exists(path):
+            # a new run under an old job id starts from scratch
+            Frontier(path).close(delete=True)
+        self.frontier = Frontier(path)
+        if self.resume:
+            self.known = self.frontier.known()
+        self._loop = task.LoopingCall(self.checkpoint)
+        self._loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.frontier is None:
+            return
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        self.checkpoint()
+        finished = reason == "finished"
+        if not finished:
+            logger.info("Crawl state kept in %s; continue with --resume %s", self.frontier.path, spider.job_id)
+        self.frontier.close(delete=finished)
+        self.frontier = None
+
+    def checkpoint(self):
+        if self.frontier is None:
+            return
+        start = time.monotonic()
+        try:
+            written = self.frontier.checkpoint()
+        except sqlite3.Error as exc:
+            logger.warning("Frontier checkpoint failed: %s", exc)
+            return
+        if written:
+            self.stats.inc_value("frontier/checkpoints")
+            self.stats.inc_value("frontier/checkpoint_ms_total", int((time.monotonic() - start) * 1000))
+
+    def _fingerprint(self, request):
+        return self.crawler.request_fingerprinter.fingerprint(request).hex()
+
+    def _serialize(self, request):
+        try:
+            return pickle.dumps(request.to_dict(spider=self.crawler.spider), protocol=4)
+        except Exception as exc:
+            self._unserializable += 1
+            if self._unserializable == 1:
+                logger.warning("Cannot save %s in the frontier (%s); such requests are not resumable", request, exc)
+            self.stats.inc_value("frontier/unserializable")
+            return None
+
+    async def process_start(self, start):
+        if self.frontier is None or not self.resume:
+            async for o in super().process_start(start):
+                yield o
+            return
+        # the spider's own start still runs: spiders register their listings
+        # there (PaginatedListingMixin), which resumed listing pages need to
+        # find their next page. Only start requests the frontier does not
+        # know yet are scheduled.
+        fresh = []
+        skipped = 0
+        async for o in start:
+            if isinstance(o, Request):
+                if self._fingerprint(o) in self.known:
+                    skipped += 1
+                    continue
+                o = self.get_processed_request(o, None)
+            if o is not None:
+                fresh.append(o)
+        resumed = 0
+        for fp, data in self.frontier.pending():
+            try:
+                request = request_from_dict(pickle.loads(data), spider=self.crawler.spider)
+            except Exception as exc:
+                logger.warning("Skipping unreadable frontier entry %s: %s", fp, exc)
+                continue
+            resumed += 1
+            yield request
+        self.stats.set_value("frontier/resumed", resumed)
+        if skipped:
+            self.stats.set_value("frontier/start_skipped_known", skipped)
+        logger.info("Resumed %d pending requests from %s", resumed, self.frontier.path)
+        for o in fresh:
+            yield o
+
+    def get_processed_request(self, request, response):
+        if self.frontier is None:
+            return request
+        fp = self._fingerprint(request)
+        if fp in self.known:
+            if response is not None and not request.dont_filter:
+                self.stats.inc_value("frontier/skipped_known")
+                return None
+            return request
+        self.known.add(fp)
+        self.frontier.add(fp, self._serialize(request))
+        self.stats.inc_value("frontier/recorded")
+        return request
+
+    def _item_released(self, item, stored=True):
+        fp = self._awaiting.pop(id(item), None)
+        if fp is None:
+            return
+        if not stored:
+            self._failed.add(fp)
+        left = self._outstanding.get(fp, 1) - 1
+        if left > 0:
+            self._outstanding[fp] = left
+            return
+        self._outstanding.pop(fp, None)
+        if fp in self._exhausted:
+            self._exhausted.discard(fp)
+            self._fp_done(fp)
+
+    def item_scraped(self, item, response, spider):
+        if not self.wait_for_store:
+            self._item_released(item)
+
+    def item_dropped(self, item, response, exception, spider):
+        self._item_released(item)
+
+    def items_stored(self, items):
+        for item in items:
+            self._item_released(item)
+
+    def items_failed(self, items):
+        for item in items:
+            self._item_released(item, stored=False)
+
+    def _fp_done(self, fp):
+        if self.frontier is None:
+            return
+        if fp in self._failed:
+            # left pending, so --resume fetches the page again
+            self._failed.discard(fp)
+            self.stats.inc_value("frontier/left_pending_write_failed")
+            return
+        self.frontier.done(fp)
+        self.stats.inc_value("frontier/completed")
+
+    def _response_fp(self, response):
+        if self.frontier is None or response is None or response.request is None:
+            return None
+        return self._fingerprint(response.request)
+
+    def _track(self, o, fp):
+        """Remember an item yielded for the response ``fp`` until it is stored."""
+        if fp is None or isinstance(o, Request):
+            return
+        # the item lives until it is released, so its id is unique meanwhile
+        self._awaiting[id(o)] = fp
+        self._outstanding[fp] = self._outstanding.get(fp, 0) + 1
+
+    def _output_done(self, fp):
+        if fp is None:
+            return
+        if self._outstanding.get(fp):
+            # its items are still on their way to the database
+            self._exhausted.add(fp)
+        else:
+            self._fp_done(fp)
+
+    def process_spider_output(self, response, result, spider=None):
+        # done once the callback has finished and every item it yielded is stored
+        fp = self._response_fp(response)
+        for o in super().process_spider_output(response, result):
+            self._track(o, fp)
+            yield o
+        self._output_done(fp)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        fp = self._response_fp(response)
+        async for o in super().process_spider_output_async(response, result):
+            self._track(o, fp)
+            yield o
+        self._output_done(fp)
+
+
+def reopen_jobs(job_ids):
+    """``--resume``: ``{spider name: job id}`` of the given ScrapeJobs, set back to running.
+
+    Raises ``ValueError`` for a job id that does not exist.
+    """
+    from app.db import db
+    from app.models import ScrapeJob
+    from scrapy_spiders.db import _get_app
+
+    resumed = {}
+    with _get_app().app_context():
+        for job_id in job_ids:
+            job = ScrapeJob.query.get(job_id)
+            if job is None:
+                raise ValueError(f"ScrapeJob {job_id} does not exist")
+            if not os.path.exists(frontier_path(job_id)):
+                logger.warning("No saved frontier for job %s; its spider starts over", job_id)
+            resumed[job.spider] = job_id
+            job.status = "running"
+            job.finished_at = None
+        db.session.commit()
+    return resumed
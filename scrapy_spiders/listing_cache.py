@@ -0,0 +1,270 @@
+"""Conditional requests and change detection for listing pages.
+
+Hourly runs fetch the same homepages, category pages and sitemaps every
+time, and most of them have not changed since the last run. The runner
+enables two middlewares over a small SQLite store
+(``instance/scrapy/listing_cache.sqlite``) that remembers, per listing URL,
+the ``ETag`` / ``Last-Modified`` validators and a hash of the body:
+
+- ``ListingCacheMiddleware`` (downloader) adds ``If-None-Match`` /
+  ``If-Modified-Since`` to listing requests that have an entry. A
+  ``304 Not Modified`` answer, or a ``200`` whose body hashes the same as
+  last time, is dropped (``IgnoreRequest``), so ``parse_listing`` does not
+  run and no following page is requested in incremental mode.
+- ``ListingCacheCommitMiddleware`` (spider) saves the new validators and
+  hash only once the callback for the page has run to the end. A crawl
+  killed halfway therefore does not mark pages as seen before their
+  articles were requested.
+
+Only requests whose callback is in ``CACHED_CALLBACKS`` take part (listing
+pages and discovery sitemaps/feeds). Article requests are never cached:
+article pages already stored are filtered out by the seen-URL index before
+they are requested, and new ones are fetched once. Browser-rendered
+requests get no conditional headers, but their body hash is still compared.
+Set ``meta["listing_cache"] = False`` to bypass the cache for one request.
+
+The store only keeps validators and hashes, no bodies. It is capped at
+``LISTING_CACHE_MAX_BYTES`` (estimated row size). Past that, the least
+recently seen URLs are evicted. Counters are under ``listing_cache/*``.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest
+from scrapy.spidermiddlewares.base import BaseSpiderMiddleware
+
+from scrapy_spiders.state import state_path
+
+logger = logging.getLogger(__name__)
+
+CACHED_CALLBACKS = ("parse_listing", "parse_discovery")
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+# fixed per-row overhead added to the text lengths when estimating the size
+ROW_OVERHEAD = 64
+# check the size cap every this many writes
+EVICT_EVERY = 200
+
+_STORE = {"cache": None}
+_STORE_LOCK = threading.Lock()
+
+
+def body_hash(body):
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class ListingCache:
+    """URL -> (etag, last_modified, body hash), LRU-evicted past ``max_bytes``."""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " hash TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " seen REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_seen ON pages (seen)")
+        self.lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, url):
+        """``{"etag", "last_modified", "hash"}`` of ``url``, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT etag, last_modified, hash FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "hash": row[2]}
+
+    def touch(self, url):
+        with self.lock:
+            self.conn.execute("UPDATE pages SET seen = ? WHERE url = ?", (time.time(), url))
+
+    def put(self, url, etag, last_modified, digest):
+        size = ROW_OVERHEAD + len(url) + len(etag or "") + len(last_modified or "") + len(digest)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, hash, size, seen) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, digest, size, time.time()),
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                return self._evict()
+        return 0
+
+    def size(self):
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def evict(self):
+        with self.lock:
+            return self._evict()
+
+    def _evict(self):
+        """Drop least recently seen rows until the store is below 90% of the cap."""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        with self.conn:
+            self.conn.execute("BEGIN")
+            for url, size in self.conn.execute("SELECT url, size FROM pages ORDER BY seen").fetchall():
+                if total <= target:
+                    break
+                self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+                total -= size
+                evicted += 1
+        return evicted
+
+    def close(self):
+        try:
+            self.evict()
+            self.conn.close()
+        except Exception:
+            pass
+
+
+def configure_listing_cache(path=None, max_bytes=None, enabled=True):
+    """Open the process-wide store (``enabled=False`` turns the cache off)."""
+    close_listing_cache()
+    if not enabled:
+        return
+    try:
+        cache = ListingCache(path or state_path("listing_cache.sqlite"), max_bytes or DEFAULT_MAX_BYTES)
+    except sqlite3.Error as exc:
+        logger.warning("Listing cache disabled: %s", exc)
+        return
+    with _STORE_LOCK:
+        _STORE["cache"] = cache
+
+
+def get_listing_cache():
+    return _STORE["cache"]
+
+
+def close_listing_cache():
+    with _STORE_LOCK:
+        cache, _STORE["cache"] = _STORE["cache"], None
+    if cache is not None:
+        cache.close()
+
+
+def is_cached_request(request, spider):
+    """True for listing/discovery requests, unless the request opts out."""
+    if request.meta.get("listing_cache") is False:
+        return False
+    callback = request.callback
+    if callback is None or spider is None:
+        return False
+    return getattr(callback, "__name__", None) in CACHED_CALLBACKS and getattr(callback, "__self__", None) is spider
+
+
+class ListingCacheMiddleware:
+    """Sends conditional requests for listing pages and drops unchanged ones."""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = crawler.stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def process_request(self, request, spider=None):
+        cache = get_listing_cache()
+        if cache is None or not is_cached_request(request, self.crawler.spider):
+            return None
+        entry = cache.get(request.url)
+        if entry is None or request.meta.get("playwright"):
+            return None
+        if entry["etag"]:
+            request.headers.setdefault("If-None-Match", entry["etag"])
+        if entry["last_modified"]:
+            request.headers.setdefault("If-Modified-Since", entry["last_modified"])
+        if entry["etag"] or entry["last_modified"]:
+            self.stats.inc_value("listing_cache/conditional")
+        return None
+
+    def process_response(self, request, response, spider=None):
+        cache = get_listing_cache()
+        if cache is None or not is_cached_request(request, self.crawler.spider):
+            return response
+        entry = cache.get(request.url)
+        if response.status == 304 and entry is not None:
+            cache.touch(request.url)
+            self.stats.inc_value("listing_cache/not_modified")
+            raise IgnoreRequest(f"Listing not modified: {request.url}")
+        if response.status != 200:
+            return response
+        digest = body_hash(response.body)
+        if entry is not None and entry["hash"] == digest:
+            cache.touch(request.url)
+            self.stats.inc_value("listing_cache/unchanged")
+            raise IgnoreRequest(f"Listing unchanged: {request.url}")
+        self.stats.inc_value("listing_cache/changed" if entry is not None else "listing_cache/new")
+        # saved by ListingCacheCommitMiddleware once the page has been parsed
+        request.meta["listing_cache_entry"] = (
+            request.url,
+            _header(response, b"ETag"),
+            _header(response, b"Last-Modified"),
+            digest,
+        )
+        return response
+
+
+def _header(response, name):
+    value = response.headers.get(name)
+    return value.decode("latin-1") if value else None
+
+
+class ListingCacheCommitMiddleware(BaseSpiderMiddleware):
+    """Saves a listing page's cache entry after its callback has finished."""
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        self.stats = crawler.stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        o = cls(crawler)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        return o
+
+    def spider_closed(self, spider):
+        cache = get_listing_cache()
+        if cache is not None:
+            self.stats.set_value("listing_cache/size_bytes", cache.size())
+
+    def _commit(self, response):
+        entry = response.meta.get("listing_cache_entry") if response is not None else None
+        cache = get_listing_cache()
+        if entry is None or cache is None:
+            return
+        try:
+            evicted = cache.put(*entry)
+        except sqlite3.Error as exc:
+            logger.warning("Could not save listing cache entry for %s: %s", entry[0], exc)
+            return
+        self.stats.inc_value("listing_cache/stored")
+        if evicted:
+            self.stats.inc_value("listing_cache/evicted", evicted)
+
+    def process_spider_output(self, response, result, spider=None):
+        yield from super().process_spider_output(response, result)
+        self._commit(response)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        async for o in super().process_spider_output_async(response, result):
+            yield o
+        self._commit(response)
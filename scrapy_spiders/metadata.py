@@ -0,0 +1,169 @@
+"""Structured metadata of an article page, parsed once per response.
+
+``page_metadata(sel)`` reads every ``application/ld+json`` block (lists and
+``@graph`` containers are flattened, ``{"@id": ...}`` author references are
+resolved), the OpenGraph ``og:*`` and ``article:*`` meta tags, and returns a
+``PageMetadata``. Spiders build it in ``parse_article`` and hand it to their
+``extract_article``; site-specific selectors stay the primary source where
+they exist and the metadata fills the gaps.
+"""
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# schema.org types treated as "the article" of the page
+ARTICLE_TYPES = {
+    "Article", "NewsArticle", "ReportageNewsArticle", "AnalysisNewsArticle",
+    "OpinionNewsArticle", "BackgroundNewsArticle", "ReviewNewsArticle",
+    "BlogPosting", "LiveBlogPosting", "Report",
+}
+
+
+@dataclass
+class PageMetadata:
+    headline: Optional[str] = None
+    description: Optional[str] = None
+    article_body: Optional[str] = None
+    authors: List[str] = field(default_factory=list)
+    date_published: Optional[str] = None
+    date_modified: Optional[str] = None
+    section: Optional[str] = None
+    keywords: List[str] = field(default_factory=list)
+    image: Optional[str] = None
+    # first value of each og:* / article:* meta tag
+    og: Dict[str, str] = field(default_factory=dict)
+    # every JSON-LD node found on the page, flattened
+    json_ld: List[dict] = field(default_factory=list)
+
+    @property
+    def author(self):
+        return self.authors[0] if self.authors else None
+
+    def published_on(self):
+        """``date_published`` as a ``date`` (None if missing or not ISO 8601)."""
+        try:
+            return datetime.fromisoformat(self.date_published.replace("Z", "+00:00")).date()
+        except (AttributeError, ValueError):
+            return None
+
+
+def _types(node):
+    t = node.get("@type")
+    if isinstance(t, str):
+        return {t}
+    if isinstance(t, list):
+        return {x for x in t if isinstance(x, str)}
+    return set()
+
+
+def _flatten(data, out):
+    if isinstance(data, list):
+        for item in data:
+            _flatten(item, out)
+    elif isinstance(data, dict):
+        if "@type" in data or "@id" in data:
+            out.append(data)
+        if "@graph" in data:
+            _flatten(data["@graph"], out)
+
+
+def _text(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, list) and value:
+        return _text(value[0])
+    if isinstance(value, dict):
+        return _text(value.get("@value") or value.get("name") or value.get("url"))
+    return None
+
+
+def _names(value, by_id):
+    """Author names from a string, a Person/Organization node, an @id reference or a list of them."""
+    if isinstance(value, list):
+        names = []
+        for v in value:
+            names.extend(_names(v, by_id))
+        return names
+    if isinstance(value, dict):
+        if not value.get("name") and value.get("@id") in by_id:
+            value = by_id[value["@id"]]
+        name = _text(value.get("name"))
+        return [name] if name else []
+    name = _text(value)
+    return [name] if name else []
+
+
+def _url(value):
+    if isinstance(value, list) and value:
+        return _url(value[0])
+    if isinstance(value, dict):
+        return _text(value.get("url") or value.get("@id"))
+    return _text(value)
+
+
+def _keywords(value):
+    if isinstance(value, str):
+        return [k.strip() for k in value.split(",") if k.strip()]
+    if isinstance(value, list):
+        return [k.strip() for k in value if isinstance(k, str) and k.strip()]
+    return []
+
+
+def _json_ld_nodes(sel):
+    nodes = []
+    for raw in sel.xpath('//script[@type="application/ld+json"]/text()').getall():
+        try:
+            # strict=False tolerates raw newlines/tabs inside strings, which CMSs emit
+            data = json.loads(raw, strict=False)
+        except ValueError:
+            continue
+        _flatten(data, nodes)
+    return nodes
+
+
+def _meta_tags(sel):
+    tags = {}
+    for m in sel.xpath("//meta[@property or @name][@content]"):
+        key = (m.attrib.get("property") or m.attrib.get("name") or "").strip()
+        if key.startswith(("og:", "article:")) and key not in tags:
+            value = m.attrib.get("content", "").strip()
+            if value:
+                tags[key] = value
+    return tags
+
+
+def page_metadata(sel):
+    """Parse JSON-LD and OpenGraph/article meta tags of a page into ``PageMetadata``."""
+    nodes = _json_ld_nodes(sel)
+    og = _meta_tags(sel)
+    by_id = {n["@id"]: n for n in nodes if isinstance(n.get("@id"), str)}
+    article = next((n for n in nodes if _types(n) & ARTICLE_TYPES), None)
+
+    meta = PageMetadata(og=og, json_ld=nodes)
+    if article is not None:
+        meta.headline = _text(article.get("headline")) or _text(article.get("name"))
+        meta.description = _text(article.get("description"))
+        meta.article_body = _text(article.get("articleBody"))
+        meta.authors = _names(article.get("author"), by_id)
+        meta.date_published = _text(article.get("datePublished"))
+        meta.date_modified = _text(article.get("dateModified"))
+        meta.section = _text(article.get("articleSection"))
+        meta.keywords = _keywords(article.get("keywords"))
+        meta.image = _url(article.get("image"))
+
+    # OpenGraph / article:* tags fill whatever JSON-LD did not provide
+    meta.headline = meta.headline or og.get("og:title")
+    meta.description = meta.description or og.get("og:description")
+    meta.date_published = meta.date_published or og.get("article:published_time")
+    meta.date_modified = meta.date_modified or og.get("article:modified_time")
+    meta.section = meta.section or og.get("article:section")
+    meta.image = meta.image or og.get("og:image")
+    author_tag = og.get("article:author")
+    if not meta.authors and author_tag and not author_tag.startswith("http"):
+        # article:author is often a profile URL rather than a name
+        meta.authors = [author_tag]
+    if not meta.keywords:
+        meta.keywords = [t for t in sel.xpath('//meta[@property="article:tag"]/@content').getall() if t.strip()]
+    return meta
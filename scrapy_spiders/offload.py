@@ -0,0 +1,138 @@
+"""Running article extraction in a process pool (opt-in).
+
+``parse_article`` callbacks used to do all of their extraction (lxml queries,
+JSON-LD parsing, text cleanup) on the reactor thread, so downloads and other
+callbacks waited while a big page was being parsed. With
+``EXTRACT_OFFLOAD_WORKERS`` > 0 (``runner --parse-workers N``) spiders hand
+the page HTML to a ``ProcessPoolExecutor`` instead:
+
+    async def parse_article(self, response):
+        yield await extract_item(self, extract_article, response)
+
+``extract_article`` is the spider module's ``extract_article(sel, url)``
+(it builds the page metadata itself). In a pool worker it runs on
+``selector(html)``, so it must be a module-level function that only depends
+on the HTML and the URL.
+
+- Pages smaller than ``EXTRACT_OFFLOAD_MIN_BYTES`` are parsed inline:
+  shipping them to another process would cost more than parsing them.
+- At most ``EXTRACT_OFFLOAD_MAX_IN_FLIGHT`` pages are in the pool at once;
+  further callbacks wait for a slot (``offload/waits``), which slows the
+  crawl down instead of piling HTML up in memory.
+- If the pool fails (a worker crashed, the item cannot be pickled, ...), the
+  page is parsed inline and ``offload/errors`` is incremented. A broken pool
+  is replaced on the next page.
+
+The pool uses the "spawn" start method, so workers never inherit the
+reactor, the pipeline's writer thread or open DB connections. With the
+offload disabled (the default) ``extract_item`` parses inline, as before.
+Counters are under ``offload/*``.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from twisted.internet import defer
+
+from scrapy.utils.defer import maybe_deferred_to_future
+
+from scrapy_spiders.extract import selector
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_BYTES = 50_000
+# pages in the pool per worker process
+IN_FLIGHT_PER_WORKER = 2
+
+_CONFIG = {
+    "workers": 0,
+    "max_in_flight": 0,
+    "min_bytes": DEFAULT_MIN_BYTES,
+}
+_POOL = None
+_SLOTS = None
+_POOL_LOCK = threading.Lock()
+
+
+def configure_offload(workers=0, max_in_flight=None, min_bytes=None):
+    """Enable the pool with ``workers`` processes (0 disables it)."""
+    shutdown_offload()
+    _CONFIG["workers"] = max(0, int(workers or 0))
+    _CONFIG["max_in_flight"] = int(max_in_flight or _CONFIG["workers"] * IN_FLIGHT_PER_WORKER)
+    if min_bytes is not None:
+        _CONFIG["min_bytes"] = max(0, int(min_bytes))
+
+
+def _get_pool():
+    global _POOL, _SLOTS
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=_CONFIG["workers"],
+                                        mp_context=multiprocessing.get_context("spawn"))
+            _SLOTS = defer.DeferredSemaphore(max(1, _CONFIG["max_in_flight"]))
+        return _POOL, _SLOTS
+
+
+def shutdown_offload(wait=True):
+    """Stop the pool's worker processes (if it was started)."""
+    global _POOL, _SLOTS
+    with _POOL_LOCK:
+        pool, _POOL, _SLOTS = _POOL, None, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def _extract_in_worker(extract_func, html, url):
+    # runs in a pool process
+    return extract_func(selector(html), url)
+
+
+def _inline(extract_func, response):
+    return extract_func(response, response.url)
+
+
+def _submit(pool, extract_func, html, url):
+    """Run one extraction in the pool; the Deferred fires on the reactor thread."""
+    from twisted.internet import reactor
+
+    d = defer.Deferred()
+    future = pool.submit(_extract_in_worker, extract_func, html, url)
+
+    def done(f):
+        exc = f.exception()
+        if exc is not None:
+            reactor.callFromThread(d.errback, exc)
+        else:
+            reactor.callFromThread(d.callback, f.result())
+
+    future.add_done_callback(done)
+    return d
+
+
+async def extract_item(spider, extract_func, response):
+    """Item of ``response`` from ``extract_func``, parsed in the pool when that pays off."""
+    stats = getattr(getattr(spider, "crawler", None), "stats", None)
+
+    def inc(key):
+        if stats is not None:
+            stats.inc_value(key)
+
+    if not _CONFIG["workers"] or len(response.body) < _CONFIG["min_bytes"]:
+        inc("offload/inline")
+        return _inline(extract_func, response)
+
+    pool, slots = _get_pool()
+    if slots.tokens == 0:
+        inc("offload/waits")
+    try:
+        item = await maybe_deferred_to_future(slots.run(_submit, pool, extract_func, response.text, response.url))
+    except Exception as exc:
+        logger.warning("Offloaded extraction of %s failed (%r); parsing inline", response.url, exc)
+        inc("offload/errors")
+        if isinstance(exc, BrokenProcessPool):
+            shutdown_offload(wait=False)
+        return _inline(extract_func, response)
+    inc("offload/pooled")
+    return item
@@ -0,0 +1,82 @@
+"""Listing pagination shared by the spiders.
+
+A spider describes each paginated listing (a category, ``/latest``, ...) by
+a key and a function that maps a page number to a URL, then calls
+``listing_requests``. By default every page up to the cap is requested up
+front, as before. In incremental mode only page 1 of each listing is
+requested; ``parse_listing`` asks ``next_listing_page`` for the following
+page, which is only requested while pages keep turning up unseen articles.
+Hourly runs then stop after the first page of known content instead of
+walking thousands of pages per category.
+"""
+import scrapy
+
+
+def as_bool(value):
+    """Interpret spider arguments passed as strings (``-a incremental=1``)."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+class PaginatedListingMixin:
+    """Mixin for spiders with page-numbered listings.
+
+    ``incremental``: fetch each listing's pages one after another and stop
+    at the first page whose share of unseen article links is zero or below
+    ``min_new_fraction`` (0.0 means "stop only when nothing is new").
+    """
+
+    incremental = False
+    min_new_fraction = 0.0
+
+    def init_pagination(self, incremental=False, min_new_fraction=0.0):
+        self.incremental = as_bool(incremental)
+        self.min_new_fraction = float(min_new_fraction or 0.0)
+        # key -> (page_url function, cap); kept on the spider, not in request
+        # meta, so requests stay serializable
+        self._listings = {}
+
+    def make_listing_request(self, url, meta):
+        """Build the Request for one listing page; override to add meta/flags."""
+        return scrapy.Request(url, callback=self.parse_listing, meta=meta)
+
+    def listing_requests(self, key, page_url, cap):
+        """Yield the initial requests for the listing ``key``.
+
+        ``page_url(p)`` returns the URL of page ``p`` (1-based).
+        """
+        self._listings[key] = (page_url, cap)
+        last = 1 if self.incremental else cap
+        for p in range(1, last + 1):
+            yield self.make_listing_request(page_url(p), {"listing": key, "listing_page": p})
+
+    def next_listing_page(self, response, links, new_links):
+        """Return the request for the next page of this listing, or None.
+
+        Only used in incremental mode; ``links`` are the article links found
+        on the page and ``new_links`` the ones not stored yet.
+        """
+        key = response.meta.get("listing")
+        if not self.incremental or key is None:
+            return None
+        if key not in self._listings:
+            # e.g. a page resumed from the frontier whose spider did not run
+            # its start requests: the listing cannot go on past this page
+            self.logger.warning("Listing %r was never registered; not following page %s",
+                                key, response.meta.get("listing_page"))
+            if getattr(self, "crawler", None) is not None:
+                self.crawler.stats.inc_value("pagination/unknown_listing")
+            return None
+        page_url, cap = self._listings[key]
+        page = response.meta.get("listing_page", 1)
+        total = len(set(links))
+        fresh = len(new_links)
+        if page >= cap or not fresh or fresh < self.min_new_fraction * total:
+            self.logger.debug("Stopping listing %s at page %d (%d/%d new links)", key, page, fresh, total)
+            if getattr(self, "crawler", None) is not None:
+                self.crawler.stats.inc_value("pagination/listings_stopped")
+            return None
+        if getattr(self, "crawler", None) is not None:
+            self.crawler.stats.inc_value("pagination/pages_followed")
+        return self.make_listing_request(page_url(page + 1), {"listing": key, "listing_page": page + 1})
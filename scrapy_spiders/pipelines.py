@@ -1,50 +1,128 @@
-from app import create_app
-from app.models import Article
+from app.models import ScrapeJob
 from app.db import db
+from app.bulk import insert_new_articles, is_retryable
+from app.dedupe import MODES as DEDUPE_MODES, assign_duplicates, link_pending
+from app.analytics import record_articles
 from datetime import datetime
-from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
-
-
-def _normalize_url(u: str) -> str:
-    if not u:
-        return u
-    try:
-        p = urlparse(u)
-    except Exception:
-        return u
-    scheme = (p.scheme or "http").lower()
-    netloc = (p.netloc or "").lower()
-    qs = parse_qsl(p.query, keep_blank_values=True)
-    filtered = [(k, v) for (k, v) in qs if not (k.startswith("utm_") or k in ("fbclid", "gclid"))]
-    query = urlencode(filtered)
-    path = p.path or ""
-    if path.endswith("/") and path != "/":
-        path = path.rstrip("/")
-    return urlunparse((scheme, netloc, path, "", query, ""))
+import logging
+import time
+from collections import deque
+
+from sqlalchemy import func, update
+from twisted.internet import defer, threads
+
+from scrapy_spiders.db import _get_app, mark_urls_seen, record_seen_index_stats
+from scrapy_spiders.signals import items_failed, items_stored
+from scrapy_spiders.urls import normalize_url, record_cache_stats
+from scrapy_spiders.writer import ArticleWriter
+
+logger = logging.getLogger(__name__)
 
 
 class SQLAlchemyPipeline:
-    def __init__(self):
+    """Write scraped items into the Flask app's Article table.
+
+    Items are written in batches: one multi-row INSERT (duplicates are
+    skipped by the unique index on Article.url, see app.bulk) and one
+    ScrapeJob.items_count increment per flush. A flush happens when a batch
+    reaches SQLALCHEMY_PIPELINE_BUFFER_SIZE items, when
+    SQLALCHEMY_PIPELINE_FLUSH_INTERVAL seconds have passed since the last
+    flush, and on close_spider. A buffer size of 1 writes every item
+    immediately (the old behaviour). A batch that fails is written again in
+    halves, down to single rows, so a bad row only loses itself
+    (sqlalchemy_pipeline/rows_failed).
+
+    All database work runs on a dedicated writer thread (see
+    scrapy_spiders.writer) so commits don't block the reactor. process_item
+    returns a Deferred that fires as soon as the writer's queue has taken
+    the item. Only when the queue (SQLALCHEMY_PIPELINE_QUEUE_SIZE entries) is
+    full do items wait here with their Deferreds pending, which makes Scrapy
+    throttle scraping until the writer catches up. Once a batch has been
+    written, the items_stored signal (scrapy_spiders.signals) is sent, or
+    items_failed for the items that could not be written.
+
+    Near duplicates (the same story under another URL, see app.dedupe) are
+    found per batch on the writer thread. SQLALCHEMY_PIPELINE_DEDUPE picks
+    what happens to them: "link" (default) stores them with duplicate_of
+    set, "skip" does not store them, "off" skips the check.
+    """
+
+    DEFAULT_BUFFER_SIZE = 100
+    DEFAULT_FLUSH_INTERVAL = 5.0
+    DEFAULT_QUEUE_SIZE = 1000
+    DEFAULT_DEDUPE = "link"
+    # tries per batch when MySQL reports a deadlock or lock wait timeout
+    WRITE_ATTEMPTS = 3
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 queue_size=DEFAULT_QUEUE_SIZE, stats=None, finish_job=True, dedupe=DEFAULT_DEDUPE,
+                 signals=None):
         self.app = None
         self.job_id = None
+        self.buffer_size = max(1, int(buffer_size))
+        self.flush_interval = float(flush_interval)
+        self.queue_size = max(1, int(queue_size))
+        self.stats = stats
+        # sharded workers leave the final job status to the coordinator
+        self.finish_job = finish_job
+        self.dedupe = dedupe
+        # crawler.signals, for items_stored (None when built without a crawler)
+        self.signals = signals
+        # near-duplicate counts; written by the writer thread, read after it exits
+        self._duplicates = {"linked": 0, "skipped": 0}
+        self._writer = None
+        # entries waiting for room in the writer queue (reactor thread only)
+        self._backlog = deque()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            buffer_size=settings.getint("SQLALCHEMY_PIPELINE_BUFFER_SIZE", cls.DEFAULT_BUFFER_SIZE),
+            flush_interval=settings.getfloat("SQLALCHEMY_PIPELINE_FLUSH_INTERVAL", cls.DEFAULT_FLUSH_INTERVAL),
+            queue_size=settings.getint("SQLALCHEMY_PIPELINE_QUEUE_SIZE", cls.DEFAULT_QUEUE_SIZE),
+            stats=crawler.stats,
+            finish_job=settings.getbool("SQLALCHEMY_PIPELINE_FINISH_JOB", True),
+            dedupe=settings.get("SQLALCHEMY_PIPELINE_DEDUPE", cls.DEFAULT_DEDUPE),
+            signals=crawler.signals,
+        )
 
     def open_spider(self, spider):
-        # create but don't push the app context here; use a context manager
-        # inside process_item because Scrapy may process items in different
-        # threads or deferred callbacks.
-        self.app = create_app()
+        # the writer thread pushes its own app context for its lifetime; the
+        # app (and its engine) is shared by every spider in the process
+        self.app = _get_app()
         # spider may set job_id attribute when created by the runner
         try:
             self.job_id = getattr(spider, "job_id", None) or (spider.crawler.settings.get("job_id") if getattr(spider, "crawler", None) else None)
         except Exception:
             self.job_id = getattr(spider, "job_id", None)
 
+        self._writer = ArticleWriter(
+            self.app,
+            write_batch=self._write_batch,
+            on_flushed=self._on_flushed,
+            on_space=self._drain_backlog,
+            buffer_size=self.buffer_size,
+            flush_interval=self.flush_interval,
+            queue_size=self.queue_size,
+        )
+        self._writer.start()
+
     def close_spider(self, spider):
+        # drain the queue on a thread so the reactor keeps delivering the
+        # writer's callbacks; only then mark the job finished
+        pending = list(self._backlog)
+        self._backlog.clear()
+        d = threads.deferToThread(self._writer.close, pending)
+        d.addCallback(lambda _: threads.deferToThread(self._finish_job))
+        d.addCallback(lambda _: self._record_summary_stats())
+        return d
+
+    def _finish_job(self):
         # mark job finished if we have a job id
-        if not self.job_id:
+        if not self.job_id or not self.finish_job:
             return
         with self.app.app_context():
-            from app.models import ScrapeJob
             job = ScrapeJob.query.get(self.job_id)
             if job:
                 job.status = "finished"
@@ -55,50 +133,171 @@ class SQLAlchemyPipeline:
                 except Exception:
                     db.session.rollback()
 
+    def _record_summary_stats(self):
+        if self.stats is None:
+            return
+        record_seen_index_stats(self.stats)
+        record_cache_stats(self.stats)
+        for key, value in self._duplicates.items():
+            if value:
+                self.stats.set_value(f"sqlalchemy_pipeline/near_duplicates_{key}", value)
+        flushes = self.stats.get_value("sqlalchemy_pipeline/flushes", 0)
+        if flushes:
+            rows = self.stats.get_value("sqlalchemy_pipeline/rows_flushed", 0)
+            latency = self.stats.get_value("sqlalchemy_pipeline/flush_latency_ms_total", 0)
+            self.stats.set_value("sqlalchemy_pipeline/rows_per_flush_avg", round(rows / flushes, 2))
+            self.stats.set_value("sqlalchemy_pipeline/flush_latency_ms_avg", round(latency / flushes, 2))
+
     def process_item(self, item, spider):
         # item is expected to be a dict with keys similar to Article fields
+        row = self._item_to_row(item, spider)
+        if row is None:
+            # nothing to write; as stored as it will ever be
+            if self.signals is not None:
+                self.signals.send_catch_log(signal=items_stored, items=[item])
+            return item
+
+        d = defer.Deferred()
+        entry = (row, item, d)
+        # keep FIFO order: once anything is waiting, new items queue behind it
+        if self._backlog or not self._writer.submit(entry):
+            self._backlog.append(entry)
+            if self.stats is not None:
+                self.stats.inc_value("sqlalchemy_pipeline/backpressure_waits")
+        else:
+            d.callback(item)
+        return d
+
+    def _drain_backlog(self):
+        while self._backlog and self._writer.submit(self._backlog[0]):
+            _row, item, d = self._backlog.popleft()
+            d.callback(item)
+
+    def _on_flushed(self, entries, inserted, failed, latency_ms):
+        if self.stats is not None:
+            self.stats.inc_value("sqlalchemy_pipeline/flushes")
+            self.stats.inc_value("sqlalchemy_pipeline/rows_flushed", len(entries))
+            self.stats.inc_value("sqlalchemy_pipeline/rows_inserted", inserted)
+            if failed:
+                self.stats.inc_value("sqlalchemy_pipeline/rows_failed", len(failed))
+            self.stats.inc_value("sqlalchemy_pipeline/flush_latency_ms_total", latency_ms)
+            self.stats.max_value("sqlalchemy_pipeline/flush_latency_ms_max", latency_ms)
+            self.stats.max_value("sqlalchemy_pipeline/rows_per_flush_max", len(entries))
+        logger.debug("Flushed %d rows (%d new) in %.1f ms", len(entries), inserted, latency_ms)
+        for _row, item, d in entries:
+            # entries handed over by close_spider straight from the backlog
+            if not d.called:
+                d.callback(item)
+        if self.signals is not None:
+            failed = set(failed)
+            stored = [item for i, (_row, item, _d) in enumerate(entries) if i not in failed]
+            if stored:
+                self.signals.send_catch_log(signal=items_stored, items=stored)
+            if failed:
+                self.signals.send_catch_log(signal=items_failed, items=[entries[i][1] for i in sorted(failed)])
+
+    def _item_to_row(self, item, spider):
         url = item.get("url") or item.get("source_url")
         if not url:
-            return item
+            return None
 
-        normalized = _normalize_url(url)
+        row = {
+            "url": normalize_url(url),
+            "title": item.get("title"),
+            "author": item.get("author"),
+            "description": item.get("description"),
+            "content": item.get("content"),
+            "source": item.get("source") or getattr(spider, "name", None),
+            "date": None,
+            "created_at": datetime.utcnow(),
+        }
+        # try parse date
+        try:
+            if item.get("date"):
+                row["date"] = datetime.fromisoformat(item.get("date"))
+        except Exception:
+            pass
+        return row
 
-        # Use a fresh app context for each item to ensure db.session works
-        with self.app.app_context():
-            # dedupe: skip if we already have this URL
-            if Article.query.filter_by(url=normalized).first():
-                return item
-
-            art = Article(
-                url=normalized,
-                title=item.get("title"),
-                author=item.get("author"),
-                description=item.get("description"),
-                content=item.get("content"),
-                source=item.get("source") or getattr(spider, "name", None),
+    def _insert(self, rows):
+        """insert_new_articles, with near duplicates linked or left out."""
+        if self.dedupe not in DEDUPE_MODES:
+            return insert_new_articles(rows)
+        to_insert, pending = assign_duplicates(db.session, [dict(r) for r in rows], self.dedupe)
+        inserted = insert_new_articles(to_insert)
+        if pending:
+            ids = {r["url"]: r["id"] for r in inserted}
+            inserted += insert_new_articles(link_pending(pending, to_insert, ids))
+        linked = sum(1 for r in inserted if r.get("duplicate_of"))
+        self._duplicates["linked"] += linked
+        self._duplicates["skipped"] += len(rows) - len(to_insert) - len(pending)
+        return inserted
+
+    def _commit_rows(self, rows):
+        """Insert ``rows``, update rollups and job count, commit; returns the number inserted."""
+        stored = self._insert(rows)
+        inserted = len(stored)
+        # hourly per-source counts for the analytics page, same transaction
+        record_articles(stored)
+        if inserted and self.job_id:
+            db.session.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.id == self.job_id)
+                .values(items_count=func.coalesce(ScrapeJob.items_count, 0) + inserted)
             )
-            # try parse date
-            try:
-                if item.get("date"):
-                    art.date = datetime.fromisoformat(item.get("date"))
-            except Exception:
-                pass
+        db.session.commit()
+        return inserted
+
+    def _commit_with_retries(self, rows):
+        """_commit_rows, run again after a deadlock or lock wait timeout.
 
-            db.session.add(art)
+        Those roll the whole transaction back (other writers, ``--workers``);
+        it is tried up to WRITE_ATTEMPTS times before the error is raised.
+        """
+        for attempt in range(1, self.WRITE_ATTEMPTS + 1):
+            duplicates = dict(self._duplicates)
             try:
-                db.session.commit()
-                # update job count
-                if self.job_id:
-                    from app.models import ScrapeJob
-                    job = ScrapeJob.query.get(self.job_id)
-                    if job:
-                        job.items_count = (job.items_count or 0) + 1
-                        db.session.add(job)
-                        try:
-                            db.session.commit()
-                        except Exception:
-                            db.session.rollback()
-            except Exception:
+                return self._commit_rows(rows)
+            except Exception as exc:
                 db.session.rollback()
+                self._duplicates.update(duplicates)
+                if attempt == self.WRITE_ATTEMPTS or not is_retryable(exc):
+                    raise
+                logger.warning("Retrying %d articles after: %s", len(rows), exc)
+                if self.stats is not None:
+                    self.stats.inc_value("sqlalchemy_pipeline/write_retries")
+                time.sleep(0.1 * attempt)
 
-        return item
+    def _write_rows(self, rows, positions):
+        """Write ``rows[i]`` for ``positions`` in one transaction; returns ``(inserted, failed)``.
+
+        If that fails, each half is written on its own, down to single rows,
+        so one bad row (data too long, ...) costs only itself.
+        """
+        try:
+            return self._commit_with_retries([rows[i] for i in positions]), []
+        except Exception as exc:
+            if len(positions) == 1:
+                logger.error("Failed to write article %s: %s", rows[positions[0]].get("url"), exc)
+                return 0, list(positions)
+            logger.warning("Failed to write %d articles (%s); writing them in smaller batches", len(positions), exc)
+        mid = len(positions) // 2
+        inserted, failed = self._write_rows(rows, positions[:mid])
+        more, more_failed = self._write_rows(rows, positions[mid:])
+        return inserted + more, failed + more_failed
+
+    def _write_batch(self, rows):
+        """Insert one batch and bump the job count. Runs on the writer thread.
+
+        Returns ``(inserted, failed)``, ``failed`` being the positions of the
+        rows that were not written (see ArticleWriter).
+        """
+        inserted, failed = self._write_rows(rows, list(range(len(rows))))
+        # every other URL of the batch is stored now (new or not), so later
+        # listing pages in this or the next run can skip it
+        skip = set(failed)
+        try:
+            mark_urls_seen(r["url"] for i, r in enumerate(rows) if i not in skip)
+        except Exception as exc:
+            logger.warning("Could not update seen-URL index: %s", exc)
+        return inserted, failed
@@ -0,0 +1,198 @@
+"""Per-request choice between a plain HTTP fetch and a Playwright render.
+
+Spiders mark requests that may need a browser with the usual
+``playwright`` meta. ``RenderPolicyMiddleware`` (a spider middleware enabled
+by the runner) decides per request whether that browser render really
+happens, according to ``RENDER_MODE``:
+
+- ``browser`` (default): honour the meta as-is, so only requests that ask
+  for a browser get one.
+- ``static``: strip the Playwright meta everywhere; nothing is rendered.
+- ``adaptive`` (opt-in, ``--render adaptive``): article requests are first
+  fetched without a browser. If the item comes back without its required
+  fields (``content`` and ``date`` by default, see ``RENDER_REQUIRED_FIELDS``
+  on the spider), the item is dropped and the page is requested again with
+  the original Playwright meta. Outcomes are counted per domain and persisted
+  (``instance/scrapy/render_stats.json``), so a domain whose static pages are
+  usually incomplete goes straight to the browser on later runs. Those domains
+  are still probed now and then in case the site changes.
+
+Listing requests keep their meta except in ``static`` mode. The runner
+only installs the Playwright download handler when a selected spider can
+use a browser and the mode is not ``static``.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.spidermiddlewares.base import BaseSpiderMiddleware
+
+from scrapy_spiders.state import state_path
+
+logger = logging.getLogger(__name__)
+
+MODES = ("browser", "adaptive", "static")
+DEFAULT_MODE = "browser"
+DEFAULT_REQUIRED_FIELDS = ("content", "date")
+# values the extractors use when a field was not found
+PLACEHOLDERS = ("", "No content", "No title", "Unknown")
+
+# static attempts per domain before the stats are trusted
+MIN_SAMPLES = 5
+# go straight to the browser when at least this share of static fetches failed
+BROWSER_THRESHOLD = 0.5
+# ...but still try a static fetch for one request in this many
+REPROBE_EVERY = 25
+# counts are halved past this many samples so the stats follow site changes
+MAX_SAMPLES = 200
+
+_PLAYWRIGHT_PREFIX = "playwright"
+
+
+def _domain(url):
+    try:
+        return (urlparse(url).hostname or "").lower()
+    except Exception:
+        return ""
+
+
+class RenderPolicy:
+    """Rendering decisions plus the per-domain static success counts behind them."""
+
+    def __init__(self, mode=DEFAULT_MODE, path=None):
+        if mode not in MODES:
+            raise ValueError(f"unknown render mode {mode!r} (expected one of {', '.join(MODES)})")
+        self.mode = mode
+        self.path = path or state_path("render_stats.json")
+        self.domains = {}
+        self._seen = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.domains = {d: s for d, s in data.get("domains", {}).items() if isinstance(s, dict)}
+        except (OSError, ValueError, AttributeError):
+            self.domains = {}
+
+    def save(self):
+        with self._lock:
+            payload = {"updated": datetime.utcnow().isoformat(), "domains": self.domains}
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(payload, f, indent=1, sort_keys=True)
+                os.replace(tmp, self.path)
+            except OSError as exc:
+                logger.warning("Could not save render stats to %s: %s", self.path, exc)
+
+    def try_static(self, url):
+        """Whether a request that asks for a browser should be fetched statically first."""
+        if self.mode == "static":
+            return True
+        if self.mode == "browser":
+            return False
+        domain = _domain(url)
+        s = self.domains.get(domain)
+        if not s:
+            return True
+        ok, failed = s.get("static_ok", 0), s.get("static_failed", 0)
+        if ok + failed < MIN_SAMPLES or failed / (ok + failed) < BROWSER_THRESHOLD:
+            return True
+        with self._lock:
+            n = self._seen[domain] = self._seen.get(domain, 0) + 1
+        return n % REPROBE_EVERY == 0
+
+    def record(self, url, static_ok):
+        domain = _domain(url)
+        with self._lock:
+            s = self.domains.setdefault(domain, {"static_ok": 0, "static_failed": 0})
+            s["static_ok" if static_ok else "static_failed"] += 1
+            if s["static_ok"] + s["static_failed"] > MAX_SAMPLES:
+                s["static_ok"] //= 2
+                s["static_failed"] //= 2
+
+    @staticmethod
+    def missing_fields(item, fields):
+        get = item.get if hasattr(item, "get") else (lambda k: None)
+        return [f for f in fields if get(f) is None or get(f) in PLACEHOLDERS]
+
+
+_POLICY = None
+_POLICY_LOCK = threading.Lock()
+
+
+def get_render_policy(mode=DEFAULT_MODE, path=None):
+    """Process-wide policy shared by every spider (created on first use)."""
+    global _POLICY
+    with _POLICY_LOCK:
+        if _POLICY is None or _POLICY.mode != mode or (path and _POLICY.path != path):
+            _POLICY = RenderPolicy(mode, path)
+        return _POLICY
+
+
+def _split_meta(meta):
+    browser = {k: v for k, v in meta.items() if k.startswith(_PLAYWRIGHT_PREFIX)}
+    rest = {k: v for k, v in meta.items() if not k.startswith(_PLAYWRIGHT_PREFIX)}
+    return rest, browser
+
+
+class RenderPolicyMiddleware(BaseSpiderMiddleware):
+    """Applies the ``RenderPolicy`` to spider output (see module docstring)."""
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        settings = crawler.settings
+        self.policy = get_render_policy(settings.get("RENDER_MODE", DEFAULT_MODE) or DEFAULT_MODE,
+                                        settings.get("RENDER_STATS_PATH"))
+        self.stats = crawler.stats
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    def spider_closed(self, spider):
+        if self.policy.mode == "adaptive":
+            self.policy.save()
+
+    def _is_article_request(self, request):
+        spider = self.crawler.spider
+        callback = getattr(spider, "parse_article", None)
+        return callback is not None and request.callback == callback
+
+    def get_processed_request(self, request, response):
+        if not request.meta.get("playwright") or self.policy.mode == "browser":
+            return request
+        if self.policy.mode == "static":
+            rest, _ = _split_meta(request.meta)
+            return request.replace(meta=rest)
+        if not self._is_article_request(request):
+            return request
+        if not self.policy.try_static(request.url):
+            self.stats.inc_value("render/browser_direct")
+            return request
+        rest, browser = _split_meta(request.meta)
+        rest["render_browser_meta"] = browser
+        self.stats.inc_value("render/static_probes")
+        return request.replace(meta=rest)
+
+    def get_processed_item(self, item, response):
+        if response is None or "render_browser_meta" not in response.meta:
+            return item
+        spider = self.crawler.spider
+        fields = getattr(spider, "RENDER_REQUIRED_FIELDS", DEFAULT_REQUIRED_FIELDS)
+        missing = self.policy.missing_fields(item, fields)
+        self.policy.record(response.url, not missing)
+        if not missing:
+            self.stats.inc_value("render/static_ok")
+            return item
+        # static HTML was incomplete: render the page and drop this item
+        self.stats.inc_value("render/escalated")
+        logger.debug("Static fetch of %s missing %s; rendering with Playwright", response.url, missing)
+        meta = dict(response.request.meta)
+        browser = meta.pop("render_browser_meta")
+        meta.update(browser)
+        return response.request.replace(meta=meta, dont_filter=True)
@@ -0,0 +1,298 @@
+"""Compact, persistent index of article URLs that are already in the DB.
+
+Spiders used to load every ``Article.url`` into a Python set at startup,
+which costs hundreds of MB and tens of seconds on a large table. This module
+keeps a Bloom filter instead: a fixed-size bit array in a memory-mapped file
+under the state directory (see ``scrapy_spiders.state``). A URL that is not
+in the filter is definitely new; a hit is only "probably seen" and callers
+confirm it against the DB (see ``scrapy_spiders.db``).
+
+The filter is loaded lazily, shared by every spider in the process and
+updated by the pipeline as it inserts articles. The file also records the
+highest ``Article.id`` it covers (the watermark); on load only rows above
+the watermark are read and merged in, so startup cost depends on what was
+added since the last run rather than on the size of the table.
+"""
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+
+from scrapy_spiders.state import state_path
+
+logger = logging.getLogger(__name__)
+
+# magic, m (bits), k (hashes), capacity, count, watermark (max Article.id)
+_HEADER = struct.Struct("<8sQIQQQ")
+_MAGIC = b"SEENBLM2"
+_HEADER_SIZE = 64
+
+DEFAULT_CAPACITY = 2_000_000
+DEFAULT_ERROR_RATE = 0.001
+# seconds between refresh() calls during a crawl (0: never)
+DEFAULT_REFRESH_INTERVAL = 600.0
+
+
+def _bloom_size(capacity, error_rate):
+    """Return (bits, hashes) for the requested capacity and false-positive rate."""
+    m = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+    m = max(8, (m + 7) // 8 * 8)
+    k = max(1, int(round(m / capacity * math.log(2))))
+    return m, k
+
+
+class BloomFilter:
+    """Bloom filter over a bytearray or an mmap of a file.
+
+    Bit positions come from one 128-bit BLAKE2b digest split into two 64-bit
+    halves combined by double hashing (h1 + i*h2).
+    """
+
+    def __init__(self, buf, m, k, capacity, count=0, offset=0, watermark=0):
+        self.buf = buf
+        self.m = m
+        self.k = k
+        self.capacity = capacity
+        self.count = count
+        self.offset = offset
+        self.watermark = watermark
+        self._lock = threading.Lock()
+
+    @classmethod
+    def empty(cls, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        m, k = _bloom_size(capacity, error_rate)
+        return cls(bytearray(_HEADER_SIZE + m // 8), m, k, capacity, offset=_HEADER_SIZE)
+
+    @classmethod
+    def open(cls, path, writable=True):
+        """Map an existing filter file; return None if missing or invalid.
+
+        With ``writable=False`` the map is copy-on-write: bits can still be
+        added, but only this process sees them and the file is never written.
+        """
+        try:
+            f = open(path, "r+b" if writable else "rb")
+        except OSError:
+            return None
+        with f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_COPY)
+            except (OSError, ValueError):
+                return None
+        try:
+            magic, m, k, capacity, count, watermark = _HEADER.unpack_from(mm, 0)
+        except struct.error:
+            mm.close()
+            return None
+        if magic != _MAGIC or len(mm) != _HEADER_SIZE + m // 8:
+            mm.close()
+            return None
+        return cls(mm, m, k, capacity, count, offset=_HEADER_SIZE, watermark=watermark)
+
+    def save(self, path):
+        """Write the filter to ``path`` atomically (temp file + rename)."""
+        self._write_header()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.buf)
+        os.replace(tmp, path)
+
+    def flush(self):
+        self._write_header()
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.flush()
+
+    def _write_header(self):
+        _HEADER.pack_into(self.buf, 0, _MAGIC, self.m, self.k, self.capacity, self.count, self.watermark)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        m = self.m
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def add(self, key):
+        buf, offset = self.buf, self.offset
+        added = False
+        with self._lock:
+            for pos in self._positions(key):
+                idx = offset + (pos >> 3)
+                bit = 1 << (pos & 7)
+                if not buf[idx] & bit:
+                    buf[idx] |= bit
+                    added = True
+            if added:
+                self.count += 1
+        return added
+
+    def __contains__(self, key):
+        buf, offset = self.buf, self.offset
+        for pos in self._positions(key):
+            if not buf[offset + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def expected_false_positive_rate(self):
+        """Theoretical false-positive rate for the current number of keys."""
+        return (1.0 - math.exp(-self.k * self.count / self.m)) ** self.k
+
+    @property
+    def nbytes(self):
+        return self.m // 8
+
+
+class SeenUrlIndex:
+    """Process-wide seen-URL index backed by a persisted Bloom filter.
+
+    Keys are normalized URLs. ``might_contain`` answers from the filter only;
+    callers that need certainty confirm hits with the DB and report the
+    outcome through ``record_confirmation`` so the observed false-positive
+    rate can be reported.
+
+    A ``read_only`` index maps the file copy-on-write and never saves it:
+    adds, catch-ups and rebuilds stay in this process. ``--workers`` runs use
+    that in the worker processes, since several processes setting bits and
+    rewriting the header of one file would lose each other's updates.
+    """
+
+    def __init__(self, path=None, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE, url_source=None,
+                 read_only=False):
+        self.path = path or state_path("seen_urls.bloom")
+        self.capacity = int(capacity)
+        self.error_rate = float(error_rate)
+        self.read_only = read_only
+        # callable(since_id) returning (id, normalized url) pairs for the
+        # Article rows with id > since_id, in id order
+        self.url_source = url_source
+        self._bloom = None
+        self._load_lock = threading.Lock()
+        self.probes = 0
+        self.probable_hits = 0
+        self.confirmed_hits = 0
+        self.false_positives = 0
+
+    @property
+    def bloom(self):
+        if self._bloom is None:
+            with self._load_lock:
+                if self._bloom is None:
+                    self._bloom = self._load()
+        return self._bloom
+
+    def _load(self):
+        bloom = BloomFilter.open(self.path, writable=not self.read_only)
+        if bloom is not None and bloom.count <= bloom.capacity:
+            added = self._catch_up(bloom)
+            if bloom.count > bloom.capacity:
+                self.capacity = max(self.capacity, bloom.count * 2)
+                bloom.buf.close()
+                return self.rebuild()
+            bloom.flush()
+            logger.info("Loaded seen-URL index %s (%d URLs, %d new since id %d, %.1f MB)",
+                        self.path, bloom.count, added, bloom.watermark, bloom.nbytes / 1e6)
+            return bloom
+        if bloom is not None:
+            # over capacity: the false-positive rate has degraded, rebuild bigger
+            self.capacity = max(self.capacity, bloom.count * 2)
+            bloom.buf.close()
+        return self.rebuild()
+
+    def rebuild(self):
+        """Build the filter from ``url_source`` and persist it."""
+        bloom = BloomFilter.empty(self.capacity, self.error_rate)
+        self._catch_up(bloom)
+        if bloom.count > bloom.capacity:
+            self.capacity = bloom.count * 2
+            return self.rebuild()
+        if self.read_only:
+            logger.info("Built seen-URL index in memory (%d URLs, %.1f MB)", bloom.count, bloom.nbytes / 1e6)
+            return bloom
+        try:
+            bloom.save(self.path)
+            mapped = BloomFilter.open(self.path)
+            if mapped is not None:
+                bloom = mapped
+        except OSError as exc:
+            logger.warning("Could not persist seen-URL index to %s: %s", self.path, exc)
+        logger.info("Built seen-URL index %s (%d URLs, %.1f MB)", self.path, bloom.count, bloom.nbytes / 1e6)
+        return bloom
+
+    def _catch_up(self, bloom):
+        """Merge rows above the filter's watermark; return how many were read.
+
+        Ids are treated as append-only. A row committed late with an id below
+        the watermark is simply missed; the spider then fetches the article
+        again and the unique index on Article.url drops the duplicate insert.
+        """
+        if not self.url_source:
+            return 0
+        read = 0
+        for id_, url in self.url_source(bloom.watermark):
+            if url:
+                bloom.add(url)
+            if id_ > bloom.watermark:
+                bloom.watermark = id_
+            read += 1
+        return read
+
+    def refresh(self):
+        """Merge rows inserted since the filter was loaded (e.g. by other processes).
+
+        The runner calls this every ``SEEN_INDEX_REFRESH_INTERVAL`` seconds
+        during a crawl, and the ``--workers`` coordinator before and after
+        its workers run.
+        """
+        bloom = self.bloom
+        added = self._catch_up(bloom)
+        bloom.flush()
+        return added
+
+    def might_contain(self, url):
+        self.probes += 1
+        hit = url in self.bloom
+        if hit:
+            self.probable_hits += 1
+        return hit
+
+    def record_confirmation(self, seen):
+        """Record the DB's verdict for a probable hit."""
+        if seen:
+            self.confirmed_hits += 1
+        else:
+            self.false_positives += 1
+
+    def add(self, url):
+        return self.bloom.add(url)
+
+    def add_many(self, urls):
+        bloom = self.bloom
+        for url in urls:
+            if url:
+                bloom.add(url)
+        bloom.flush()
+
+    def flush(self):
+        if self._bloom is not None:
+            self._bloom.flush()
+
+    def observed_false_positive_rate(self):
+        """False positives among URLs that were not actually stored."""
+        negatives = self.probes - self.confirmed_hits
+        return self.false_positives / negatives if negatives > 0 else 0.0
+
+    def stats(self):
+        bloom = self._bloom
+        return {
+            "urls": bloom.count if bloom else 0,
+            "watermark": bloom.watermark if bloom else 0,
+            "bytes": bloom.nbytes if bloom else 0,
+            "probes": self.probes,
+            "probable_hits": self.probable_hits,
+            "confirmed_hits": self.confirmed_hits,
+            "false_positives": self.false_positives,
+            "false_positive_rate": round(self.observed_false_positive_rate(), 6),
+            "expected_false_positive_rate": round(bloom.expected_false_positive_rate(), 6) if bloom else 0.0,
+        }
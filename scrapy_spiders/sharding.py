@@ -0,0 +1,277 @@
+"""Crawling with several worker processes (``runner --workers N``).
+
+One ``CrawlerProcess`` parses on a single core. With ``--workers N`` the
+runner becomes a coordinator: it starts N copies of itself (``--shard i/N``)
+and waits for them. No broker is involved; the workers share files in a run
+directory under the state dir (``instance/scrapy/shards/<run>/``):
+
+- Frontier sharding (``--shard-by``):
+  - ``listing`` (default): every worker runs every spider, but keeps only the
+    start requests whose listing (category) hashes to its shard, so a
+    listing and the pages that follow it stay on one worker;
+  - ``url``: the same, hashing each start request's URL (every listing page
+    on its own);
+  - ``spider``: whole spiders are dealt out to the workers round-robin.
+- Article dedupe: before a worker schedules an article request it claims
+  the normalized URL in ``claims.sqlite`` (``INSERT OR IGNORE``). Articles
+  linked from listings on several workers are fetched once. Errors fail
+  open, so at worst an article is fetched twice, and the unique index on
+  ``Article.url`` still applies.
+- ScrapeJob: every worker writes into the same ScrapeJob row(s). The
+  pipeline's ``items_count`` update is an atomic increment, but only the
+  coordinator finishes the job (final status, ``notified``, the closing
+  MySQL backup: the runner's usual end-of-run steps), once all workers
+  have exited. Workers also make no periodic backups.
+- Seen-URL index: workers map ``seen_urls.bloom`` copy-on-write and never
+  write it (``read_only``), because N processes setting bits and rewriting
+  the header count/watermark of one file lose each other's updates. Only
+  the coordinator writes it: it catches the file up with the DB before the
+  workers start and merges what they stored once they have exited. Within
+  a run, URLs stored by other workers are not in a worker's filter; the
+  claims above keep those from being fetched twice.
+- Stats: each worker dumps its crawl stats to ``stats-<shard>-<spider>.json``
+  when a spider closes. The coordinator adds them up into ``stats.json``
+  (counters summed, maxima maxed, averages and rates dropped) and prints a
+  summary.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from scrapy.spidermiddlewares.base import BaseSpiderMiddleware
+
+from scrapy_spiders.state import state_path
+from scrapy_spiders.urls import normalize_url
+
+logger = logging.getLogger(__name__)
+
+SHARD_MODES = ("listing", "url", "spider")
+DEFAULT_SHARD_MODE = "listing"
+
+# counters kept per process (not per crawler) and copied into each spider's stats
+PROCESS_WIDE_PREFIXES = ("browser/", "url_normalize/", "seen_index/")
+
+# runner options the coordinator must not pass on to its workers
+_COORDINATOR_OPTIONS = ("--workers", "--shard", "--shard-dir")
+
+
+def shard_of(key, count):
+    """Stable shard number of ``key`` (same in every process, unlike ``hash()``)."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def parse_shard(value):
+    """``"2/4"`` -> ``(2, 4)``."""
+    index, _, count = value.partition("/")
+    index, count = int(index), int(count)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"bad shard {value!r}; expected INDEX/COUNT with 0 <= INDEX < COUNT")
+    return index, count
+
+
+def spiders_for_shard(spider_classes, index, count):
+    """``--shard-by spider``: the spiders dealt to worker ``index``."""
+    return [cls for i, cls in enumerate(spider_classes) if i % count == index]
+
+
+class ClaimStore:
+    """Cross-process "first one wins" set of article URLs, kept in SQLite."""
+
+    def __init__(self, path, shard=0):
+        self.path = path
+        self.shard = shard
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS claims (url TEXT PRIMARY KEY, shard INTEGER)")
+
+    def claim(self, url):
+        """True if this process is the first to claim ``url``."""
+        try:
+            cur = self.conn.execute("INSERT OR IGNORE INTO claims (url, shard) VALUES (?, ?)", (url, self.shard))
+            return cur.rowcount == 1
+        except sqlite3.Error as exc:
+            logger.warning("Claim of %s failed (%s); fetching it anyway", url, exc)
+            return True
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class ShardMiddleware(BaseSpiderMiddleware):
+    """Keeps a worker to its share of the start requests and claims article URLs.
+
+    Enabled by the runner in worker processes only (``SHARD_INDEX`` /
+    ``SHARD_COUNT`` / ``SHARD_BY`` / ``SHARD_CLAIMS_PATH`` settings). It sits
+    closer to the spider than ``RenderPolicyMiddleware`` so the browser
+    retries that middleware emits are not claimed a second time.
+    """
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        settings = crawler.settings
+        self.index = settings.getint("SHARD_INDEX", 0)
+        self.count = max(1, settings.getint("SHARD_COUNT", 1))
+        self.mode = settings.get("SHARD_BY", DEFAULT_SHARD_MODE)
+        path = settings.get("SHARD_CLAIMS_PATH")
+        self.claims = ClaimStore(path, self.index) if path else None
+        self.stats = crawler.stats
+
+    def _owns(self, request):
+        if self.mode == "spider" or self.count == 1:
+            return True
+        key = request.url
+        if self.mode == "listing" and request.meta.get("listing"):
+            key = f"{self.crawler.spider.name}:{request.meta['listing']}"
+        return shard_of(key, self.count) == self.index
+
+    def _is_article_request(self, request):
+        callback = getattr(self.crawler.spider, "parse_article", None)
+        return callback is not None and request.callback == callback
+
+    def get_processed_request(self, request, response):
+        if response is None:
+            # start request
+            if self._owns(request):
+                self.stats.inc_value("shard/start_requests")
+                return request
+            self.stats.inc_value("shard/start_requests_skipped")
+            return None
+        if self.claims is not None and self._is_article_request(request):
+            if not self.claims.claim(normalize_url(request.url)):
+                self.stats.inc_value("shard/articles_claimed_elsewhere")
+                return None
+            self.stats.inc_value("shard/articles_claimed")
+        return request
+
+
+def dump_worker_stats(run_dir, shard, spider_name, stats):
+    """Write one spider's final crawl stats for the coordinator."""
+    path = os.path.join(run_dir, f"stats-{shard}-{spider_name}.json")
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(stats, f, default=str, indent=1, sort_keys=True)
+    except OSError as exc:
+        logger.warning("Could not write worker stats to %s: %s", path, exc)
+
+
+def _merge(total, key, value):
+    if key.endswith(("_max", "/max", "max_concurrent", "elapsed_time_seconds")):
+        total[key] = max(total.get(key, value), value)
+    else:
+        total[key] = total.get(key, 0) + value
+
+
+def aggregate_stats(paths):
+    """Combine worker stats files: counters summed, maxima maxed, averages/rates dropped.
+
+    Process-wide counters (``PROCESS_WIDE_PREFIXES``) are copied into the
+    stats of every spider in a worker, so they are taken once per worker.
+    """
+    total = {}
+    per_worker = {}
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            continue
+        worker = os.path.basename(path).split("-")[1]
+        for key, value in stats.items():
+            if key.endswith(("_avg", "_rate")):
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                if key == "start_time":
+                    total[key] = min(total.get(key, value), value)
+                elif key == "finish_time":
+                    total[key] = max(total.get(key, value), value)
+                elif key == "finish_reason":
+                    total.setdefault("finish_reasons", {})
+                    total["finish_reasons"][value] = total["finish_reasons"].get(value, 0) + 1
+                continue
+            if key.startswith(PROCESS_WIDE_PREFIXES):
+                # the last spider to close has the most complete copy
+                counters = per_worker.setdefault(worker, {})
+                counters[key] = max(counters.get(key, value), value)
+            else:
+                _merge(total, key, value)
+    for counters in per_worker.values():
+        for key, value in counters.items():
+            _merge(total, key, value)
+    return total
+
+
+def _worker_argv(argv):
+    """``argv`` minus the coordinator-only options (and their values)."""
+    out = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        name = arg.split("=", 1)[0]
+        if name in _COORDINATOR_OPTIONS:
+            skip = "=" not in arg
+            continue
+        out.append(arg)
+    return out
+
+
+def run_coordinator(argv, workers, shard_by=DEFAULT_SHARD_MODE, spider_count=None):
+    """Start ``workers`` runner processes over ``argv`` and wait for them all.
+
+    Returns True when every worker exited cleanly.
+    """
+    if shard_by == "spider" and spider_count:
+        workers = min(workers, spider_count)
+    run_name = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{os.getpid()}"
+    run_dir = os.path.dirname(state_path("shards", run_name, "stats.json"))
+    base = [sys.executable, "-m", "scrapy_spiders.runner"] + _worker_argv(argv)
+
+    started = time.monotonic()
+    procs = []
+    for i in range(workers):
+        cmd = base + ["--shard", f"{i}/{workers}", "--shard-dir", run_dir]
+        procs.append(subprocess.Popen(cmd))
+    print(f"Started {workers} workers (shard by {shard_by}); run directory {run_dir}")
+
+    try:
+        codes = [p.wait() for p in procs]
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+        codes = [p.wait() for p in procs]
+    success = all(code == 0 for code in codes)
+
+    totals = aggregate_stats(sorted(glob.glob(os.path.join(run_dir, "stats-*.json"))))
+    totals["workers"] = workers
+    totals["workers_failed"] = sum(1 for code in codes if code != 0)
+    totals["elapsed_seconds"] = round(time.monotonic() - started, 1)
+    with open(os.path.join(run_dir, "stats.json"), "w", encoding="utf-8") as f:
+        json.dump(totals, f, default=str, indent=1, sort_keys=True)
+    try:
+        os.remove(os.path.join(run_dir, "claims.sqlite"))
+        for suffix in ("-wal", "-shm"):
+            path = os.path.join(run_dir, "claims.sqlite" + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+    except OSError:
+        pass
+
+    print(f"Workers finished in {totals['elapsed_seconds']}s (exit codes {codes}):")
+    for key in ("item_scraped_count", "downloader/request_count", "shard/articles_claimed",
+                "shard/articles_claimed_elsewhere", "sqlalchemy_pipeline/rows_inserted"):
+        if key in totals:
+            print(f"  {key}: {totals[key]}")
+    return success
@@ -0,0 +1,102 @@
+"""One Playwright driver and one Chromium for every crawler in the process.
+
+scrapy-playwright creates a download handler per crawler, and each handler
+starts its own Playwright driver and browser. When the runner crawls several
+spiders in one ``CrawlerProcess``, that means one Chromium per spider.
+``SharedBrowserDownloadHandler`` (set as ``DOWNLOAD_HANDLERS`` by the runner)
+uses ``SharedBrowserProvider`` instead:
+
+- The first handler to start launches the driver. The browser itself is
+  launched on first use and handed to every later handler.
+- Each crawler still gets its own browser contexts (``pool-N``, see
+  ``BrowserPoolMiddleware``), so cookies and storage stay per spider.
+- When a crawler finishes, its handler closes only its own contexts. The
+  browser and driver are closed when the last handler has closed.
+
+The first handler's Playwright settings (launch options, browser type) apply
+to everyone; the runner gives all crawlers the same settings anyway.
+"""
+import asyncio
+import logging
+from contextlib import suppress
+
+from scrapy_playwright.handler import ScrapyPlaywrightDownloadHandler
+from scrapy_playwright.provider import PlaywrightBrowserProvider
+
+from scrapy_spiders.browser import _COUNTS, _LOCK
+
+logger = logging.getLogger(__name__)
+
+_SHARED = {
+    "provider": None,  # the PlaywrightBrowserProvider doing the actual work
+    "browser": None,
+    "users": 0,
+    "lock": None,
+}
+
+
+def _shared_lock():
+    # created lazily: it has to belong to the loop Playwright runs on
+    if _SHARED["lock"] is None:
+        _SHARED["lock"] = asyncio.Lock()
+    return _SHARED["lock"]
+
+
+class SharedBrowserProvider:
+    """``PLAYWRIGHT_BROWSER_PROVIDER`` handing out one process-wide browser."""
+
+    def __init__(self, config):
+        self.config = config
+
+    async def start(self):
+        async with _shared_lock():
+            if _SHARED["provider"] is None:
+                provider = PlaywrightBrowserProvider(self.config)
+                await provider.start()
+                _SHARED["provider"] = provider
+            _SHARED["users"] += 1
+
+    async def launch_browser(self):
+        async with _shared_lock():
+            browser = _SHARED["browser"]
+            if browser is None or not browser.is_connected():
+                browser = _SHARED["browser"] = await _SHARED["provider"].launch_browser()
+                with _LOCK:
+                    _COUNTS["browser_launches"] += 1
+            else:
+                logger.debug("Reusing the shared browser")
+            return browser
+
+    async def launch_persistent_context(self, context_kwargs):
+        return await _SHARED["provider"].launch_persistent_context(context_kwargs)
+
+    async def close(self):
+        async with _shared_lock():
+            _SHARED["users"] -= 1
+            if _SHARED["users"] > 0:
+                return
+            browser, provider = _SHARED["browser"], _SHARED["provider"]
+            _SHARED.update(browser=None, provider=None, users=0)
+        if browser is not None:
+            logger.info("Closing shared browser")
+            with suppress(Exception):
+                await browser.close()
+        if provider is not None:
+            await provider.close()
+
+
+class SharedBrowserDownloadHandler(ScrapyPlaywrightDownloadHandler):
+    """scrapy-playwright's handler, on the process-wide browser of ``SharedBrowserProvider``."""
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        self.browser_provider_cls = SharedBrowserProvider
+
+    async def _close(self):
+        # the stock handler closes self.browser here, which would pull the
+        # browser out from under the crawlers that are still running
+        with suppress(Exception):
+            await asyncio.gather(*[ctx.context.close() for ctx in self.context_wrappers.values()])
+        self.context_wrappers.clear()
+        if getattr(self, "browser_provider", None):
+            await self.browser_provider.close()
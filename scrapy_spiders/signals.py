@@ -0,0 +1,14 @@
+"""Custom crawler signals sent by this project's components.
+
+- ``items_stored``: sent by ``SQLAlchemyPipeline`` on the reactor thread
+  once a batch of items has been written to the database (inserted, or
+  already there), or at once for items it has nothing to write for, with
+  ``items=[...]``. ``item_scraped`` fires as soon as an item is queued for
+  writing, so anything that needs "this item is in the database"
+  (``FrontierMiddleware``) listens to this instead.
+- ``items_failed``: sent instead of ``items_stored`` for the items of a
+  batch that could not be written, with ``items=[...]``.
+"""
+
+items_stored = object()
+items_failed = object()
@@ -12,64 +12,41 @@ except Exception:
     PageMethod = None
     PlaywrightRequest = None
 from urllib.parse import urljoin
-from scrapy_spiders.db import url_exists, preload_existing_urls
-from bs4 import BeautifulSoup
+from scrapy_spiders.db import filter_new_urls, preload_existing_urls
+from scrapy_spiders.pagination import PaginatedListingMixin
+from scrapy_spiders.discovery import DiscoveryMixin
+from scrapy_spiders.extract import attr, first, get_text, links
+from scrapy_spiders.metadata import page_metadata
+from scrapy_spiders.offload import extract_item
+from scrapy_spiders.waits import wait_for_any_selector
 from datetime import datetime
 import re
 
 
-async def _wait_for_any_selector(page, selectors, timeout=5000):
-    """Playwright page init helper: wait for any selector in the list.
-
-    This is passed to PageMethod as a callable so the download handler
-    won't raise if a selector isn't present — it will try each selector
-    and return once one is visible.
-    """
-    for sel in selectors:
-        try:
-            await page.wait_for_selector(sel, timeout=timeout)
-            return True
-        except Exception:
-            continue
-    return None
-
-class ManilaBulletinSpider(scrapy.Spider):
+class ManilaBulletinSpider(DiscoveryMixin, PaginatedListingMixin, scrapy.Spider):
     name = "manilabulletin"
     LISTING_URL = "https://mb.com.ph/"
     DEFAULT_MAX_PAGES = 100
+    # listings/articles ask for a Playwright render (see scrapy_spiders.rendering)
+    USES_BROWSER = PageMethod is not None
+    SITEMAP_URLS = ["https://mb.com.ph/sitemap.xml"]
 
-    def __init__(self, pages=2, limit=0, *args, **kwargs):
+    def __init__(self, pages=2, limit=0, incremental=False, min_new_fraction=0.0,
+                 discovery=False, discovery_since=None, sitemap_urls=None, feed_urls=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.pages = None if pages is None else int(pages)
         self.limit = int(limit)
+        self.init_pagination(incremental, min_new_fraction)
+        self.init_discovery(discovery, discovery_since, sitemap_urls, feed_urls)
         preload_existing_urls()
 
     def start_requests(self):
+        if self.use_discovery():
+            yield from self.discovery_requests()
+            return
         cap = self.pages if self.pages is not None else self.DEFAULT_MAX_PAGES
         # homepage
-        for p in range(1, cap + 1):
-            if p == 1:
-                url = self.LISTING_URL
-            else:
-                url = urljoin(self.LISTING_URL, f"?page={p}")
-            # Listings are client-side rendered; prefer Playwright so widgets load
-            listing_selectors = [
-                '.sw-list-a',
-                '.mb-top-headings',
-                '.widget-item-headline',
-                '.most-popular',
-                '#widget_1561',
-                '.sw-list-a a',
-            ]
-            # If PlaywrightRequest class is available use it; otherwise a normal
-            # scrapy.Request with meta={'playwright': True, 'playwright_page_methods': [...]}
-            if PageMethod:
-                pm = PageMethod(_wait_for_any_selector, listing_selectors, 8000)
-                meta = {'playwright': True, 'playwright_page_methods': [pm]}
-            else:
-                meta = {}
-            yield (PlaywrightRequest(url, callback=self.parse_listing, meta=meta, dont_filter=True)
-                   if PlaywrightRequest else scrapy.Request(url, callback=self.parse_listing, meta=meta))
+        yield from self.listing_requests("home", self._home_page_url, cap)
 
         # categories
         categories = [
@@ -85,37 +62,33 @@ class ManilaBulletinSpider(scrapy.Spider):
             "https://mb.com.ph/category/sports",
         ]
         for cat in categories:
-            for p in range(1, cap + 1):
-                if p == 1:
-                    url = cat
-                else:
-                    url = f"{cat}?page={p}"
-                listing_selectors = [
-                    '.sw-list-a',
-                    '.mb-top-headings',
-                    '.widget-item-headline',
-                    '.most-popular',
-                    '.sw-list-a a',
-                ]
-                if PageMethod:
-                    pm = PageMethod(_wait_for_any_selector, listing_selectors, 8000)
-                    meta = {'playwright': True, 'playwright_page_methods': [pm]}
-                else:
-                    meta = {}
-                yield (PlaywrightRequest(url, callback=self.parse_listing, meta=meta, dont_filter=True)
-                       if PlaywrightRequest else scrapy.Request(url, callback=self.parse_listing, meta=meta))
+            yield from self.listing_requests(cat, lambda p, cat=cat: cat if p == 1 else f"{cat}?page={p}", cap)
 
-    def parse_listing(self, response):
-        """Parse ManilaBulletin listing page and extract article URLs"""
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find all article links
-        links = []
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if href.startswith('https://mb.com.ph/') and '/20' in href:
-                links.append(href)
-        
+    def _home_page_url(self, p):
+        if p == 1:
+            return self.LISTING_URL
+        return urljoin(self.LISTING_URL, f"?page={p}")
+
+    def make_listing_request(self, url, meta):
+        # Listings are client-side rendered; prefer Playwright so widgets load
+        listing_selectors = [
+            '.sw-list-a',
+            '.mb-top-headings',
+            '.widget-item-headline',
+            '.most-popular',
+            '.sw-list-a a',
+        ]
+        if meta.get("listing") == "home":
+            listing_selectors.insert(4, '#widget_1561')
+        # If PlaywrightRequest class is available use it; otherwise a normal
+        # scrapy.Request with meta={'playwright': True, 'playwright_page_methods': [...]}
+        if PageMethod:
+            pm = PageMethod(wait_for_any_selector, listing_selectors)
+            meta = dict(meta, playwright=True, playwright_page_methods=[pm])
+        return (PlaywrightRequest(url, callback=self.parse_listing, meta=meta, dont_filter=True)
+                if PlaywrightRequest else scrapy.Request(url, callback=self.parse_listing, meta=meta))
+
+    def make_article_request(self, link):
         # candidate article-body selectors to wait for before parsing
         candidate_selectors = [
             'div.post-content',
@@ -127,149 +100,176 @@ class ManilaBulletinSpider(scrapy.Spider):
             'div[itemprop="articleBody"]',
             'div.content',
         ]
+        # prefer Playwright if available
+        if PageMethod:
+            pm = PageMethod(wait_for_any_selector, candidate_selectors)
+            meta = {'playwright': True, 'playwright_page_methods': [pm]}
+        else:
+            meta = {}
+        return (PlaywrightRequest(link, callback=self.parse_article, meta=meta, dont_filter=True)
+                if PlaywrightRequest else scrapy.Request(link, callback=self.parse_article, meta=meta))
+
+    def accept_discovered_url(self, url):
+        return url.startswith('https://mb.com.ph/')
+
+    def parse_listing(self, response):
+        """Parse ManilaBulletin listing page and extract article URLs"""
+        links = extract_links(response)
+
+        new_links = filter_new_urls(links)
+        for link in new_links:
+            yield self.make_article_request(link)
 
-        for link in links:
-            if url_exists(link):
-                continue
-            # prefer Playwright if available
-            if PageMethod:
-                pm = PageMethod(_wait_for_any_selector, candidate_selectors, 8000)
-                meta = {'playwright': True, 'playwright_page_methods': [pm]}
-            else:
-                meta = {}
-            yield (PlaywrightRequest(link, callback=self.parse_article, meta=meta, dont_filter=True)
-                   if PlaywrightRequest else scrapy.Request(link, callback=self.parse_article, meta=meta))
+        next_page = self.next_listing_page(response, links, new_links)
+        if next_page is not None:
+            yield next_page
 
-    def parse_article(self, response):
+    async def parse_article(self, response):
         """Parse individual ManilaBulletin article"""
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Title
-        title_tag = soup.find('h1') or soup.find('title')
-        title = title_tag.get_text(strip=True) if title_tag else "No title"
+        # inline, or in the extraction process pool when enabled
+        yield await extract_item(self, extract_article, response)
 
-        # Content: try several selectors and fall back to joining <p> elements
-        content = None
-        content_selectors = [
-            ('div', {'class': 'post-content'}),
-            ('div', {'class': 'entry-content'}),
-            ('div', {'class': 'article-content'}),
-            ('div', {'class': 'article-full-body'}),
-            ('article', {}),
-            ('div', {'itemprop': 'articleBody'}),
-            ('div', {'class': 'content'}),
-        ]
-        for name, attrs in content_selectors:
-            tag = soup.find(name, attrs=attrs if attrs else None)
-            if tag:
-                # prefer article-text blocks which site uses
-                article_texts = tag.find_all('div', class_='article-text')
-                if article_texts:
-                    parts = []
-                    for a in article_texts:
-                        t = a.get_text(separator=' ', strip=True)
-                        if t:
-                            parts.append(t)
-                    text = '\n\n'.join(parts).strip()
-                    if text:
-                        content = text
-                        break
 
-                # fallback: gather <p> tags
-                ps = tag.find_all('p')
-                if ps:
-                    text = '\n\n'.join(p.get_text(strip=True) for p in ps if p.get_text(strip=True))
-                    if text:
-                        content = text
-                        break
+# Article links in a listing page
+LISTING_LINKS_XPATH = "//a[starts-with(@href, 'https://mb.com.ph/') and contains(@href, '/20')]/@href"
+
+
+def extract_links(sel):
+    return links(sel, LISTING_LINKS_XPATH)
+
+
+def _paragraphs(tag):
+    return '\n\n'.join(t for t in (get_text(p) for p in tag.xpath('.//p')) if t)
+
+
+def extract_article(sel, url, meta=None):
+    """Build the Manila Bulletin item dict from a response or selector (and its PageMetadata)."""
+    if meta is None:
+        meta = page_metadata(sel)
+
+    # Title
+    title_tag = first(sel, 'h1', 'title')
+    title = get_text(title_tag) if title_tag else (meta.headline or "No title")
 
-                txt = tag.get_text(separator=' ', strip=True)
-                if txt:
-                    content = txt
+    # Content: try several selectors and fall back to joining <p> elements
+    content = None
+    content_selectors = [
+        'div.post-content',
+        'div.entry-content',
+        'div.article-content',
+        'div.article-full-body',
+        'article',
+        'div[itemprop="articleBody"]',
+        'div.content',
+    ]
+    for css in content_selectors:
+        tag = first(sel, css)
+        if tag:
+            # prefer article-text blocks which site uses
+            article_texts = tag.xpath(".//div[contains(concat(' ', normalize-space(@class), ' '), ' article-text ')]")
+            if article_texts:
+                parts = []
+                for a in article_texts:
+                    t = get_text(a, separator=' ')
+                    if t:
+                        parts.append(t)
+                text = '\n\n'.join(parts).strip()
+                if text:
+                    content = text
                     break
-        if not content:
-            ps = soup.find_all('p')
-            if ps:
-                content = '\n\n'.join(p.get_text(strip=True) for p in ps if p.get_text(strip=True))
-        if not content:
-            content = 'No content'
 
-        # Author: meta tag or common selectors
-        author = None
-        meta_author = soup.find('meta', attrs={'name': 'author'})
-        if meta_author and meta_author.get('content'):
-            author = meta_author['content'].strip()
-        if not author:
-            at = soup.find('span', class_='author') or soup.find('a', rel='author') or soup.find('div', class_='byline')
-            if at:
-                author = at.get_text(strip=True)
-        if not author:
-            author = 'Unknown'
+            # fallback: gather <p> tags
+            if tag.xpath('.//p'):
+                text = _paragraphs(tag)
+                if text:
+                    content = text
+                    break
+
+            txt = get_text(tag, separator=' ')
+            if txt:
+                content = txt
+                break
+    if not content:
+        if sel.xpath('//p'):
+            content = _paragraphs(sel)
+    if not content:
+        content = meta.article_body or 'No content'
 
-        # Date: produce ISO 8601 datetime string where possible
-        published_date = None
-        date_str = None
-        time_tag = soup.find('time')
-        if time_tag and (time_tag.get('datetime') or time_tag.get_text(strip=True)):
-            date_str = time_tag.get('datetime') or time_tag.get_text(strip=True)
-        if not date_str:
-            meta_dt = soup.find('meta', attrs={'property': 'article:published_time'})
-            if meta_dt and meta_dt.get('content'):
-                date_str = meta_dt['content']
-        if not date_str:
-            # some articles use a span.issue_date containing text like
-            # "Published Sep 1, 2025 12:16 pm" — prefer that first
-            issue_span = soup.find('span', class_='issue_date')
-            if issue_span and issue_span.get_text(strip=True):
-                # strip leading 'Published' and similar prefixes
-                raw = issue_span.get_text(separator=' ', strip=True)
-                date_str = re.sub(r'(?i)^\s*published[:\s\u00A0]*', '', raw).strip()
-        if not date_str:
-            span_date = soup.find('span', class_='date')
-            if span_date:
-                date_str = span_date.get_text(strip=True)
+    # Author: meta tag or common selectors
+    author = None
+    meta_author = first(sel, 'meta[name="author"]')
+    if meta_author and attr(meta_author, 'content'):
+        author = attr(meta_author, 'content').strip()
+    if not author:
+        at = first(sel, 'span.author', 'a[rel~="author"]', 'div.byline')
+        if at:
+            author = get_text(at)
+    if not author:
+        author = meta.author or 'Unknown'
 
-        if date_str:
-            try:
-                dt = None
-                # ISO-like strings
-                if 'T' in date_str or re.search(r"\d{4}-\d{2}-\d{2}", date_str):
-                    # support Z timezone by normalizing to +00:00 for fromisoformat
+    # Date: produce ISO 8601 datetime string where possible
+    published_date = None
+    date_str = None
+    time_tag = first(sel, 'time')
+    if time_tag and (attr(time_tag, 'datetime') or get_text(time_tag)):
+        date_str = attr(time_tag, 'datetime') or get_text(time_tag)
+    if not date_str:
+        # JSON-LD datePublished, else the article:published_time meta tag
+        date_str = meta.date_published
+    if not date_str:
+        # some articles use a span.issue_date containing text like
+        # "Published Sep 1, 2025 12:16 pm" — prefer that first
+        issue_span = first(sel, 'span.issue_date')
+        if issue_span and get_text(issue_span):
+            # strip leading 'Published' and similar prefixes
+            raw = get_text(issue_span, separator=' ')
+            date_str = re.sub(r'(?i)^\s*published[:\s\u00A0]*', '', raw).strip()
+    if not date_str:
+        span_date = first(sel, 'span.date')
+        if span_date:
+            date_str = get_text(span_date)
+
+    if date_str:
+        try:
+            dt = None
+            # ISO-like strings
+            if 'T' in date_str or re.search(r"\d{4}-\d{2}-\d{2}", date_str):
+                # support Z timezone by normalizing to +00:00 for fromisoformat
+                try:
+                    dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+                except Exception:
+                    dt = None
+
+            if dt is None:
+                # Try a few common human-readable formats, including ones
+                # with time of day like "Sep 1, 2025 12:16 pm".
+                fmts = (
+                    '%B %d, %Y %I:%M %p',
+                    '%b %d, %Y %I:%M %p',
+                    '%B %d, %Y',
+                    '%b %d, %Y',
+                    '%Y/%m/%d',
+                    '%Y-%m-%d',
+                )
+                for fmt in fmts:
                     try:
-                        dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+                        dt = datetime.strptime(date_str, fmt)
+                        break
                     except Exception:
-                        dt = None
+                        continue
 
-                if dt is None:
-                    # Try a few common human-readable formats, including ones
-                    # with time of day like "Sep 1, 2025 12:16 pm".
-                    fmts = (
-                        '%B %d, %Y %I:%M %p',
-                        '%b %d, %Y %I:%M %p',
-                        '%B %d, %Y',
-                        '%b %d, %Y',
-                        '%Y/%m/%d',
-                        '%Y-%m-%d',
-                    )
-                    for fmt in fmts:
-                        try:
-                            dt = datetime.strptime(date_str, fmt)
-                            break
-                        except Exception:
-                            continue
+            if dt:
+                # Convert to ISO 8601 string; keep tz if present else naive ISO
+                published_date = dt.isoformat()
+        except Exception:
+            published_date = None
 
-                if dt:
-                    # Convert to ISO 8601 string; keep tz if present else naive ISO
-                    published_date = dt.isoformat()
-            except Exception:
-                published_date = None
-        
-        yield {
-            'title': title,
-            'url': response.url,
-            'content': content,
-            'author': author,
-            'date': published_date,
-            'published_date': published_date,
-            'source': 'Manila Bulletin'
-        }
+    return {
+        'title': title,
+        'url': url,
+        'content': content,
+        'author': author,
+        'date': published_date,
+        'published_date': published_date,
+        'source': 'Manila Bulletin'
+    }
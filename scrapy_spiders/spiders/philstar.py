@@ -1,9 +1,12 @@
 import scrapy
 from urllib.parse import urljoin, urlparse
-from scrapy_spiders.db import url_exists, preload_existing_urls
-from bs4 import BeautifulSoup
+from scrapy_spiders.db import filter_new_urls, preload_existing_urls
+from scrapy_spiders.discovery import DiscoveryMixin
+from scrapy_spiders.extract import first, get_text, links
+from scrapy_spiders.metadata import page_metadata
+from scrapy_spiders.offload import extract_item
+from scrapy_spiders.waits import scroll_until_stable, wait_for_any_selector
 from datetime import datetime
-import asyncio
 try:
     from scrapy_playwright.page import PageMethod
     try:
@@ -14,24 +17,41 @@ except Exception:
     PageMethod = None
     PlaywrightRequest = None
 
-class PhilstarSpider(scrapy.Spider):
+class PhilstarSpider(DiscoveryMixin, scrapy.Spider):
     name = "philstar"
     LISTING_URL = "https://www.philstar.com/"
     DEFAULT_MAX_PAGES = 10000
-
-    def __init__(self, pages=2, limit=0, *args, **kwargs):
+    # listings/articles ask for a Playwright render (see scrapy_spiders.rendering)
+    USES_BROWSER = PageMethod is not None
+    FEED_URLS = [
+        "https://www.philstar.com/rss/headlines",
+        "https://www.philstar.com/rss/nation",
+        "https://www.philstar.com/rss/world",
+        "https://www.philstar.com/rss/business",
+        "https://www.philstar.com/rss/sports",
+        "https://www.philstar.com/rss/entertainment",
+        "https://www.philstar.com/rss/lifestyle",
+    ]
+    EXCLUDE_SECTIONS = ("/other-sections/", "/forex-stocks/", "/lotto-results/")
+
+    def __init__(self, pages=2, limit=0, discovery=False, discovery_since=None, sitemap_urls=None,
+                 feed_urls=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.pages = None if pages is None else int(pages)
         self.limit = int(limit)
+        self.init_discovery(discovery, discovery_since, sitemap_urls, feed_urls)
         preload_existing_urls()
 
     def start_requests(self):
+        if self.use_discovery():
+            yield from self.discovery_requests()
+            return
         cap = self.pages if self.pages is not None else self.DEFAULT_MAX_PAGES 
         # If Playwright is available, render listings and simulate scrolling
         if PageMethod:
-            # helper PageMethod will scroll the page 'cap' times (or pages argument)
-            # until articles load. Use a simple selector that matches article nodes.
-            pm = PageMethod(self._scroll_and_wait, 'article', cap, 1000)
+            # scroll up to 'cap' times (or pages argument) while new article nodes
+            # keep loading; stops early once a scroll adds nothing
+            pm = PageMethod(scroll_until_stable, 'article', cap)
             meta = {'playwright': True, 'playwright_page_methods': [pm]}
             # yield the homepage and let the page method perform scrolling to load more
             yield (PlaywrightRequest(self.LISTING_URL, callback=self.parse_listing, meta=meta)
@@ -58,7 +78,7 @@ class PhilstarSpider(scrapy.Spider):
         for cat in categories:
             # For categories prefer Playwright scrolling as well when available
             if PageMethod:
-                pm = PageMethod(self._scroll_and_wait, 'article', cap, 1000)
+                pm = PageMethod(scroll_until_stable, 'article', cap)
                 meta = {'playwright': True, 'playwright_page_methods': [pm]}
                 yield (PlaywrightRequest(cat, callback=self.parse_listing, meta=meta)
                        if PlaywrightRequest else scrapy.Request(cat, callback=self.parse_listing, meta=meta))
@@ -70,44 +90,12 @@ class PhilstarSpider(scrapy.Spider):
                         url = f"{cat}?page={p}"
                     yield scrapy.Request(url, callback=self.parse_listing)
 
-
-    async def _scroll_and_wait(self, page, selector, max_scrolls=2, pause_ms=1000):
-        """Scroll the page up to max_scrolls times, waiting pause_ms between scrolls.
-
-        Return True when an element matching `selector` is present, else None.
-        This is intended to be passed to Playwright PageMethod so listings loaded by
-        infinite-scroll get appended before Scrapy parses the rendered HTML.
-        """
-        for i in range(int(max_scrolls) if max_scrolls else 1):
-            try:
-                # small wait to allow initial content
-                await asyncio.sleep(pause_ms / 1000)
-                found = await page.query_selector(selector)
-                if found:
-                    return True
-                # scroll to bottom and wait for network/activity
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await asyncio.sleep(pause_ms / 1000)
-                found = await page.query_selector(selector)
-                if found:
-                    return True
-            except Exception:
-                continue
-        return None
-
     def parse_listing(self, response):
         """Parse Philstar listing page and extract article URLs"""
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        EXCLUDE_SECTIONS = ("/other-sections/", "/forex-stocks/", "/lotto-results/")
-        
         # Find all article links
-        links = []
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if href.startswith('https://www.philstar.com/') and '/20' in href:
-                links.append(href)
+        links = extract_links(response)
         
+        wanted = []
         for link in links:
             # filter out non-article sections by path
             try:
@@ -116,169 +104,132 @@ class PhilstarSpider(scrapy.Spider):
             except Exception:
                 path = ""
 
-            if any(ex in path for ex in EXCLUDE_SECTIONS):
+            if any(ex in path for ex in self.EXCLUDE_SECTIONS):
                 continue
+            wanted.append(link)
 
-            # skip scheduling if URL already exists in DB
-            if url_exists(link):
-                continue
-
-            # Prefer Playwright for article pages so client-side markup (article body, date)
-            # is available. If Playwright isn't installed the meta flags are harmless.
-            if PageMethod:
-                # use the same scrolling/wait helper to ensure article body exists
-                pm_article = PageMethod(self._scroll_and_wait, '.article__writeup, #sports_article_writeup, .article__writeup p', 2, 800)
-                meta = {'playwright': True, 'playwright_page_methods': [pm_article]}
-                if PlaywrightRequest:
-                    yield PlaywrightRequest(link, callback=self.parse_article, meta=meta)
-                else:
-                    yield scrapy.Request(link, callback=self.parse_article, meta=meta)
-            else:
-                yield scrapy.Request(link, callback=self.parse_article)
+        # skip scheduling URLs that already exist in DB
+        for link in filter_new_urls(wanted):
+            yield self.make_article_request(link)
 
-    def parse_article(self, response):
-        """Parse individual Philstar article"""
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Get title
-        title_tag = soup.find('h1') or soup.find('title')
-        title = title_tag.get_text(strip=True) if title_tag else "No title"
-        
-        # Get content — prefer the site-specific article writeup container used on Philstar
-        content = None
-        # Try JSON-LD articleBody first
+    def make_article_request(self, link):
+        # Prefer Playwright for article pages so client-side markup (article body, date)
+        # is available. If Playwright isn't installed the meta flags are harmless.
+        if PageMethod:
+            # wait until the article body exists (either layout)
+            pm_article = PageMethod(wait_for_any_selector, ['.article__writeup', '#sports_article_writeup'])
+            meta = {'playwright': True, 'playwright_page_methods': [pm_article]}
+            if PlaywrightRequest:
+                return PlaywrightRequest(link, callback=self.parse_article, meta=meta)
+            return scrapy.Request(link, callback=self.parse_article, meta=meta)
+        return scrapy.Request(link, callback=self.parse_article)
+
+    def accept_discovered_url(self, url):
         try:
-            import json
-            ld = soup.find('script', type='application/ld+json')
-            if ld:
-                data = json.loads(ld.string)
-                # JSON-LD can be a list or dict
-                if isinstance(data, list):
-                    for entry in data:
-                        if entry.get('@type') in ('NewsArticle', 'Article'):
-                            content = entry.get('articleBody') or content
-                            break
-                elif isinstance(data, dict) and data.get('@type') in ('NewsArticle', 'Article'):
-                    content = data.get('articleBody') or content
+            path = urlparse(url).path or ""
         except Exception:
-            content = content
+            path = ""
+        return url.startswith('https://www.philstar.com/') and not any(ex in path for ex in self.EXCLUDE_SECTIONS)
 
-        if not content:
-            content_div = (soup.find(id='sports_article_writeup')
-                           or soup.find('div', class_='article__writeup')
-                           or soup.find('div', class_='article-writeup')
-                           or soup.find('div', class_='article-content')
-                           or soup.find('div', class_='content'))
-            if content_div:
-                # join paragraph texts to preserve spacing
-                ps = content_div.find_all('p')
-                if ps:
-                    content = '\n\n'.join(p.get_text(strip=True) for p in ps if p.get_text(strip=True))
-                else:
-                    content = content_div.get_text(separator=' ', strip=True)
+    async def parse_article(self, response):
+        """Parse individual Philstar article"""
+        # inline, or in the extraction process pool when enabled
+        yield await extract_item(self, extract_article, response)
 
-        if not content:
-            content = "No content"
-        
-        # Get author — prefer JSON-LD, then the article credits block, then fallbacks
-        author = None
-        try:
-            import json
-            ld = soup.find('script', type='application/ld+json')
-            if ld:
-                data = json.loads(ld.string)
-                entry = None
-                if isinstance(data, list):
-                    for e in data:
-                        if e.get('@type') in ('NewsArticle', 'Article'):
-                            entry = e
-                            break
-                elif isinstance(data, dict) and data.get('@type') in ('NewsArticle', 'Article'):
-                    entry = data
 
-                if entry:
-                    a = entry.get('author')
-                    if isinstance(a, dict):
-                        author = a.get('name')
-                    elif isinstance(a, list) and a:
-                        first = a[0]
-                        author = first.get('name') if isinstance(first, dict) else (first if isinstance(first, str) else None)
-                    elif isinstance(a, str):
-                        author = a
-        except Exception:
-            author = author
+# Article links in a listing page
+LISTING_LINKS_XPATH = "//a[starts-with(@href, 'https://www.philstar.com/') and contains(@href, '/20')]/@href"
 
-        if not author:
-            credits = soup.find(id='sports_article_credits') or soup.find('div', class_='article__credits')
-            if credits:
-                # The author is usually the first <a> inside the credits block
-                a = credits.find('a', href=True)
-                if a and a.get_text(strip=True):
-                    author = a.get_text(strip=True)
 
-        if not author:
-            # previous fallbacks
-            author_tag = soup.find('span', class_='author') or soup.find('div', class_='byline')
-            author = author_tag.get_text(strip=True) if author_tag else "Unknown"
-        
-        # Get date — prefer JSON-LD or the article__date-published text
-        published_date = None
-        date_iso = None
-        # try JSON-LD first
-        try:
-            import json
-            ld = soup.find('script', type='application/ld+json')
-            if ld:
-                data = json.loads(ld.string)
-                if isinstance(data, list):
-                    for entry in data:
-                        if entry.get('@type') in ('NewsArticle', 'Article'):
-                            date_iso = entry.get('datePublished') or date_iso
-                            break
-                elif isinstance(data, dict) and data.get('@type') in ('NewsArticle', 'Article'):
-                    date_iso = data.get('datePublished') or date_iso
-        except Exception:
-            date_iso = date_iso
+def extract_links(sel):
+    return links(sel, LISTING_LINKS_XPATH)
 
-        if not date_iso:
-            # look for site-specific date string
-            date_tag = soup.find('div', class_='article__date-published') or soup.find('time') or soup.find('span', class_='date')
-            if date_tag:
-                date_str = date_tag.get_text(strip=True)
-                # common format: "August 30, 2025 | 2:01pm"
-                try:
-                    if '|' in date_str:
-                        left, right = [s.strip() for s in date_str.split('|', 1)]
-                        # parse left as date and right as time
-                        dt = datetime.strptime(f"{left} {right}", '%B %d, %Y %I:%M%p')
-                        date_iso = dt.isoformat()
-                    else:
-                        # try with only date
-                        dt = datetime.strptime(date_str, '%B %d, %Y')
-                        date_iso = dt.date().isoformat()
-                except Exception:
-                    date_iso = None
 
-        # Normalize published_date into Python date (kept for backward compatibility) and set ISO `date`
-        if date_iso:
+def extract_article(sel, url, meta=None):
+    """Build the Philstar item dict from a response or selector (and its PageMetadata)."""
+    if meta is None:
+        meta = page_metadata(sel)
+
+    # Get title
+    title_tag = first(sel, 'h1', 'title')
+    title = get_text(title_tag) if title_tag else "No title"
+
+    # Get content — prefer JSON-LD articleBody, then the site-specific article writeup container
+    content = meta.article_body
+
+    if not content:
+        content_div = first(sel, '//*[@id="sports_article_writeup"]', 'div.article__writeup',
+                            'div.article-writeup', 'div.article-content', 'div.content')
+        if content_div:
+            # join paragraph texts to preserve spacing
+            ps = content_div.xpath('.//p')
+            if ps:
+                content = '\n\n'.join(t for t in (get_text(p) for p in ps) if t)
+            else:
+                content = get_text(content_div, separator=' ')
+
+    if not content:
+        content = "No content"
+
+    # Get author — prefer structured data, then the article credits block, then fallbacks
+    author = meta.author
+
+    if not author:
+        credits = first(sel, '//*[@id="sports_article_credits"]', 'div.article__credits')
+        if credits:
+            # The author is usually the first <a> inside the credits block
+            a = first(credits, './/a[@href]')
+            if a and get_text(a):
+                author = get_text(a)
+
+    if not author:
+        # previous fallbacks
+        author_tag = first(sel, 'span.author', 'div.byline')
+        author = get_text(author_tag) if author_tag else "Unknown"
+
+    # Get date — prefer JSON-LD / article:published_time or the article__date-published text
+    published_date = None
+    date_iso = meta.date_published
+
+    if not date_iso:
+        # look for site-specific date string
+        date_tag = first(sel, 'div.article__date-published', 'time', 'span.date')
+        if date_tag:
+            date_str = get_text(date_tag)
+            # common format: "August 30, 2025 | 2:01pm"
             try:
-                # if already ISO-like including time
-                if 'T' in date_iso:
-                    dt = datetime.fromisoformat(date_iso.replace('Z', '+00:00'))
-                    published_date = dt
+                if '|' in date_str:
+                    left, right = [s.strip() for s in date_str.split('|', 1)]
+                    # parse left as date and right as time
+                    dt = datetime.strptime(f"{left} {right}", '%B %d, %Y %I:%M%p')
                     date_iso = dt.isoformat()
                 else:
-                    # date only
-                    published_date = datetime.fromisoformat(date_iso).date()
+                    # try with only date
+                    dt = datetime.strptime(date_str, '%B %d, %Y')
+                    date_iso = dt.date().isoformat()
             except Exception:
-                published_date = None
-        
-        yield {
-            'title': title,
-            'url': response.url,
-            'content': content,
-            'author': author,
-            'date': date_iso,
-            'published_date': published_date,
-            'source': 'Philstar'
-        }
+                date_iso = None
+
+    # Normalize published_date into Python date (kept for backward compatibility) and set ISO `date`
+    if date_iso:
+        try:
+            # if already ISO-like including time
+            if 'T' in date_iso:
+                dt = datetime.fromisoformat(date_iso.replace('Z', '+00:00'))
+                published_date = dt
+                date_iso = dt.isoformat()
+            else:
+                # date only
+                published_date = datetime.fromisoformat(date_iso).date()
+        except Exception:
+            published_date = None
+
+    return {
+        'title': title,
+        'url': url,
+        'content': content,
+        'author': author,
+        'date': date_iso,
+        'published_date': published_date,
+        'source': 'Philstar'
+    }
@@ -1,22 +1,33 @@
 import scrapy
 from urllib.parse import urljoin
-from scrapy_spiders.db import url_exists, preload_existing_urls
-from bs4 import BeautifulSoup
+from scrapy_spiders.db import filter_new_urls, preload_existing_urls
+from scrapy_spiders.pagination import PaginatedListingMixin
+from scrapy_spiders.discovery import DiscoveryMixin
+from scrapy_spiders.extract import attr, first, get_text, links
+from scrapy_spiders.metadata import page_metadata
+from scrapy_spiders.offload import extract_item
 import re
 from datetime import datetime
 
-class PNASpider(scrapy.Spider):
+class PNASpider(DiscoveryMixin, PaginatedListingMixin, scrapy.Spider):
     name = "pna"
     LISTING_URL = "https://www.pna.gov.ph/"
     DEFAULT_MAX_PAGES = 10000
+    SITEMAP_URLS = ["https://www.pna.gov.ph/sitemap.xml"]
 
-    def __init__(self, pages=2, limit=0, *args, **kwargs):
+    def __init__(self, pages=2, limit=0, incremental=False, min_new_fraction=0.0,
+                 discovery=False, discovery_since=None, sitemap_urls=None, feed_urls=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.pages = None if pages is None else int(pages)
         self.limit = int(limit)
+        self.init_pagination(incremental, min_new_fraction)
+        self.init_discovery(discovery, discovery_since, sitemap_urls, feed_urls)
         preload_existing_urls()
 
     def start_requests(self):
+        if self.use_discovery():
+            yield from self.discovery_requests()
+            return
         cap = self.pages if self.pages is not None else self.DEFAULT_MAX_PAGES
         # homepage
         yield scrapy.Request(self.LISTING_URL, callback=self.parse_listing)
@@ -40,99 +51,115 @@ class PNASpider(scrapy.Spider):
             "categories/media-security",
             "categories/foi",
         ]
-        for slug in categories:
-            for p in range(1, cap + 1):
-                if p == 1:
-                    url = urljoin(self.LISTING_URL, slug)
-                else:
-                    url = urljoin(self.LISTING_URL, f"{slug}?p={p}")
-                yield scrapy.Request(url, callback=self.parse_listing)
-
-        # latest
-        for p in range(1, cap + 1):
-            if p == 1:
-                url = urljoin(self.LISTING_URL, "latest")
-            else:
-                url = urljoin(self.LISTING_URL, f"latest?p={p}")
-            yield scrapy.Request(url, callback=self.parse_listing)
+        for slug in categories + ["latest"]:
+            yield from self.listing_requests(slug, lambda p, slug=slug: self._page_url(slug, p), cap)
+
+    def _page_url(self, slug, p):
+        if p == 1:
+            return urljoin(self.LISTING_URL, slug)
+        return urljoin(self.LISTING_URL, f"{slug}?p={p}")
+
+    def accept_discovered_url(self, url):
+        return '/news/' in url and url.startswith('https://www.pna.gov.ph/')
 
     def parse_listing(self, response):
         """Parse PNA listing page and extract article URLs"""
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find all article links in the listing
-        links = []
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if '/news/' in href and href.startswith('https://www.pna.gov.ph/'):
-                links.append(href)
-        
-        for link in links:
-            if url_exists(link):
-                continue
+        links = extract_links(response)
+
+        new_links = filter_new_urls(links)
+        for link in new_links:
             yield scrapy.Request(link, callback=self.parse_article)
 
-    def parse_article(self, response):
+        next_page = self.next_listing_page(response, links, new_links)
+        if next_page is not None:
+            yield next_page
+
+    async def parse_article(self, response):
         """Parse individual PNA article"""
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Get title
-        title_tag = soup.find('h1', class_='entry-title')
-        title = title_tag.get_text(strip=True) if title_tag else "No title"
-        
-        # Get content
-        content_div = soup.find('div', class_='entry-content')
-        content = content_div.get_text(strip=True) if content_div else "No content"
-        
-        # Get author
-        author_tag = soup.find('span', class_='author')
-        author = author_tag.get_text(strip=True) if author_tag else "Unknown"
-        
-        # Get date
-        date_tag = soup.find('time', class_='entry-date')
-        published_date = None
-        if date_tag:
-            date_str = date_tag.get('datetime', '').strip()
-            try:
-                published_date = datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
-            except ValueError:
-                pass
-        
-        # Clean author field: remove trailing dates and sharing UI text
-        if author and isinstance(author, str):
-            s = author.strip()
-            # normalize nbsp
-            s = s.replace('\u00a0', ' ')
-            # drop leading 'By '
-            if s.lower().startswith('by '):
-                s = s[3:].strip()
-
-            lower = s.lower()
-            months = [
-                'january', 'february', 'march', 'april', 'may', 'june',
-                'july', 'august', 'september', 'october', 'november', 'december'
-            ]
-            markers = ['share', 'x (formerly', 'viber', 'email'] + months
-            # find earliest marker occurrence
-            idxs = [lower.find(m) for m in markers if lower.find(m) != -1]
-            if idxs:
-                cut = min(idxs)
-                s = s[:cut].strip(' ,;-–—')
-
-            # final safety: if the remaining string still contains a 4-digit year,
-            # cut at the first digit occurrence
-            m = re.search(r"\d{4}", s)
-            if m:
-                s = s[:m.start()].strip(' ,;')
-
-            author = s or "Unknown"
-        
-        yield {
-            'title': title,
-            'url': response.url,
-            'content': content,
-            'author': author,
-            'date': published_date,
-            'published_date': published_date,
-            'source': 'PNA'
-        }
+        # inline, or in the extraction process pool when enabled
+        yield await extract_item(self, extract_article, response)
+
+
+# Article links in a listing page
+LISTING_LINKS_XPATH = "//a[starts-with(@href, 'https://www.pna.gov.ph/') and contains(@href, '/news/')]/@href"
+
+
+def extract_links(sel):
+    return links(sel, LISTING_LINKS_XPATH)
+
+
+def extract_article(sel, url, meta=None):
+    """Build the PNA item dict from a response or selector (and its PageMetadata)."""
+    if meta is None:
+        meta = page_metadata(sel)
+
+    # Get title
+    title_tag = first(sel, 'h1.entry-title')
+    title = get_text(title_tag) if title_tag else "No title"
+
+    # Get content
+    content_div = first(sel, 'div.entry-content')
+    content = get_text(content_div) if content_div else "No content"
+
+    # Get author
+    author_tag = first(sel, 'span.author')
+    author = get_text(author_tag) if author_tag else "Unknown"
+
+    # Get date
+    date_tag = first(sel, 'time.entry-date')
+    published_date = None
+    if date_tag:
+        date_str = attr(date_tag, 'datetime', '').strip()
+        try:
+            published_date = datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
+        except ValueError:
+            pass
+
+    # fall back to structured data (JSON-LD / OpenGraph) where the page markup had nothing
+    if title == "No title" and meta.headline:
+        title = meta.headline
+    if content == "No content" and meta.article_body:
+        content = meta.article_body
+    if author == "Unknown" and meta.author:
+        author = meta.author
+    if published_date is None:
+        published_date = meta.published_on()
+
+    # Clean author field: remove trailing dates and sharing UI text
+    if author and isinstance(author, str):
+        s = author.strip()
+        # normalize nbsp
+        s = s.replace('\u00a0', ' ')
+        # drop leading 'By '
+        if s.lower().startswith('by '):
+            s = s[3:].strip()
+
+        lower = s.lower()
+        months = [
+            'january', 'february', 'march', 'april', 'may', 'june',
+            'july', 'august', 'september', 'october', 'november', 'december'
+        ]
+        markers = ['share', 'x (formerly', 'viber', 'email'] + months
+        # find earliest marker occurrence
+        idxs = [lower.find(m) for m in markers if lower.find(m) != -1]
+        if idxs:
+            cut = min(idxs)
+            s = s[:cut].strip(' ,;-–—')
+
+        # final safety: if the remaining string still contains a 4-digit year,
+        # cut at the first digit occurrence
+        m = re.search(r"\d{4}", s)
+        if m:
+            s = s[:m.start()].strip(' ,;')
+
+        author = s or "Unknown"
+
+    return {
+        'title': title,
+        'url': url,
+        'content': content,
+        'author': author,
+        'date': published_date,
+        'published_date': published_date,
+        'source': 'PNA'
+    }
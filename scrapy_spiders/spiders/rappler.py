@@ -1,90 +1,125 @@
 import scrapy
 from urllib.parse import urljoin
-from scrapy_spiders.db import url_exists, preload_existing_urls
-from bs4 import BeautifulSoup
+from scrapy_spiders.db import filter_new_urls, preload_existing_urls
+from scrapy_spiders.pagination import PaginatedListingMixin
+from scrapy_spiders.discovery import DiscoveryMixin
+from scrapy_spiders.extract import attr, first, get_text, links
+from scrapy_spiders.metadata import page_metadata
+from scrapy_spiders.offload import extract_item
 from datetime import datetime
 
-class RapplerSpider(scrapy.Spider):
+class RapplerSpider(DiscoveryMixin, PaginatedListingMixin, scrapy.Spider):
     name = "rappler"
     LISTING_URL = "https://rappler.com/"
     DEFAULT_MAX_PAGES = 10000
+    SITEMAP_URLS = ["https://www.rappler.com/sitemap_news.xml"]
+    FEED_URLS = ["https://www.rappler.com/feed/"]
 
-    def __init__(self, pages=2, limit=0, *args, **kwargs):
+    def __init__(self, pages=2, limit=0, incremental=False, min_new_fraction=0.0,
+                 discovery=False, discovery_since=None, sitemap_urls=None, feed_urls=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.pages = None if pages is None else int(pages)
         self.limit = int(limit)
+        self.init_pagination(incremental, min_new_fraction)
+        self.init_discovery(discovery, discovery_since, sitemap_urls, feed_urls)
         preload_existing_urls()
 
     def start_requests(self):
+        if self.use_discovery():
+            yield from self.discovery_requests()
+            return
         cap = self.pages if self.pages is not None else self.DEFAULT_MAX_PAGES
         # homepage/root
-        for p in range(1, cap + 1):
-            if p == 1:
-                url = self.LISTING_URL
-            else:
-                url = urljoin(self.LISTING_URL, f"page/{p}/")
-            yield scrapy.Request(url, callback=self.parse_listing)
-
+        yield from self.listing_requests("home", self._home_page_url, cap)
         # latest section
-        for p in range(1, cap + 1):
-            if p == 1:
-                url = urljoin(self.LISTING_URL, "latest")
-            else:
-                url = urljoin(self.LISTING_URL, f"latest/page/{p}/")
-            yield scrapy.Request(url, callback=self.parse_listing)
+        yield from self.listing_requests("latest", self._latest_page_url, cap)
+
+    def _home_page_url(self, p):
+        if p == 1:
+            return self.LISTING_URL
+        return urljoin(self.LISTING_URL, f"page/{p}/")
+
+    def _latest_page_url(self, p):
+        if p == 1:
+            return urljoin(self.LISTING_URL, "latest")
+        return urljoin(self.LISTING_URL, f"latest/page/{p}/")
+
+    def accept_discovered_url(self, url):
+        return url.startswith('https://www.rappler.com/')
 
     def parse_listing(self, response):
         """Parse Rappler listing page and extract article URLs"""
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find all article links
-        links = []
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if href.startswith('https://www.rappler.com/') and '/20' in href:
-                links.append(href)
-        
-        for link in links:
-            if url_exists(link):
-                continue
+        links = extract_links(response)
+
+        new_links = filter_new_urls(links)
+        for link in new_links:
             yield scrapy.Request(link, callback=self.parse_article)
 
-    def parse_article(self, response):
+        next_page = self.next_listing_page(response, links, new_links)
+        if next_page is not None:
+            yield next_page
+
+    async def parse_article(self, response):
         """Parse individual Rappler article"""
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Get title
-        title_tag = soup.find('h1', class_='post-single__header-title') or soup.find('h1')
-        title = title_tag.get_text(strip=True) if title_tag else "No title"
-        
-        # Get content
-        content_div = soup.find('div', class_='post-content') or soup.find('div', class_='content')
-        content = content_div.get_text(strip=True) if content_div else "No content"
-        
-        # Get author
-        author_tag = soup.find('span', class_='post-single__header-reporter') or soup.find('span', class_='author')
-        author = author_tag.get_text(strip=True) if author_tag else "Unknown"
-        
-        # Get date
-        date_tag = soup.find('time') or soup.find('span', class_='post-single__header-datetime')
-        published_date = None
-        if date_tag:
-            date_str = date_tag.get('datetime') or date_tag.get_text(strip=True)
-            try:
-                if 'T' in date_str:
-                    published_date = datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
-                else:
-                    # Try parsing as date string
-                    published_date = datetime.strptime(date_str, '%B %d, %Y').date()
-            except (ValueError, AttributeError):
-                pass
-        
-        yield {
-            'title': title,
-            'url': response.url,
-            'content': content,
-            'author': author,
-            'date': published_date,
-            'published_date': published_date,
-            'source': 'Rappler'
-        }
+        # inline, or in the extraction process pool when enabled
+        yield await extract_item(self, extract_article, response)
+
+
+# Article links in a listing page
+LISTING_LINKS_XPATH = "//a[starts-with(@href, 'https://www.rappler.com/') and contains(@href, '/20')]/@href"
+
+
+def extract_links(sel):
+    return links(sel, LISTING_LINKS_XPATH)
+
+
+def extract_article(sel, url, meta=None):
+    """Build the Rappler item dict from a response or selector (and its PageMetadata)."""
+    if meta is None:
+        meta = page_metadata(sel)
+
+    # Get title
+    title_tag = first(sel, 'h1.post-single__header-title', 'h1')
+    title = get_text(title_tag) if title_tag else "No title"
+
+    # Get content
+    content_div = first(sel, 'div.post-content', 'div.content')
+    content = get_text(content_div) if content_div else "No content"
+
+    # Get author
+    author_tag = first(sel, 'span.post-single__header-reporter', 'span.author')
+    author = get_text(author_tag) if author_tag else "Unknown"
+
+    # Get date
+    date_tag = first(sel, 'time', 'span.post-single__header-datetime')
+    published_date = None
+    if date_tag:
+        date_str = attr(date_tag, 'datetime') or get_text(date_tag)
+        try:
+            if 'T' in date_str:
+                published_date = datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
+            else:
+                # Try parsing as date string
+                published_date = datetime.strptime(date_str, '%B %d, %Y').date()
+        except (ValueError, AttributeError):
+            pass
+
+    # fall back to structured data (JSON-LD / OpenGraph) where the page markup had nothing
+    if title == "No title" and meta.headline:
+        title = meta.headline
+    if content == "No content" and meta.article_body:
+        content = meta.article_body
+    if author == "Unknown" and meta.author:
+        author = meta.author
+    if published_date is None:
+        published_date = meta.published_on()
+
+    return {
+        'title': title,
+        'url': url,
+        'content': content,
+        'author': author,
+        'date': published_date,
+        'published_date': published_date,
+        'source': 'Rappler'
+    }
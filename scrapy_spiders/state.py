@@ -0,0 +1,22 @@
+"""Location of on-disk crawl state (seen-URL index, caches, ...).
+
+Files live under ``instance/scrapy/`` in the project directory, next to the
+Flask app's default SQLite database. Set ``SCRAPY_STATE_DIR`` to put them
+somewhere else.
+"""
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def state_dir() -> str:
+    path = os.environ.get("SCRAPY_STATE_DIR") or os.path.join(PROJECT_ROOT, "instance", "scrapy")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def state_path(*parts: str) -> str:
+    """Return a path inside the state directory, creating parent folders."""
+    path = os.path.join(state_dir(), *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
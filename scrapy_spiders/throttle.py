@@ -0,0 +1,231 @@
+"""Adaptive per-domain concurrency and delay.
+
+The runner used to apply one ``CONCURRENT_REQUESTS`` / ``DOWNLOAD_DELAY``
+pair to every site, whether it was a static government server or a JS
+site rendered in Chromium. ``ThrottleMiddleware`` (a downloader middleware
+the runner enables) adjusts Scrapy's download slot of each domain instead:
+
+- It watches every response and download error of a slot: the latency, 5xx
+  responses and errors, and ``429`` / ``503`` answers. Playwright renders
+  are measured against their own latency target, because a render normally
+  takes many times longer than a plain fetch.
+- Every ``THROTTLE_WINDOW`` responses it makes one decision for the slot.
+  - ``429`` / ``503``: halve the concurrency and double the delay, honouring
+    ``Retry-After``.
+  - Error rate above 10%: one fewer concurrent request and a longer delay.
+  - Latency above target: likewise, more gently.
+  - Latency under half the target: one more concurrent request and half
+    the delay.
+  - Otherwise: keep the current values.
+- Each site stays within its floors and ceilings (``min_concurrency`` /
+  ``max_concurrency``, ``min_delay`` / ``max_delay``, and both latency
+  targets). These come from ``THROTTLE_DEFAULTS`` and, per domain (a suffix
+  match, so ``pna.gov.ph`` covers ``www.pna.gov.ph``), ``THROTTLE_SITES``.
+
+Every change is logged (``Throttle www.pna.gov.ph: concurrency 8 -> 4, ...``)
+and counted under ``throttle/*``. The final values per slot are in the stats
+as ``throttle/final/<slot>``. ``CONCURRENT_REQUESTS`` stays the global cap, and
+``DOWNLOAD_DELAY`` is only the starting delay. ``THROTTLE_ENABLED = False``
+keeps the fixed values.
+"""
+import logging
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {
+    "min_concurrency": 1,
+    "max_concurrency": 8,
+    "min_delay": 0.0,
+    "max_delay": 10.0,
+    # seconds per plain HTTP response / per Playwright render
+    "target_latency": 2.0,
+    "target_render_latency": 15.0,
+}
+# floors/ceilings of the sites the spiders crawl (THROTTLE_SITES)
+DEFAULT_SITES = {
+    # small government server: keep it gentle
+    "pna.gov.ph": {"max_concurrency": 4, "min_delay": 0.25},
+    "rappler.com": {"max_concurrency": 8},
+    # rendered in Chromium, where the context pool is the real limit
+    "philstar.com": {"max_concurrency": 4},
+    "mb.com.ph": {"max_concurrency": 4},
+}
+DEFAULT_WINDOW = 20
+# share of failed responses in a window that counts as "erroring"
+ERROR_RATE = 0.1
+# smallest non-zero delay used when backing off from no delay at all
+MIN_BACKOFF_DELAY = 0.25
+THROTTLED_STATUSES = (429, 503)
+
+
+def _host(url):
+    try:
+        return (urlparse(url).hostname or "").lower()
+    except Exception:
+        return ""
+
+
+def site_limits(host, defaults=None, sites=None):
+    """The limits for ``host``: ``defaults`` overlaid with the longest matching ``sites`` entry."""
+    limits = dict(DEFAULT_LIMITS)
+    limits.update(defaults or {})
+    best = None
+    for domain in sites or {}:
+        d = domain.lower().lstrip(".")
+        if (host == d or host.endswith("." + d)) and (best is None or len(d) > len(best)):
+            best = domain
+    if best is not None:
+        limits.update(sites[best])
+    return limits
+
+
+def _retry_after(response):
+    value = response.headers.get(b"Retry-After")
+    try:
+        return float(value.decode("latin-1")) if value else None
+    except ValueError:
+        # HTTP-date form; the doubled delay has to do
+        return None
+
+
+class _Window:
+    def __init__(self):
+        self.responses = 0
+        self.errors = 0
+        self.throttled = 0
+        self.latency_ratio = 0.0
+        self.timed = 0
+        self.retry_after = None
+
+
+class ThrottleMiddleware:
+    """Per-slot AIMD controller for concurrency and delay (see module docstring)."""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        settings = crawler.settings
+        self.defaults = settings.getdict("THROTTLE_DEFAULTS")
+        self.sites = settings.getdict("THROTTLE_SITES")
+        self.window_size = max(1, settings.getint("THROTTLE_WINDOW", DEFAULT_WINDOW))
+        self.windows = {}
+        self.limits = {}
+        # slot key -> (slot, concurrency, delay) last set, to restore them
+        # when the downloader drops an idle slot and creates a fresh one
+        self.current = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("THROTTLE_ENABLED", True):
+            raise NotConfigured
+        mw = cls(crawler)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def _slot(self, request):
+        key = request.meta.get("download_slot")
+        downloader = getattr(self.crawler.engine, "downloader", None)
+        if key is None or downloader is None:
+            return None, None
+        return key, downloader.slots.get(key)
+
+    def _limits(self, key, slot, request):
+        limits = self.limits.get(key)
+        if limits is None:
+            limits = self.limits[key] = site_limits(_host(request.url) or key, self.defaults, self.sites)
+            # a new slot starts from the global settings; bring it inside this site's range
+            self._apply(key, slot, limits, slot.concurrency, slot.delay, "site limits")
+        elif self.current.get(key, (slot,))[0] is not slot:
+            _, conc, delay = self.current[key]
+            slot.concurrency, slot.delay = conc, delay
+            self.current[key] = (slot, conc, delay)
+        return limits
+
+    def process_response(self, request, response, spider=None):
+        key, slot = self._slot(request)
+        if slot is None:
+            return response
+        limits = self._limits(key, slot, request)
+        w = self.windows.setdefault(key, _Window())
+        w.responses += 1
+        if response.status in THROTTLED_STATUSES:
+            w.throttled += 1
+            retry_after = _retry_after(response)
+            if retry_after is not None:
+                w.retry_after = max(w.retry_after or 0, retry_after)
+        elif response.status >= 500:
+            w.errors += 1
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            render = bool(request.meta.get("playwright"))
+            target = limits["target_render_latency" if render else "target_latency"]
+            w.latency_ratio += latency / target if target else 0.0
+            w.timed += 1
+        if w.responses >= self.window_size:
+            self._decide(key, slot, limits, w)
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        key, slot = self._slot(request)
+        if slot is None:
+            return None
+        limits = self._limits(key, slot, request)
+        w = self.windows.setdefault(key, _Window())
+        w.responses += 1
+        w.errors += 1
+        if w.responses >= self.window_size:
+            self._decide(key, slot, limits, w)
+        return None
+
+    def _decide(self, key, slot, limits, w):
+        self.windows[key] = _Window()
+        conc, delay = slot.concurrency, slot.delay
+        ratio = w.latency_ratio / w.timed if w.timed else None
+        if w.throttled:
+            conc = conc // 2
+            delay = max(delay * 2, w.retry_after or 0, MIN_BACKOFF_DELAY)
+            reason = f"{w.throttled}/{w.responses} throttled"
+            self.stats.inc_value("throttle/backoffs")
+        elif w.errors > ERROR_RATE * w.responses:
+            conc -= 1
+            delay = max(delay * 1.5, MIN_BACKOFF_DELAY)
+            reason = f"{w.errors}/{w.responses} errors"
+            self.stats.inc_value("throttle/backoffs")
+        elif ratio is not None and ratio > 1.0:
+            conc -= 1
+            delay = max(delay * 1.25, MIN_BACKOFF_DELAY)
+            reason = f"latency {ratio:.1f}x target"
+            self.stats.inc_value("throttle/slowdowns")
+        elif ratio is not None and ratio < 0.5:
+            conc += 1
+            delay = delay / 2
+            reason = f"latency {ratio:.1f}x target"
+            self.stats.inc_value("throttle/speedups")
+        else:
+            return
+        self._apply(key, slot, limits, conc, delay, reason)
+
+    def _apply(self, key, slot, limits, conc, delay, reason):
+        conc = int(min(max(conc, limits["min_concurrency"]), limits["max_concurrency"]))
+        if delay < 0.05:
+            # halving alone never gets to zero
+            delay = 0.0
+        delay = min(max(delay, limits["min_delay"]), limits["max_delay"])
+        self.current[key] = (slot, conc, delay)
+        if conc == slot.concurrency and abs(delay - slot.delay) < 0.005:
+            return
+        logger.info("Throttle %s: concurrency %d -> %d, delay %.2fs -> %.2fs (%s)",
+                    key, slot.concurrency, conc, slot.delay, delay, reason)
+        slot.concurrency, slot.delay = conc, delay
+        self.stats.inc_value("throttle/decisions")
+
+    def spider_closed(self, spider):
+        downloader = getattr(self.crawler.engine, "downloader", None)
+        for key in self.limits:
+            slot = downloader.slots.get(key) if downloader is not None else None
+            if slot is not None:
+                self.stats.set_value(f"throttle/final/{key}", f"concurrency={slot.concurrency} delay={slot.delay:.2f}")
@@ -0,0 +1,79 @@
+"""Canonical form of article URLs, shared by spiders, pipeline and scripts.
+
+``normalize_url`` lower-cases scheme and host, drops fragments, path
+parameters, tracking query parameters (``utm_*``, ``fbclid``, ``gclid``) and
+a trailing slash. Listing pages repeat the same links hundreds of times, so
+results are memoized in a bounded LRU cache (``URL_NORMALIZE_CACHE_SIZE``
+entries, see ``configure_cache``) and URLs without a query string skip the
+query parsing entirely.
+"""
+from functools import lru_cache
+from urllib.parse import urlparse, urlsplit, urlunparse, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_CACHE_SIZE = 65536
+
+_TRACKING_PARAMS = ("fbclid", "gclid")
+
+
+def _normalize(u: str) -> str:
+    if "?" not in u and ";" not in u:
+        # fast path: nothing to filter, and without ';' urlparse and urlsplit
+        # agree, so the result is identical to the full path below
+        try:
+            p = urlsplit(u)
+        except Exception:
+            return u
+        path = p.path or ""
+        if path.endswith("/") and path != "/":
+            path = path.rstrip("/")
+        return urlunsplit(((p.scheme or "http").lower(), (p.netloc or "").lower(), path, "", ""))
+
+    try:
+        p = urlparse(u)
+    except Exception:
+        return u
+    scheme = (p.scheme or "http").lower()
+    netloc = (p.netloc or "").lower()
+    qs = parse_qsl(p.query, keep_blank_values=True)
+    filtered = [(k, v) for (k, v) in qs if not (k.startswith("utm_") or k in _TRACKING_PARAMS)]
+    query = urlencode(filtered)
+    path = p.path or ""
+    if path.endswith("/") and path != "/":
+        path = path.rstrip("/")
+    return urlunparse((scheme, netloc, path, "", query, ""))
+
+
+_cached_normalize = lru_cache(maxsize=DEFAULT_CACHE_SIZE)(_normalize)
+
+
+def normalize_url(u: str) -> str:
+    """Return the canonical form of ``u`` (empty values are returned as-is)."""
+    if not u:
+        return u
+    return _cached_normalize(u)
+
+
+def configure_cache(maxsize=DEFAULT_CACHE_SIZE):
+    """Replace the memo cache with one holding ``maxsize`` entries (0 disables it)."""
+    global _cached_normalize
+    _cached_normalize = lru_cache(maxsize=max(0, int(maxsize)))(_normalize)
+
+
+def cache_stats() -> dict:
+    info = _cached_normalize.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+    }
+
+
+def record_cache_stats(stats):
+    """Copy the memo cache counters into a Scrapy stats collector."""
+    if stats is None:
+        return
+    for key, value in cache_stats().items():
+        stats.set_value(f"url_normalize/{key}", value)
@@ -0,0 +1,140 @@
+"""Event-driven Playwright page helpers, used as ``PageMethod`` callables.
+
+The spiders used to wait with fixed sleeps (scroll, sleep, look, sleep...)
+and to try candidate selectors one after another with a full timeout each,
+so a page whose markup matched none of them could sit in the browser for
+40+ seconds. These helpers wait on the page itself instead:
+
+- ``wait_for_any_selector(page, selectors)`` waits for the first of several
+  CSS selectors to appear. All selectors are raced in a single wait (one CSS
+  selector list), so a missing selector costs nothing extra.
+- ``scroll_until_stable(page, selector, max_scrolls)`` counts the nodes
+  matching ``selector``, scrolls to the bottom and waits until more nodes
+  appear. When no new node shows up within ``settle_ms`` the page is
+  considered fully loaded and scrolling stops early.
+
+Both share a total time budget per call (``BROWSER_WAIT_BUDGET_MS``, set with
+``configure_waits``; an explicit ``budget_ms`` argument wins). They never
+raise for a missing selector. They return a dict such as
+``{"waited_ms": 812, "matched": ".post-content", "timed_out": False}``,
+which scrapy-playwright keeps as the ``PageMethod`` result. The time spent is
+also added to the ``browser/wait*`` counters (see ``scrapy_spiders.browser``),
+and ``BrowserPoolMiddleware`` logs it per page.
+
+Use them as plain module-level callables (``PageMethod(wait_for_any_selector,
+[...])``) rather than bound spider methods so requests stay picklable.
+"""
+import time
+
+from scrapy_spiders.browser import record_wait
+
+try:
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+except Exception:  # Playwright not installed; the helpers are never called then
+    class PlaywrightTimeoutError(Exception):
+        pass
+
+# total time one helper call may spend waiting on a page
+DEFAULT_WAIT_BUDGET_MS = 10000
+# a scroll that adds no new node within this long means the list is complete
+DEFAULT_SETTLE_MS = 1500
+
+_CONFIG = {
+    "budget_ms": DEFAULT_WAIT_BUDGET_MS,
+    "settle_ms": DEFAULT_SETTLE_MS,
+}
+
+_COUNT_JS = "sel => document.querySelectorAll(sel).length"
+_MORE_JS = "([sel, n]) => document.querySelectorAll(sel).length > n"
+_MATCHED_JS = "sels => sels.find(s => document.querySelector(s) !== null) || null"
+_SCROLL_JS = "window.scrollTo(0, document.body.scrollHeight)"
+
+
+def configure_waits(budget_ms=None, settle_ms=None):
+    """Set the default per-call budget / scroll settle time (None keeps the current value)."""
+    if budget_ms:
+        _CONFIG["budget_ms"] = max(0, int(budget_ms))
+    if settle_ms:
+        _CONFIG["settle_ms"] = max(1, int(settle_ms))
+
+
+class _Clock:
+    def __init__(self, budget_ms):
+        self.start = time.monotonic()
+        self.budget_ms = _CONFIG["budget_ms"] if budget_ms is None else int(budget_ms)
+
+    def elapsed_ms(self):
+        return int((time.monotonic() - self.start) * 1000)
+
+    def remaining_ms(self):
+        return self.budget_ms - self.elapsed_ms()
+
+
+async def _wait_any(page, selectors, clock, result):
+    # timeout=0 would mean "no timeout" to Playwright, so check the budget first
+    if clock.remaining_ms() <= 0:
+        result["timed_out"] = True
+        return
+    try:
+        await page.wait_for_selector(", ".join(selectors), state="attached", timeout=clock.remaining_ms())
+        result["matched"] = await page.evaluate(_MATCHED_JS, list(selectors))
+    except PlaywrightTimeoutError:
+        result["timed_out"] = True
+
+
+async def wait_for_any_selector(page, selectors, budget_ms=None):
+    """Wait until any of ``selectors`` (CSS) is attached to the page, within the budget."""
+    if isinstance(selectors, str):
+        selectors = [selectors]
+    clock = _Clock(budget_ms)
+    result = {"matched": None, "timed_out": False}
+    try:
+        await _wait_any(page, selectors, clock, result)
+    except Exception as exc:
+        # page closed, bad selector, ...: parse whatever was rendered
+        result["error"] = str(exc)
+    result["waited_ms"] = clock.elapsed_ms()
+    record_wait("selector", result["waited_ms"], result["timed_out"])
+    return result
+
+
+async def scroll_until_stable(page, selector, max_scrolls=2, budget_ms=None, settle_ms=None):
+    """Scroll an infinite-scroll page until ``selector`` stops gaining nodes.
+
+    Stops after ``max_scrolls`` scrolls, when a scroll adds no node within
+    ``settle_ms``, or when the budget runs out, whichever comes first.
+    """
+    clock = _Clock(budget_ms)
+    settle_ms = _CONFIG["settle_ms"] if settle_ms is None else int(settle_ms)
+    max_scrolls = max(0, int(max_scrolls or 0))
+    result = {"scrolls": 0, "nodes": 0, "stopped": "max_scrolls", "timed_out": False, "matched": None}
+    try:
+        count = await page.evaluate(_COUNT_JS, selector)
+        if not count:
+            # nothing rendered yet: wait for the first node before scrolling
+            await _wait_any(page, [selector], clock, result)
+            if result["timed_out"]:
+                result["stopped"] = "budget"
+                max_scrolls = 0
+            count = await page.evaluate(_COUNT_JS, selector)
+        while result["scrolls"] < max_scrolls:
+            remaining = clock.remaining_ms()
+            if remaining <= 0:
+                result.update(stopped="budget", timed_out=True)
+                break
+            await page.evaluate(_SCROLL_JS)
+            result["scrolls"] += 1
+            try:
+                await page.wait_for_function(_MORE_JS, arg=[selector, count],
+                                             timeout=min(settle_ms, remaining))
+            except PlaywrightTimeoutError:
+                result["stopped"] = "stable" if settle_ms <= remaining else "budget"
+                result["timed_out"] = result["stopped"] == "budget"
+                break
+            count = await page.evaluate(_COUNT_JS, selector)
+        result["nodes"] = count
+    except Exception as exc:
+        result.update(stopped="error", error=str(exc))
+    result["waited_ms"] = clock.elapsed_ms()
+    record_wait("scroll", result["waited_ms"], result["timed_out"], scrolls=result["scrolls"])
+    return result
@@ -0,0 +1,104 @@
+"""Background database writer used by SQLAlchemyPipeline.
+
+SQLAlchemy calls are blocking, so running them inside Twisted's reactor
+stalls every download (and Playwright page) in the crawl while a commit is in
+progress. ArticleWriter moves that work to a dedicated thread: the pipeline
+puts rows on a bounded queue and the thread groups them into batches, writes
+each batch and reports back to the reactor with ``reactor.callFromThread``.
+"""
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class ArticleWriter(threading.Thread):
+    """Consume queued entries on a worker thread and write them in batches.
+
+    ``write_batch(rows)`` is called inside an app context with the list of
+    rows of one batch and must return ``(inserted, failed)``: the number of
+    new Articles and the positions in ``rows`` that could not be written.
+    ``on_flushed(entries, inserted, failed, latency_ms)`` and ``on_space()`` are
+    called on the reactor thread after each batch; the latter tells the
+    pipeline that the queue has room again.
+    """
+
+    def __init__(self, app, write_batch, on_flushed, on_space, buffer_size=100, flush_interval=5.0, queue_size=1000):
+        super().__init__(name="ArticleWriter", daemon=True)
+        self.app = app
+        self.write_batch = write_batch
+        self.on_flushed = on_flushed
+        self.on_space = on_space
+        self.buffer_size = max(1, int(buffer_size))
+        self.flush_interval = float(flush_interval)
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+
+    def submit(self, entry):
+        """Queue ``(row, item, deferred)`` without blocking; False if full."""
+        try:
+            self.queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            return False
+
+    def close(self, pending=()):
+        """Queue ``pending`` entries, flush everything and wait for the thread.
+
+        Blocks, so call it from a thread (``deferToThread``), not the reactor.
+        """
+        for entry in pending:
+            self.queue.put(entry)
+        self.queue.put(_STOP)
+        self.join()
+
+    def run(self):
+        from twisted.internet import reactor
+
+        with self.app.app_context():
+            batch = []
+            last_flush = time.monotonic()
+            while True:
+                # block while idle; with a partial batch wait at most until
+                # the flush interval is up (no interval: flush once idle)
+                timeout = None
+                if batch:
+                    timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+                try:
+                    entry = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    entry = None
+
+                if entry is _STOP:
+                    self._flush(batch)
+                    return
+                if entry is not None:
+                    batch.append(entry)
+                    if self.queue.empty():
+                        # let the pipeline refill the queue from its backlog
+                        # while this batch is still being collected
+                        reactor.callFromThread(self.on_space)
+
+                due = time.monotonic() - last_flush >= self.flush_interval
+                if len(batch) >= self.buffer_size or (batch and due):
+                    self._flush(batch)
+                    batch = []
+                    last_flush = time.monotonic()
+
+    def _flush(self, entries):
+        from twisted.internet import reactor
+
+        if not entries:
+            return
+        started = time.monotonic()
+        try:
+            inserted, failed = self.write_batch([row for row, _item, _d in entries])
+        except Exception as exc:
+            logger.error("Article writer failed to write %d rows: %s", len(entries), exc)
+            inserted, failed = 0, range(len(entries))
+        latency_ms = (time.monotonic() - started) * 1000.0
+        reactor.callFromThread(self.on_flushed, entries, inserted, failed, latency_ms)
+        reactor.callFromThread(self.on_space)
@@ -1,5 +1,6 @@
 SHOW TABLES;
 
+-- for a full dump use scripts/export_articles.py (streams NDJSON/CSV instead of loading every row)
 SELECT * FROM article;
 SELECT * FROM scrape_job;	
 
@@ -0,0 +1,86 @@
+"""Backfill content fingerprints and near-duplicate links for stored articles.
+
+Articles stored before ``app.dedupe`` existed have no ``simhash`` and are
+never linked as duplicates. This walks the article table in id order,
+fingerprints each body and links every near duplicate to the oldest copy
+(the same rule the pipeline applies to new articles).
+
+Usage:
+    python scripts/backfill_fingerprints.py [--batch 500] [--relink] [--dry-run]
+
+``--relink`` recomputes every row, not only rows without a fingerprint, and
+resets links that no longer hold. The script can be stopped and started
+again; each batch is committed on its own.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select, update
+
+from app import create_app
+from app.db import db
+from app.dedupe import NearDuplicateIndex, fingerprint_row, load_candidates
+from app.models import Article
+from app.schema import ensure_schema
+
+
+def backfill(batch_size=500, relink=False, dry_run=False):
+    app = create_app()
+    with app.app_context():
+        ensure_schema()
+        last_id = 0
+        done = linked = 0
+        started = time.monotonic()
+        while True:
+            stmt = select(Article.id, Article.content).where(Article.id > last_id)
+            if not relink:
+                stmt = stmt.where(Article.simhash.is_(None))
+            rows = db.session.execute(stmt.order_by(Article.id).limit(batch_size)).all()
+            if not rows:
+                break
+            updates = []
+            for article_id, content in rows:
+                row = {"id": article_id, "content": content}
+                fingerprint_row(row)
+                del row["content"]
+                updates.append(row)
+            # older rows (already fingerprinted) plus the rows of this batch before each one
+            stored = load_candidates(db.session, [u["simhash"] for u in updates], before_id=rows[0][0])
+            batch = NearDuplicateIndex()
+            for u in updates:
+                u["duplicate_of"] = None
+                if u["simhash"] is None:
+                    continue
+                canonical = stored.find(u["simhash"])
+                if canonical is None:
+                    canonical = batch.find(u["simhash"])
+                if canonical is not None:
+                    u["duplicate_of"] = canonical
+                    linked += 1
+                else:
+                    batch.add(u["simhash"], u["id"])
+            if not dry_run:
+                db.session.execute(update(Article), updates)
+                db.session.commit()
+            done += len(updates)
+            last_id = rows[-1][0]
+            print(f"{done} articles fingerprinted, {linked} near duplicates linked (up to id {last_id})")
+        print(f"Finished in {time.monotonic() - started:.1f}s: {done} articles, {linked} near duplicates"
+              + (" (dry run, nothing written)" if dry_run else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--relink", action="store_true", help="recompute every row, not only new ones")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    backfill(args.batch, args.relink, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
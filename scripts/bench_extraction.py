@@ -0,0 +1,89 @@
+"""Benchmark HTML extraction over saved pages.
+
+Compares the old approach (a ``BeautifulSoup(html, 'html.parser')`` tree
+plus a walk over every ``<a href>``) with the lxml/parsel extraction the
+spiders use now (``LISTING_LINKS_XPATH`` + ``extract_article``). The
+BeautifulSoup side only builds the tree and collects links, so it
+understates the old per-page cost; the speedup shown is a lower bound.
+
+Save pages with your browser or ``scripts/debug_playwright_fetch.py`` and
+name them after the spider (``pna_article1.html``, ``philstar_home.html``)
+or pass ``--spider``.
+
+Usage:
+    python scripts/bench_extraction.py fixtures/*.html [--spider pna] [--repeat 20]
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bs4 import BeautifulSoup
+
+from scrapy_spiders.extract import selector
+
+SPIDERS = ("pna", "rappler", "philstar", "manilabulletin")
+
+
+def spider_for(path, default=None):
+    if default:
+        return default
+    base = os.path.basename(path).lower()
+    for name in SPIDERS:
+        if base.startswith(name):
+            return name
+    return None
+
+
+def bench_bs4(html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        soup = BeautifulSoup(html, 'html.parser')
+        [a['href'] for a in soup.find_all('a', href=True)]
+    return time.perf_counter() - start
+
+
+def bench_parsel(html, module, url, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        sel = selector(html)
+        module.extract_links(sel)
+        module.extract_article(sel, url)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='+', help='saved HTML pages')
+    parser.add_argument('--spider', choices=SPIDERS, default=None, help='spider whose extractors to use')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    total_old = total_new = 0.0
+    pages = 0
+    for path in args.files:
+        name = spider_for(path, args.spider)
+        if not name:
+            print(f"skipping {path}: cannot tell which spider it belongs to (use --spider)")
+            continue
+        module = importlib.import_module(f"scrapy_spiders.spiders.{name}")
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        old = bench_bs4(html, args.repeat)
+        new = bench_parsel(html, module, 'file://' + os.path.abspath(path), args.repeat)
+        total_old += old
+        total_new += new
+        pages += 1
+        print(f"{os.path.basename(path):40s} {name:15s} bs4 {old / args.repeat * 1000:8.2f} ms"
+              f"  parsel {new / args.repeat * 1000:8.2f} ms  x{old / new if new else 0:.1f}")
+
+    if pages:
+        print(f"\n{pages} pages, {args.repeat} runs each: bs4 {total_old:.2f}s, parsel {total_new:.2f}s,"
+              f" speedup x{total_old / total_new if total_new else 0:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -14,8 +14,9 @@ import re
 
 TEMPLATE = '''import scrapy
 from urllib.parse import urljoin
-from scrapy_spiders.db import url_exists, preload_existing_urls
-from bs4 import BeautifulSoup
+from scrapy_spiders.db import filter_new_urls, preload_existing_urls
+from scrapy_spiders.extract import first, get_text, links
+from scrapy_spiders.offload import extract_item
 from datetime import datetime
 
 class {class_name}(scrapy.Spider):
@@ -38,31 +39,39 @@ class {class_name}(scrapy.Spider):
             yield scrapy.Request(url, callback=self.parse_listing)
 
     def parse_listing(self, response):
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if not href.startswith('http'):
-                href = urljoin(self.LISTING_URL, href)
-            if url_exists(href):
-                continue
+        links = [urljoin(self.LISTING_URL, href) for href in extract_links(response)]
+        for href in filter_new_urls(links):
             yield scrapy.Request(href, callback=self.parse_article)
 
-    def parse_article(self, response):
-        soup = BeautifulSoup(response.text, 'html.parser')
-        title = (soup.find('h1') or soup.find('title')).get_text(strip=True) if soup else 'No title'
-        content = (soup.find('div', class_='article-body') or soup).get_text(strip=True) if soup else ''
-        author = None
-        published_date = None
-        # TODO: customize selectors and normalization for this site
-        yield {{
-            'title': title,
-            'url': response.url,
-            'content': content,
-            'author': author,
-            'date': published_date,
-            'published_date': published_date,
-            'source': '{source}'
-        }}
+    async def parse_article(self, response):
+        # inline, or in the extraction process pool when enabled
+        yield await extract_item(self, extract_article, response)
+
+
+# Article links in a listing page (one XPath; adjust the predicate for this site)
+LISTING_LINKS_XPATH = "//a[@href]/@href"
+
+
+def extract_links(sel):
+    return links(sel, LISTING_LINKS_XPATH)
+
+
+def extract_article(sel, url):
+    title_tag = first(sel, 'h1', 'title')
+    title = get_text(title_tag) if title_tag else 'No title'
+    content = get_text(first(sel, 'div.article-body', 'body'))
+    author = None
+    published_date = None
+    # TODO: customize selectors and normalization for this site
+    return {{
+        'title': title,
+        'url': url,
+        'content': content,
+        'author': author,
+        'date': published_date,
+        'published_date': published_date,
+        'source': '{source}'
+    }}
 '''
 
 
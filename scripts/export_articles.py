@@ -0,0 +1,90 @@
+"""Export articles as NDJSON or CSV without loading the table into memory.
+
+Streams rows in id order (see ``app/export.py``) to a file or stdout. A name
+ending in ``.gz`` is gzip-compressed. Progress and the last exported id go to
+stderr. Ctrl-C stops after the current batch, with the file complete up to
+the id it reports; pass that id to ``--after-id`` with ``--append`` to
+continue (a gzip file then holds two gzip members, which read as one stream).
+
+Usage:
+    python scripts/export_articles.py -o articles.ndjson.gz
+    python scripts/export_articles.py --format csv --source pna,rappler --since 2024-01-01 -o pna.csv
+    python scripts/export_articles.py --fields id,title,url,date --after-id 120000 --append -o articles.ndjson
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.db import db
+from app.export import DEFAULT_BATCH, FORMATS, ExportEncoder, export_fields, iter_rows
+
+
+def _split(value):
+    return [v.strip() for v in (value or "").split(",") if v.strip()] or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="output file (default: stdout); .gz compresses")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--fields", help="comma-separated columns (default: all; id is always included)")
+    parser.add_argument("--source", help="comma-separated sources")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="publication date from (ISO)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="publication date before (ISO)")
+    parser.add_argument("--after-id", type=int, default=0, help="resume after this article id")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--append", action="store_true", help="append to --output instead of overwriting")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        engine = db.engine
+    fields = export_fields(_split(args.fields))
+    compress = bool(args.output and args.output.endswith(".gz"))
+    # no second CSV header when appending to an earlier export
+    header = not (args.append and args.output and os.path.exists(args.output) and os.path.getsize(args.output))
+    encoder = ExportEncoder(args.format, fields, compress, header)
+    batches = iter_rows(engine, fields, sources=_split(args.source), since=args.since, until=args.until,
+                        after_id=args.after_id, batch=args.batch)
+
+    # Ctrl-C stops after the batch being written, so the file never ends
+    # in the middle of a row (or of a gzip block)
+    stop = []
+    signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+
+    out = open(args.output, "ab" if args.append else "wb") if args.output else sys.stdout.buffer
+    rows_done, last_id = 0, args.after_id
+    started = time.monotonic()
+    try:
+        for n, rows in enumerate(batches, 1):
+            out.write(encoder.encode(rows))
+            out.flush()
+            # only now is this batch in the output
+            rows_done += len(rows)
+            last_id = rows[-1][0]
+            if n % 50 == 0:
+                print(f"{rows_done} articles (last id {last_id})", file=sys.stderr)
+            if stop:
+                break
+    finally:
+        # ends the gzip stream, so another part can be appended to the file
+        out.write(encoder.finish())
+        out.flush()
+        if out is not sys.stdout.buffer:
+            out.close()
+    if stop:
+        print(f"Interrupted after {rows_done} articles; continue with --after-id {last_id} --append",
+              file=sys.stderr)
+        sys.exit(1)
+    print(f"Exported {rows_done} articles in {time.monotonic() - started:.1f}s (last id {last_id})",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
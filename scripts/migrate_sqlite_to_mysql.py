@@ -31,12 +31,18 @@ from app import create_app
 # Now import db and models; we will call db.init_app(app) manually later
 from app.db import db
 from app.models import Article, ScrapeJob
+from app.bulk import insert_new_articles
+from scrapy_spiders.urls import normalize_url
 
 # restore original init_db to avoid side-effects for other code
 if _original_init_db is not None:
     app_db.init_db = _original_init_db
 
 
+# rows per INSERT/commit when copying articles
+BATCH_SIZE = 1000
+
+
 def migrate():
 
     # ensure DATABASE_URL is set and points to MySQL (or other supported SQL)
@@ -188,14 +194,20 @@ def migrate():
             conn.close()
         else:
             db.create_all()
+        # columns added to the models after the DDL above (fingerprints, ...);
+        # fill them afterwards with scripts/backfill_fingerprints.py
+        from app.schema import ensure_schema
+        ensure_schema()
 
         # Copy Articles
         src_articles = src_conn.execute(text('SELECT id, url, title, author, date, description, content, source, created_at FROM article')).fetchall()
         print(f'Found {len(src_articles)} articles in SQLite')
+        article_rows = []
         for row in src_articles:
             # row keys may be index-based
-            a = Article(
-                url=row['url'] if 'url' in row else row[1],
+            a = dict(
+                # store the same canonical URL the scrapy pipeline would
+                url=normalize_url(row['url'] if 'url' in row else row[1]),
                 title=row['title'] if 'title' in row else row[2],
                 author=row['author'] if 'author' in row else row[3],
                 description=row['description'] if 'description' in row else row[5],
@@ -209,8 +221,8 @@ def migrate():
                 if date_val:
                     parsed = parse_sqlite_datetime(date_val)
                     if parsed is None:
-                        print('Warning: could not parse date for URL', a.url, 'value:', repr(date_val))
-                    a.date = parsed
+                        print('Warning: could not parse date for URL', a['url'], 'value:', repr(date_val))
+                    a['date'] = parsed
             except Exception:
                 pass
             try:
@@ -219,29 +231,30 @@ def migrate():
                 if created_val:
                     parsed_created = parse_sqlite_datetime(created_val)
                     if parsed_created is None:
-                        print('Warning: could not parse created_at for URL', a.url, 'value:', repr(created_val))
-                    a.created_at = parsed_created
+                        print('Warning: could not parse created_at for URL', a['url'], 'value:', repr(created_val))
+                    a['created_at'] = parsed_created
             except Exception:
                 pass
 
-            # upsert by URL: skip if exists
             # Defensive truncation for target schema limits
-            if a.url and len(a.url) > 767:
-                print('Truncating URL to 767 chars for', a.url[:80])
-                a.url = a.url[:767]
-            if a.title and len(a.title) > 1000:
-                a.title = a.title[:1000]
-
-            existing = Article.query.filter_by(url=a.url).first()
-            if existing:
-                print('Skipping existing', a.url)
-                continue
-            db.session.add(a)
+            if a['url'] and len(a['url']) > 767:
+                print('Truncating URL to 767 chars for', a['url'][:80])
+                a['url'] = a['url'][:767]
+            if a['title'] and len(a['title']) > 1000:
+                a['title'] = a['title'][:1000]
+            article_rows.append(a)
+
+        # upsert by URL: the unique index skips rows that already exist, so
+        # there is no per-row existence check
+        inserted = 0
         try:
-            db.session.commit()
+            for start in range(0, len(article_rows), BATCH_SIZE):
+                inserted += len(insert_new_articles(article_rows[start:start + BATCH_SIZE]))
+                db.session.commit()
         except Exception as e:
             print('Error committing articles:', e)
             db.session.rollback()
+        print(f'Inserted {inserted} articles, skipped {len(article_rows) - inserted} existing')
 
         # Copy ScrapeJob table if exists
         try:
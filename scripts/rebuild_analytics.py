@@ -0,0 +1,30 @@
+"""Recompute the per-source hourly article counts behind /analytics.
+
+The pipeline keeps ``article_rollup`` up to date as it inserts articles (see
+``app/analytics.py``), and the table is filled automatically the first time
+the app starts. Run this after deleting or re-sourcing articles by hand
+(e.g. with ``scripts/SQL/scrapy_test_SQL_delete_queries.sql``).
+
+Usage:
+    python scripts/rebuild_analytics.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.analytics import rebuild_rollups
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        started = time.monotonic()
+        n = rebuild_rollups()
+        print(f"Rebuilt analytics rollups for {n} articles in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Create, or rebuild, the full-text search index over all stored articles.
+
+The app never builds the index itself (see ``app/search.py``). Run this
+once per database to create it and index the existing rows; search uses
+LIKE until then. Once it exists the index is kept up to date on every
+insert, and running this again rebuilds it: after restoring a dump, after
+bulk edits made outside the app, or to compact the SQLite FTS5 table.
+
+Usage:
+    python scripts/rebuild_search_index.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.search import ensure_search_index, rebuild_search_index, search_backend
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        started = time.monotonic()
+        if search_backend() == "like":
+            backend = ensure_search_index()
+            done = "Created"
+        else:
+            backend = rebuild_search_index()
+            done = "Rebuilt"
+        if backend == "like":
+            print("This database has no full-text index (no FTS5 / FULLTEXT support); search uses LIKE.")
+            return
+        print(f"{done} the {backend} search index in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()